@@ -0,0 +1,292 @@
+#!/usr/bin/env python3
+"""
+Базы данных, на которых выполняются бенчмарки.
+
+Бэкенд скрывает различия PostgreSQL и SQLite, которые встречаются в
+скриптах: подключение через DB-API, создание движка SQLAlchemy, стиль
+параметров в SQL, загрузку строк (COPY или executemany) и тип
+автоинкрементного первичного ключа. Скрипт получает текущий бэкенд через
+current(), а harness.run_suites() выполняет наборы по очереди на каждом
+выбранном бэкенде внутри use().
+
+Профили SQLite отличаются настройками PRAGMA, которые выполняются на каждом
+новом соединении: режим журнала (DELETE или WAL), synchronous, mmap_size
+и cache_size. Файловые профили используют отдельные файлы в SQLITE_DIR,
+которые удаляются перед прогоном.
+
+При параллельном запуске (harness.run_suites с jobs > 1) каждый процесс
+вызывает isolate(): все его соединения с PostgreSQL работают в своей
+схеме, а базы SQLite лежат в своих файлах, поэтому наборы в разных
+процессах не видят таблицы друг друга.
+"""
+import contextlib
+import os
+import sqlite3
+import tempfile
+
+import psycopg2
+from sqlalchemy import create_engine
+from sqlalchemy.pool import QueuePool
+
+import loader
+
+# Параметры подключения к PostgreSQL
+DB_USER = "benchmark"
+DB_PASSWORD = "benchmark"
+DB_HOST = "localhost"
+DB_PORT = "5432"
+DB_NAME = "benchmark"
+DB_URL = f"postgresql://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
+
+# Каталог для файлов баз SQLite
+SQLITE_DIR = tempfile.gettempdir()
+
+# Бэкенд по умолчанию
+DEFAULT_BACKEND = "postgresql"
+
+# Схема PostgreSQL для снимков наборов данных (datasets.py), общая для всех процессов
+DATASET_SCHEMA = "dataset_cache"
+
+# Пространство имен процесса: схема PostgreSQL и суффикс файлов SQLite (см. isolate)
+_namespace = [None]
+
+
+class PostgresBackend:
+    """PostgreSQL через psycopg2, загрузка через COPY"""
+
+    name = "postgresql"
+    driver = "psycopg2"
+    serial_pk = "SERIAL PRIMARY KEY"
+    supports_explain = True
+
+    def connect(self):
+        return psycopg2.connect(
+            user=DB_USER,
+            password=DB_PASSWORD,
+            host=DB_HOST,
+            port=DB_PORT,
+            database=DB_NAME
+        )
+
+    def create_engine(self, **kwargs):
+        return create_engine(DB_URL, **kwargs)
+
+    def sql(self, query):
+        return query
+
+    def load(self, conn, table, columns, rows, commit=True, verbose=True):
+        return loader.copy_rows(conn, table, columns, rows, commit=commit, verbose=verbose)
+
+    def reset_sequence(self, conn, table, column="id"):
+        loader.reset_sequence(conn, table, column)
+
+    def snapshot_name(self, table, digest):
+        return f"{DATASET_SCHEMA}.{table}_{digest}"
+
+    def snapshot_tables(self, cur):
+        cur.execute("SELECT tablename FROM pg_tables WHERE schemaname = %s", (DATASET_SCHEMA,))
+        return [f"{DATASET_SCHEMA}.{name}" for name, in cur.fetchall()]
+
+    def table_exists(self, cur, table):
+        cur.execute("SELECT to_regclass(%s)", (table,))
+        return cur.fetchone()[0] is not None
+
+    def table_tag(self, cur, table):
+        cur.execute("SELECT obj_description(to_regclass(%s), 'pg_class')", (table,))
+        return cur.fetchone()[0]
+
+    def set_table_tag(self, cur, table, tag):
+        cur.execute(f"COMMENT ON TABLE {table} IS %s", (tag,))
+
+    def table_version(self, cur, table, rows):
+        # Все строки, записанные текущей транзакцией, получают ее xid в xmin
+        cur.execute("SELECT pg_current_xact_id()::xid")
+        return f"{cur.fetchone()[0]} {rows}"
+
+    def table_unchanged(self, cur, table, version):
+        # INSERT, UPDATE и DELETE меняют количество строк или xmin хотя бы одной из них
+        xid, rows = version.split()
+        cur.execute(
+            f"SELECT count(*) = %s AND coalesce(bool_and(xmin = %s::xid), true) FROM {table}",
+            (int(rows), xid)
+        )
+        return cur.fetchone()[0]
+
+    def lock_snapshot(self, cur, digest):
+        # CREATE SCHEMA IF NOT EXISTS в параллельных транзакциях может завершиться
+        # ошибкой уникальности, поэтому схема создается под своей блокировкой
+        cur.execute("SELECT pg_advisory_xact_lock(hashtext(%s))", (DATASET_SCHEMA,))
+        cur.execute(f"CREATE SCHEMA IF NOT EXISTS {DATASET_SCHEMA}")
+        cur.connection.commit()
+        # Блокировка до конца транзакции: параллельные процессы не создают один снимок дважды
+        cur.execute("SELECT pg_advisory_xact_lock(hashtext(%s))", (digest,))
+
+    def open(self):
+        if _namespace[0] is not None:
+            conn = self.connect()
+            try:
+                conn.cursor().execute(f"CREATE SCHEMA IF NOT EXISTS {_namespace[0]}")
+                conn.commit()
+            finally:
+                conn.close()
+
+    def close(self):
+        pass
+
+
+class SQLiteBackend:
+    """
+    SQLite через sqlite3 с заданными PRAGMA, загрузка через executemany
+
+    Args:
+        name: имя профиля
+        pragmas: {имя PRAGMA: значение}
+        memory: база в памяти вместо файла
+    """
+
+    driver = "sqlite3"
+    serial_pk = "INTEGER PRIMARY KEY"
+    supports_explain = False
+
+    def __init__(self, name, pragmas, memory=False):
+        self.name = name
+        self.pragmas = pragmas
+        self.memory = memory
+        self._keeper = None
+
+    @property
+    def path(self):
+        if self.memory:
+            # Общий кэш: все соединения процесса видят одну базу в памяти
+            return f"file:{self.name}?mode=memory&cache=shared"
+        suffix = f"_{_namespace[0]}" if _namespace[0] is not None else ""
+        return os.path.join(SQLITE_DIR, f"benchmark_{self.name}{suffix}.sqlite3")
+
+    def connect(self, **kwargs):
+        conn = sqlite3.connect(self.path, uri=self.memory, check_same_thread=False, **kwargs)
+        for pragma, value in self.pragmas.items():
+            conn.execute(f"PRAGMA {pragma} = {value}")
+        return conn
+
+    def create_engine(self, **kwargs):
+        # Соединения создает self.connect(), поэтому connect_args передаются ему
+        connect_args = kwargs.pop("connect_args", {})
+        return create_engine("sqlite://", creator=lambda: self.connect(**connect_args), poolclass=QueuePool, **kwargs)
+
+    def sql(self, query):
+        return query.replace("%s", "?")
+
+    def load(self, conn, table, columns, rows, commit=True, verbose=True):
+        return loader.insert_rows(conn, table, columns, rows, commit=commit, verbose=verbose)
+
+    def reset_sequence(self, conn, table, column="id"):
+        # INTEGER PRIMARY KEY продолжает нумерацию с MAX(id) + 1 без последовательности
+        pass
+
+    def snapshot_name(self, table, digest):
+        return f"{DATASET_SCHEMA}_{table}_{digest}"
+
+    def snapshot_tables(self, cur):
+        cur.execute("SELECT name FROM sqlite_master WHERE type = 'table' AND name LIKE ?", (f"{DATASET_SCHEMA}_%",))
+        return [name for name, in cur.fetchall()]
+
+    def table_exists(self, cur, table):
+        cur.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (table,))
+        return cur.fetchone() is not None
+
+    def table_tag(self, cur, table):
+        # Комментариев к таблицам в SQLite нет: таблица всегда восстанавливается из снимка
+        return None
+
+    def set_table_tag(self, cur, table, tag):
+        pass
+
+    def table_version(self, cur, table, rows):
+        return None
+
+    def table_unchanged(self, cur, table, version):
+        return False
+
+    def lock_snapshot(self, cur, digest):
+        # Файлы баз у каждого процесса свои, снимки не общие
+        pass
+
+    def open(self):
+        if self.memory:
+            # База в памяти существует, пока открыто хотя бы одно соединение
+            self._keeper = self.connect()
+        else:
+            # Каждый запуск начинается с пустой базы, поэтому снимки наборов
+            # (datasets.py) в файле живут только до конца этого запуска
+            for suffix in ("", "-wal", "-shm", "-journal"):
+                if os.path.exists(self.path + suffix):
+                    os.remove(self.path + suffix)
+
+    def close(self):
+        if self._keeper is not None:
+            self._keeper.close()
+            self._keeper = None
+
+
+BACKENDS = {
+    "postgresql": PostgresBackend(),
+    "sqlite_memory": SQLiteBackend("sqlite_memory", {}, memory=True),
+    "sqlite_file": SQLiteBackend("sqlite_file", {"journal_mode": "DELETE", "synchronous": "FULL"}),
+    "sqlite_wal": SQLiteBackend("sqlite_wal", {"journal_mode": "WAL", "synchronous": "NORMAL"}),
+    "sqlite_wal_mmap": SQLiteBackend("sqlite_wal_mmap", {
+        "journal_mode": "WAL",
+        "synchronous": "NORMAL",
+        "mmap_size": 256 * 1024 * 1024,
+        "cache_size": -64 * 1024,  # отрицательное значение - размер в KB
+    }),
+}
+
+# В sqlite3 execute() возвращает курсор, а не None, поэтому привычное
+# cur.execute(...) or cur.fetchone() на SQLite не извлекает строки
+def fetchone(cursor, query, params=None):
+    """Выполняет запрос и возвращает первую строку"""
+    cursor.execute(query, params) if params else cursor.execute(query)
+    return cursor.fetchone()
+
+
+def fetchall(cursor, query, params=None):
+    """Выполняет запрос и возвращает все строки"""
+    cursor.execute(query, params) if params else cursor.execute(query)
+    return cursor.fetchall()
+
+
+def isolate(namespace):
+    """
+    Отделяет таблицы текущего процесса от других процессов
+
+    PostgreSQL: переменная PGOPTIONS задает search_path = namespace для всех
+    новых соединений libpq процесса, включая скрипты, которые подключаются
+    через psycopg2 напрямую; схема создается в open(). В search_path нет
+    public, поэтому DROP TABLE в процессе не может задеть чужие таблицы.
+    SQLite: к имени файла базы добавляется суффикс namespace (база в памяти
+    и так своя у каждого процесса).
+    """
+    _namespace[0] = namespace
+    os.environ["PGOPTIONS"] = f"-c search_path={namespace}"
+
+
+_current = [DEFAULT_BACKEND]
+
+
+def current():
+    """Бэкенд, на котором сейчас выполняются наборы"""
+    return BACKENDS[_current[0]]
+
+
+@contextlib.contextmanager
+def use(name):
+    """Делает бэкенд name текущим на время блока"""
+    backend = BACKENDS[name]
+    previous = _current[0]
+    backend.open()
+    _current[0] = name
+    try:
+        yield backend
+    finally:
+        _current[0] = previous
+        backend.close()
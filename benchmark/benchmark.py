@@ -1,21 +1,16 @@
 #!/usr/bin/env python3
 import time
-import random
-from sqlalchemy import create_engine, Column, Integer, String, MetaData, Table
+from sqlalchemy import Column, Integer, String
 from sqlalchemy.orm import sessionmaker, declarative_base
 
-# Параметры подключения к PostgreSQL
-DB_USER = "benchmark"
-DB_PASSWORD = "benchmark"
-DB_HOST = "localhost"
-DB_PORT = "5432"
-DB_NAME = "benchmark"
-DB_URL = f"postgresql://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
+import backends
+import datasets
+import harness
+import orm_profiler
 
-# Инициализация SQLAlchemy
-engine = create_engine(DB_URL)
+# Движок создается для текущего бэкенда в run_benchmark()
 Base = declarative_base()
-Session = sessionmaker(bind=engine)
+Session = sessionmaker()
 
 # Определение модели User
 class User(Base):
@@ -33,52 +28,44 @@ class User(Base):
     def __repr__(self):
         return f"<User(id={self.id}, name='{self.name}')>"
 
+# Разложение времени запросов ORM на составляющие (создается вместе с движком)
+profiler = None
+
 # Функция для форматирования результата
 def print_result(operation, time_ms):
     print(f"{operation}: {time_ms:.2f} ms")
 
 # Функция для замера времени выполнения
 def measure_time(func):
-    start_time = time.time()
+    profiler.reset()
+    start_time = time.perf_counter()
     result = func()
-    end_time = time.time()
+    end_time = time.perf_counter()
     return (end_time - start_time) * 1000, result  # Время в миллисекундах
 
+@harness.suite("benchmark", portable=True)
 def run_benchmark():
+    global profiler
+    backend = backends.current()
+    
+    # Курсор с замером извлечения строк для orm_profiler
+    engine = backend.create_engine(**orm_profiler.engine_args(backend))
+    Session.configure(bind=engine)
+    profiler = orm_profiler.OrmProfiler(engine, Base)
+    
     try:
-        # Удаляем таблицу users, если она существует
-        Base.metadata.drop_all(engine)
+        print("Подготавливаю таблицу со 100000 пользователями...")
         
-        # Создаем таблицу users
-        Base.metadata.create_all(engine)
+        # Берем набор данных из кэша (при первом запуске он загружается через COPY на PostgreSQL)
+        conn = engine.raw_connection()
+        try:
+            datasets.ensure(conn, datasets.users(1, 100001))
+        finally:
+            conn.close()
         
         # Создаем сессию
         session = Session()
         
-        print("Создаю 100000 пользователей...")
-        
-        # Создаем 10000 пользователей
-        users = []
-        for i in range(1, 100001):
-            user = User(
-                id=i,
-                name=f"User {i}",
-                email=f"user{i}@example.com",
-                phone=f"+7{random.randint(9000000000, 9999999999)}",
-                address=f"Street {i}",
-                city=f"City {i % 100}",
-                country=f"Country {i % 10}",
-                zipcode=f"{10000 + i}"
-            )
-            users.append(user)
-        
-        # Вставляем данные пользователей
-        batch_size = 1000
-        for i in range(0, len(users), batch_size):
-            batch = users[i:i + batch_size]
-            session.add_all(batch)
-            session.commit()
-        
         print("База данных создана и заполнена.")
         print("\nНачинаю тесты производительности:")
         
@@ -87,18 +74,27 @@ def run_benchmark():
             lambda: session.query(User).filter(User.id == 123).first()
         )
         print_result("Получение пользователя с ID 123", single_user_time)
+        breakdown = profiler.breakdown(single_user_time)
+        print(f"  {orm_profiler.format_breakdown(breakdown)}")
+        harness.record("Получение пользователя с ID 123", [single_user_time], dataset_size=100000, driver="sqlalchemy-orm", breakdown=breakdown)
         
         # Тест 2: Получение таблицы с 10 пользователями
         ten_users_time, ten_users = measure_time(
             lambda: session.query(User).limit(10).all()
         )
         print_result("Получение таблицы с 10 пользователями", ten_users_time)
+        breakdown = profiler.breakdown(ten_users_time)
+        print(f"  {orm_profiler.format_breakdown(breakdown)}")
+        harness.record("Получение таблицы с 10 пользователями", [ten_users_time], dataset_size=100000, driver="sqlalchemy-orm", breakdown=breakdown)
         
         # Тест 3: Получение таблицы с 10000 пользователями
         all_users_time, all_users = measure_time(
             lambda: session.query(User).all()
         )
         print_result("Получение таблицы с 10000 пользователями", all_users_time)
+        breakdown = profiler.breakdown(all_users_time)
+        print(f"  {orm_profiler.format_breakdown(breakdown)}")
+        harness.record("Получение таблицы с 10000 пользователями", [all_users_time], dataset_size=100000, driver="sqlalchemy-orm", breakdown=breakdown)
         
         # Закрываем сессию
         session.close()
@@ -107,6 +103,9 @@ def run_benchmark():
         print(f"Произошла ошибка: {e}")
         if 'session' in locals():
             session.close()
+    finally:
+        profiler.close()
+        engine.dispose()
 
 if __name__ == "__main__":
     run_benchmark() 
\ No newline at end of file
@@ -0,0 +1,336 @@
+#!/usr/bin/env python3
+"""
+Агрегация в базе и в памяти Python.
+
+Три запроса над схемами benchmark.py и django_benchmark.py:
+- count_per_country - количество пользователей по странам (users);
+- top_commenters - TOP_N авторов по количеству комментариев (comment);
+- approved_by_author - TOP_N авторов постов по количеству одобренных
+  комментариев к их опубликованным постам (comment JOIN post JOIN "user").
+
+Каждый запрос выполняется пятью способами: GROUP BY в SQL через psycopg2,
+SQLAlchemy Core, SQLAlchemy ORM, а также выборкой исходных строк с
+агрегацией в NumPy или pandas (способ pandas пропускается, если pandas
+не установлен). Результаты всех способов сверяются с SQL. По размерам
+набора данных видно, с какого размера агрегация в базе обгоняет
+выборку строк в Python.
+"""
+import statistics
+
+import numpy as np
+from sqlalchemy import func, select
+from sqlalchemy.orm import sessionmaker
+
+try:
+    import pandas as pd
+except ImportError:
+    pd = None
+
+import backends
+import benchmark
+import datagen
+import datasets
+import django_benchmark
+import harness
+import sweep
+
+# Размеры набора данных: строк в users и пользователей в схеме django_benchmark.py
+# (постов примерно в 2 раза, комментариев в 6 раз больше)
+DB_SIZES = [1000, 10000, 100000]
+
+# Добавлять ли размеры из sweep.SCALE_TIERS
+LARGE_SCALE = False
+
+# Способы с выборкой строк в Python не выполняются на таблицах больше этого
+# размера: исходные строки целиком помещаются в память процесса
+PYTHON_MAX_ROWS = 10000000
+
+# Количество строк в рейтингах
+TOP_N = 10
+
+# Количество повторений каждого замера
+NUM_RUNS = 5
+
+# Способ -> (драйвер в записи результата, где выполняется агрегация)
+MODES = {
+    "sql": ("psycopg2", "database"),
+    "core": ("sqlalchemy-core", "database"),
+    "orm": ("sqlalchemy-orm", "database"),
+    "numpy": ("numpy", "python"),
+    "pandas": ("pandas", "python"),
+}
+
+Session = sessionmaker()
+
+# Модель User из benchmark.py
+User = benchmark.User
+
+DjangoUser = django_benchmark.User
+Post = django_benchmark.Post
+Comment = django_benchmark.Comment
+
+def fetch_columns(cur, sql):
+    """Выполняет запрос и возвращает его колонки в виде массивов NumPy"""
+    cur.execute(sql)
+    rows = cur.fetchall()
+    return [np.array(column) for column in zip(*rows)] if rows else [np.array([]) for _ in cur.description]
+
+def top_counts(keys, counts, limit=TOP_N):
+    """limit пар (ключ, количество) по убыванию количества, при равенстве - по возрастанию ключа"""
+    order = np.lexsort((keys, -counts))[:limit]
+    return [(keys[i].item(), counts[i].item()) for i in order if counts[i] > 0]
+
+def as_pairs(rows):
+    return [(key, int(count)) for key, count in rows]
+
+# === count_per_country ===
+
+def country_sql(ctx):
+    ctx.cur.execute("SELECT country, count(*) FROM users GROUP BY country ORDER BY country")
+    return ctx.cur.fetchall()
+
+def country_core(ctx):
+    users = User.__table__
+    query = select(users.c.country, func.count()).group_by(users.c.country).order_by(users.c.country)
+    return ctx.connection.execute(query).all()
+
+def country_orm(ctx):
+    return ctx.session.query(User.country, func.count(User.id)).group_by(User.country).order_by(User.country).all()
+
+def country_numpy(ctx):
+    countries, = fetch_columns(ctx.cur, "SELECT country FROM users")
+    keys, counts = np.unique(countries, return_counts=True)
+    return list(zip(keys.tolist(), counts.tolist()))
+
+def country_pandas(ctx):
+    frame = pd.read_sql_query("SELECT country FROM users", ctx.connection)
+    return list(frame.groupby("country").size().items())
+
+# === top_commenters ===
+
+def commenters_sql(ctx):
+    ctx.cur.execute(
+        "SELECT author_id, count(*) AS comments FROM comment "
+        "GROUP BY author_id ORDER BY comments DESC, author_id LIMIT %s", (TOP_N,)
+    )
+    return ctx.cur.fetchall()
+
+def commenters_core(ctx):
+    comments = Comment.__table__
+    count = func.count().label("comments")
+    query = (select(comments.c.author_id, count).group_by(comments.c.author_id)
+             .order_by(count.desc(), comments.c.author_id).limit(TOP_N))
+    return ctx.connection.execute(query).all()
+
+def commenters_orm(ctx):
+    count = func.count(Comment.id).label("comments")
+    return (ctx.session.query(Comment.author_id, count).group_by(Comment.author_id)
+            .order_by(count.desc(), Comment.author_id).limit(TOP_N).all())
+
+def commenters_numpy(ctx):
+    authors, = fetch_columns(ctx.cur, "SELECT author_id FROM comment")
+    counts = np.bincount(authors.astype(np.int64))
+    return top_counts(np.arange(len(counts)), counts)
+
+def commenters_pandas(ctx):
+    frame = pd.read_sql_query("SELECT author_id FROM comment", ctx.connection)
+    counts = frame.groupby("author_id").size().reset_index(name="comments")
+    top = counts.sort_values(["comments", "author_id"], ascending=[False, True]).head(TOP_N)
+    return list(zip(top["author_id"].tolist(), top["comments"].tolist()))
+
+# === approved_by_author ===
+
+def approved_sql(ctx):
+    ctx.cur.execute(
+        'SELECT u.username, count(*) AS approved FROM comment c '
+        'JOIN post p ON p.id = c.post_id JOIN "user" u ON u.id = p.author_id '
+        'WHERE c.is_approved AND p.is_published '
+        'GROUP BY u.id, u.username ORDER BY approved DESC, u.id LIMIT %s', (TOP_N,)
+    )
+    return ctx.cur.fetchall()
+
+def approved_core(ctx):
+    users, posts, comments = DjangoUser.__table__, Post.__table__, Comment.__table__
+    count = func.count().label("approved")
+    query = (select(users.c.username, count)
+             .select_from(comments.join(posts, posts.c.id == comments.c.post_id)
+                          .join(users, users.c.id == posts.c.author_id))
+             .where(comments.c.is_approved, posts.c.is_published)
+             .group_by(users.c.id, users.c.username)
+             .order_by(count.desc(), users.c.id).limit(TOP_N))
+    return ctx.connection.execute(query).all()
+
+def approved_orm(ctx):
+    count = func.count(Comment.id).label("approved")
+    return (ctx.session.query(DjangoUser.username, count)
+            .select_from(Comment).join(Post, Post.id == Comment.post_id)
+            .join(DjangoUser, DjangoUser.id == Post.author_id)
+            .filter(Comment.is_approved, Post.is_published)
+            .group_by(DjangoUser.id, DjangoUser.username)
+            .order_by(count.desc(), DjangoUser.id).limit(TOP_N).all())
+
+def approved_numpy(ctx):
+    user_ids, usernames = fetch_columns(ctx.cur, 'SELECT id, username FROM "user"')
+    post_ids, post_authors, published = fetch_columns(ctx.cur, "SELECT id, author_id, is_published FROM post")
+    comment_posts, approved = fetch_columns(ctx.cur, "SELECT post_id, is_approved FROM comment")
+
+    # Автор каждого опубликованного поста по его id (0 - пост не опубликован)
+    author_of_post = np.zeros(post_ids.max() + 1, dtype=np.int64)
+    author_of_post[post_ids[published.astype(bool)]] = post_authors[published.astype(bool)]
+    authors = author_of_post[comment_posts[approved.astype(bool)].astype(np.int64)]
+    counts = np.bincount(authors[authors > 0])
+    top = top_counts(np.arange(len(counts)), counts)
+    names = dict(zip(user_ids.tolist(), usernames.tolist()))
+    return [(names[author], count) for author, count in top]
+
+def approved_pandas(ctx):
+    users = pd.read_sql_query('SELECT id, username FROM "user"', ctx.connection)
+    posts = pd.read_sql_query("SELECT id, author_id, is_published FROM post", ctx.connection)
+    comments = pd.read_sql_query("SELECT post_id, is_approved FROM comment", ctx.connection)
+    joined = (comments[comments["is_approved"]]
+              .merge(posts[posts["is_published"]], left_on="post_id", right_on="id")
+              .merge(users, left_on="author_id", right_on="id", suffixes=("", "_user")))
+    counts = joined.groupby(["author_id", "username"]).size().reset_index(name="approved")
+    top = counts.sort_values(["approved", "author_id"], ascending=[False, True]).head(TOP_N)
+    return list(zip(top["username"].tolist(), top["approved"].tolist()))
+
+# Запрос -> (таблица с наибольшим количеством строк, {способ: функция})
+QUERIES = {
+    "count_per_country": ("users", {
+        "sql": country_sql, "core": country_core, "orm": country_orm,
+        "numpy": country_numpy, "pandas": country_pandas,
+    }),
+    "top_commenters": ("comment", {
+        "sql": commenters_sql, "core": commenters_core, "orm": commenters_orm,
+        "numpy": commenters_numpy, "pandas": commenters_pandas,
+    }),
+    "approved_by_author": ("comment", {
+        "sql": approved_sql, "core": approved_core, "orm": approved_orm,
+        "numpy": approved_numpy, "pandas": approved_pandas,
+    }),
+}
+
+class Context:
+    """Соединения, которые получают функции запросов"""
+
+    def __init__(self, conn, connection, session):
+        self.conn = conn
+        self.cur = conn.cursor()
+        self.connection = connection
+        self.session = session
+
+def table_rows(cur, table):
+    cur.execute(f"SELECT count(*) FROM {table}")
+    return cur.fetchone()[0]
+
+def measure_queries(ctx, db_size, results):
+    """Замеряет все способы всех запросов на одном размере"""
+    for query, (table, modes) in QUERIES.items():
+        rows = table_rows(ctx.cur, table)
+        expected = None
+        for mode, run in modes.items():
+            driver, aggregation = MODES[mode]
+            if mode == "pandas" and pd is None:
+                continue
+            if aggregation == "python" and rows > PYTHON_MAX_ROWS:
+                print(f"{query} ({mode}): пропущен, {rows} строк больше PYTHON_MAX_ROWS")
+                continue
+
+            result = as_pairs(run(ctx))
+            if expected is None:
+                expected = result
+            elif result != expected:
+                print(f"{query} ({mode}): результат не совпадает с SQL")
+
+            samples = harness.measure(lambda: run(ctx), iterations=NUM_RUNS)
+            ctx.conn.commit()
+            ctx.connection.commit()
+            ctx.session.rollback()
+            results[(query, db_size, mode)] = statistics.median(samples)
+            print(f"{query} ({mode}): {statistics.median(samples):.2f} ms")
+            harness.record(query, samples, dataset_size=db_size, driver=driver,
+                           aggregation=aggregation, rows=rows)
+
+def crossover(results, query, db_sizes):
+    """Наименьший размер, начиная с которого агрегация в базе быстрее любой агрегации в Python"""
+    found = None
+    for db_size in db_sizes:
+        # Лучшее время среди способов с агрегацией в базе и в Python
+        best = {}
+        for mode, (_, aggregation) in MODES.items():
+            value = results.get((query, db_size, mode))
+            if value is not None:
+                best[aggregation] = min(best.get(aggregation, value), value)
+        if len(best) < 2:
+            continue
+        if best["database"] < best["python"]:
+            found = found or db_size
+        else:
+            found = None
+    return found
+
+@harness.suite("benchmark_aggregate")
+def run_benchmark():
+    """Сравнение GROUP BY в базе и агрегации выбранных строк в Python"""
+    results = {}
+    db_sizes = DB_SIZES + sweep.SCALE_TIERS if LARGE_SCALE else DB_SIZES
+    backend = backends.current()
+    engine = backend.create_engine()
+
+    if pd is None:
+        print("pandas не установлен: способ pandas пропускается")
+
+    try:
+        conn = backend.connect()
+        django_benchmark.Base.metadata.drop_all(engine)
+        django_benchmark.Base.metadata.create_all(engine)
+        # Комментарии распределены по авторам по Ципфу, чтобы рейтинг не состоял из равных значений
+        generator = datagen.DatasetGenerator(commenters_distribution="zipf")
+
+        def grow(loaded, db_size):
+            django_benchmark.grow_database(conn, generator, loaded, db_size)
+
+        def measure(db_size, variant):
+            print(f"\nРазмер набора данных: {db_size}")
+            datasets.ensure(conn, datasets.users(1, db_size + 1))
+            with engine.connect() as connection:
+                session = Session(bind=engine)
+                try:
+                    measure_queries(Context(conn, connection, session), db_size, results)
+                finally:
+                    session.close()
+
+        sweep.run_sweep(conn, db_sizes, grow, measure, django_benchmark.TABLES.values())
+        conn.close()
+
+    except Exception as e:
+        print(f"Произошла ошибка: {e}")
+        if 'conn' in locals():
+            conn.close()
+    finally:
+        engine.dispose()
+
+    # Выводим результаты
+    print("\n=== РЕЗУЛЬТАТЫ АГРЕГАЦИИ (медиана, ms) ===")
+    for query in QUERIES:
+        print(f"\n{query}:")
+        print("-" * 100)
+        print(f"{'Размер БД':<10} " + " ".join(f"{mode:<14}" for mode in MODES) + f" {'Быстрее':<10}")
+        print("-" * 100)
+        for db_size in db_sizes:
+            times = {mode: results.get((query, db_size, mode)) for mode in MODES}
+            measured = {mode: value for mode, value in times.items() if value is not None}
+            if not measured:
+                continue
+            fastest = min(measured, key=measured.get)
+            print(f"{db_size:<10} " + " ".join(
+                f"{value:<14.2f}" if value is not None else f"{'-':<14}" for value in times.values()
+            ) + f" {fastest:<10}")
+        size = crossover(results, query, db_sizes)
+        if size is not None:
+            print(f"Агрегация в базе быстрее выборки в Python начиная с {size} пользователей")
+        else:
+            print("Агрегация в Python не уступает агрегации в базе на всех размерах")
+
+if __name__ == "__main__":
+    run_benchmark()
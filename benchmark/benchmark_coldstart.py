@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+"""
+Холодный старт и установившийся режим запросов по ID.
+
+Остальные скрипты усредняют 10-20 вызовов подряд на уже разогретом
+соединении, поэтому задержка первого запроса теряется. Здесь для каждого
+сценария отдельно замеряются открытие сессии, первый вызов на новой
+сессии, кривая разогрева по первым WARMUP_CALLS вызовам и установившийся
+режим после разогрева.
+
+Сценарии различаются тем, что остается холодным:
+- новое соединение psycopg2 - новый серверный процесс с пустыми кэшами
+  каталога (relcache, catcache) и без подготовленных планов;
+- DISCARD ALL на существующем соединении - сброс состояния сессии
+  при сохранении серверного процесса (так делают пулы при возврате соединения);
+- новый движок SQLAlchemy - новое соединение и пустой кэш скомпилированных запросов;
+- новая сессия ORM на разогретом движке - соединение из пула и готовый кэш,
+  но пустая карта идентичности.
+
+SQLAlchemy открывает соединение при первом запросе, поэтому в сценариях ORM
+установка соединения входит во время первого вызова, а не открытия сессии.
+"""
+import random
+import statistics
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+
+import backends
+import benchmark
+import harness
+import loader
+
+# Количество строк в таблице users
+DB_SIZE = 100000
+
+# Количество новых сессий в каждом сценарии
+NUM_SESSIONS = 20
+
+# Количество первых вызовов, по которым строится кривая разогрева
+WARMUP_CALLS = 20
+
+# Количество вызовов в установившемся режиме после разогрева
+STEADY_CALLS = 200
+
+# Включать ли сценарий со сбросом сессии через DISCARD ALL
+DISCARD = True
+
+# Зерно генератора ID
+SEED = 42
+
+engine = create_engine(backends.DB_URL)
+
+# Модель User из benchmark.py
+User = benchmark.User
+
+def connect():
+    return backends.current().connect()
+
+# Случайные ID: каждый вызов запрашивает нового пользователя, генератор у
+# каждого сценария свой, поэтому все сценарии получают одну последовательность
+def sql_lookup(rng):
+    def call(conn):
+        with conn.cursor() as cur:
+            cur.execute("SELECT * FROM users WHERE id = %s", (rng.randint(1, DB_SIZE),))
+            return cur.fetchone()
+    return call
+
+def orm_lookup(rng):
+    return lambda session: session.query(User).filter(User.id == rng.randint(1, DB_SIZE)).first()
+
+# Сценарии: по генератору ID возвращают функцию открытия сессии, вызов,
+# закрытие сессии и драйвер
+def psycopg2_new_connection(rng):
+    return connect, sql_lookup(rng), lambda conn: conn.close(), "psycopg2"
+
+def psycopg2_discard_all(rng):
+    conn = connect()
+    conn.autocommit = True
+
+    def open_session():
+        with conn.cursor() as cur:
+            cur.execute("DISCARD ALL")
+        return conn
+
+    return open_session, sql_lookup(rng), None, "psycopg2", conn
+
+def orm_new_engine(rng):
+    def open_session():
+        return Session(bind=create_engine(backends.DB_URL))
+
+    def close_session(session):
+        bind = session.get_bind()
+        session.close()
+        bind.dispose()
+
+    return open_session, orm_lookup(rng), close_session, "sqlalchemy-orm"
+
+def orm_new_session(rng):
+    # Разогреваем движок: соединение в пуле и кэш скомпилированных запросов
+    # (отдельным генератором, чтобы не сдвигать последовательность ID)
+    with Session(bind=engine) as session:
+        orm_lookup(random.Random(SEED + 1))(session)
+    return lambda: Session(bind=engine), orm_lookup(rng), lambda session: session.close(), "sqlalchemy-orm"
+
+SCENARIOS = {
+    "psycopg2_new_connection": psycopg2_new_connection,
+    "psycopg2_discard_all": psycopg2_discard_all,
+    "orm_new_engine": orm_new_engine,
+    "orm_new_session": orm_new_session,
+}
+
+def run_scenario(scenario):
+    open_session, call, close_session, driver, *resources = SCENARIOS[scenario](random.Random(SEED))
+    try:
+        return harness.measure_cold(
+            open_session, call, close_session,
+            sessions=NUM_SESSIONS, warmup=WARMUP_CALLS, steady=STEADY_CALLS
+        ), driver
+    finally:
+        for resource in resources:
+            resource.close()
+
+@harness.suite("benchmark_coldstart")
+def run_benchmark():
+    """Сравнение первого вызова, разогрева и установившегося режима"""
+    results = {}
+
+    try:
+        # Пересоздаем и заполняем таблицу users
+        benchmark.Base.metadata.drop_all(engine)
+        benchmark.Base.metadata.create_all(engine)
+        conn = connect()
+        try:
+            loader.copy_rows(conn, "users", loader.USER_COLUMNS, loader.user_rows(1, DB_SIZE + 1))
+            with conn.cursor() as cur:
+                cur.execute("ANALYZE users")
+            conn.commit()
+        finally:
+            conn.close()
+
+        for scenario in SCENARIOS:
+            if scenario == "psycopg2_discard_all" and not DISCARD:
+                continue
+            print(f"{scenario}: {NUM_SESSIONS} сессий...")
+            result, driver = run_scenario(scenario)
+            results[scenario] = result
+            # Для фазы warmup samples - кривая разогрева, а не отдельные вызовы
+            for phase in ("open", "first", "warmup", "steady"):
+                harness.record(scenario, result[phase], dataset_size=DB_SIZE, driver=driver, phase=phase)
+
+    except Exception as e:
+        print(f"Произошла ошибка: {e}")
+        return
+
+    # Выводим результаты
+    print("\n=== РЕЗУЛЬТАТЫ: ХОЛОДНЫЙ СТАРТ ===")
+    print("-" * 100)
+    print(f"{'Сценарий':<26} {'Открытие (ms)':<15} {'Первый (ms)':<15} {'Устан. (ms)':<15} {'p99 устан.':<15} {'Первый/устан.':<15}")
+    print("-" * 100)
+    for scenario, result in results.items():
+        first = statistics.median(result["first"])
+        steady = statistics.median(result["steady"])
+        print(f"{scenario:<26} {statistics.median(result['open']):<15.3f} {first:<15.3f} {steady:<15.3f} "
+              f"{harness.percentile(result['steady'], 99):<15.3f} {first / steady:<15.1f}x")
+
+    # Кривая разогрева: медиана k-го вызова по всем сессиям
+    print("\nКривая разогрева (медиана k-го вызова, ms):")
+    print("-" * 100)
+    calls = [k for k in (1, 2, 3, 5, 10, WARMUP_CALLS) if k <= WARMUP_CALLS]
+    print(f"{'Сценарий':<26} " + " ".join(f"{f'#{k}':<10}" for k in calls))
+    print("-" * 100)
+    for scenario, result in results.items():
+        print(f"{scenario:<26} " + " ".join(f"{result['warmup'][k - 1]:<10.3f}" for k in calls))
+
+if __name__ == "__main__":
+    run_benchmark()
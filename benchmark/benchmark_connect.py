@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+"""
+Стоимость установки соединения и пулов соединений.
+
+Один цикл - получить соединение, выполнить k запросов и вернуть
+(или закрыть) соединение. При k = 1 каждый запрос идет на новом
+соединении, как у короткоживущих воркеров; при больших k стоимость
+соединения делится на k запросов. Замеряется время цикла, количество
+циклов в секунду (для пулов - получений соединения из пула) и средняя
+стоимость одного запроса с учетом получения соединения.
+
+Сравниваются:
+- psycopg2.connect() на каждый цикл (подключение, аутентификация, первый запрос);
+- psycopg2.pool.SimpleConnectionPool и ThreadedConnectionPool;
+- SQLAlchemy QueuePool с pool_pre_ping и без него и NullPool (pre_ping
+  проверяет соединение, взятое из пула, а NullPool каждый раз открывает новое);
+каждый вариант через TCP и через Unix-сокет.
+"""
+import os
+import statistics
+import psycopg2
+import psycopg2.pool
+from sqlalchemy import create_engine
+from sqlalchemy.pool import NullPool, QueuePool
+
+import backends
+import harness
+
+# Каталоги, в которых ищется Unix-сокет сервера (первый существующий)
+SOCKET_DIRS = ["/var/run/postgresql", "/tmp"]
+
+# Количество запросов на одно соединение
+REUSE_RATIOS = [1, 10, 100]
+
+# Количество циклов "получить соединение - k запросов - вернуть" для каждого k
+NUM_CYCLES = 200
+
+# Запрос, который выполняется на соединении
+QUERY = "SELECT 1"
+
+def find_socket_dir():
+    """Каталог с сокетом .s.PGSQL.<port> или None"""
+    for directory in SOCKET_DIRS:
+        if os.path.exists(os.path.join(directory, f".s.PGSQL.{backends.DB_PORT}")):
+            return directory
+    return None
+
+def connect_args(host):
+    return dict(user=backends.DB_USER, password=backends.DB_PASSWORD, host=host,
+                port=backends.DB_PORT, database=backends.DB_NAME)
+
+def db_url(host):
+    # Путь к сокету передается параметром host, так как его нельзя указать в адресе
+    return f"postgresql://{backends.DB_USER}:{backends.DB_PASSWORD}@/{backends.DB_NAME}?host={host}&port={backends.DB_PORT}"
+
+def sql_query(conn):
+    with conn.cursor() as cur:
+        cur.execute(QUERY)
+        cur.fetchone()
+
+def core_query(connection):
+    connection.exec_driver_sql(QUERY).fetchone()
+
+# Сценарии: функция получает host и возвращает (получить соединение,
+# выполнить запрос, вернуть соединение, освободить ресурсы, драйвер)
+def raw_connect(host):
+    return (lambda: psycopg2.connect(**connect_args(host)), sql_query,
+            lambda conn: conn.close(), lambda: None, "psycopg2")
+
+def psycopg2_pool(pool_class):
+    def scenario(host):
+        pool = pool_class(1, 1, **connect_args(host))
+
+        def release(conn):
+            # Завершаем транзакцию, как сделало бы приложение перед возвратом соединения
+            conn.rollback()
+            pool.putconn(conn)
+
+        return pool.getconn, sql_query, release, pool.closeall, "psycopg2"
+    return scenario
+
+def sqlalchemy_pool(poolclass, pre_ping):
+    def scenario(host):
+        engine = create_engine(db_url(host), poolclass=poolclass, pool_pre_ping=pre_ping)
+        return engine.connect, core_query, lambda connection: connection.close(), engine.dispose, "sqlalchemy-core"
+    return scenario
+
+SCENARIOS = {
+    "raw_connect": raw_connect,
+    "simple_pool": psycopg2_pool(psycopg2.pool.SimpleConnectionPool),
+    "threaded_pool": psycopg2_pool(psycopg2.pool.ThreadedConnectionPool),
+    "queue_pool": sqlalchemy_pool(QueuePool, False),
+    "queue_pool_pre_ping": sqlalchemy_pool(QueuePool, True),
+    "null_pool": sqlalchemy_pool(NullPool, False),
+}
+
+def run_cycles(scenario, host, reuse):
+    """Выполняет NUM_CYCLES циклов и возвращает время каждого цикла в ms"""
+    acquire, query, release, cleanup, driver = SCENARIOS[scenario](host)
+
+    def cycle():
+        conn = acquire()
+        try:
+            for _ in range(reuse):
+                query(conn)
+        finally:
+            release(conn)
+
+    try:
+        # Первый цикл открывает соединение пула, его не учитываем
+        cycle()
+        return harness.measure(cycle, iterations=NUM_CYCLES), driver
+    finally:
+        cleanup()
+
+@harness.suite("benchmark_connect", exclusive=True)
+def run_benchmark():
+    """Сравнение стоимости соединений с разными пулами, транспортами и степенью переиспользования"""
+    transports = {"tcp": backends.DB_HOST}
+    socket_dir = find_socket_dir()
+    if socket_dir is not None:
+        transports["unix"] = socket_dir
+    else:
+        print(f"Unix-сокет не найден в {', '.join(SOCKET_DIRS)}, замеряется только TCP")
+
+    # (сценарий, транспорт, k) -> время циклов
+    results = {}
+    try:
+        for transport, host in transports.items():
+            for scenario in SCENARIOS:
+                for reuse in REUSE_RATIOS:
+                    print(f"{scenario} ({transport}), {reuse} запросов на соединение...")
+                    times, driver = run_cycles(scenario, host, reuse)
+                    results[(scenario, transport, reuse)] = times
+                    harness.record(scenario, times, driver=driver, transport=transport,
+                                   queries_per_connection=reuse)
+    except Exception as e:
+        print(f"Произошла ошибка: {e}")
+        return
+
+    # Выводим результаты
+    for transport in transports:
+        print(f"\n=== РЕЗУЛЬТАТЫ: СОЕДИНЕНИЯ ({transport}) ===")
+        print("-" * 100)
+        header = " ".join(f"{f'k={reuse} (ms/запрос)':<20}" for reuse in REUSE_RATIOS)
+        print(f"{'Сценарий':<22} {'Циклов/с k=1':<14} {'Цикл k=1 p95':<14} {header}")
+        print("-" * 100)
+        for scenario in SCENARIOS:
+            single = results[(scenario, transport, 1)]
+            per_query = " ".join(
+                f"{statistics.mean(results[(scenario, transport, reuse)]) / reuse:<20.4f}" for reuse in REUSE_RATIOS
+            )
+            print(f"{scenario:<22} {1000 / statistics.mean(single):<14.0f} "
+                  f"{harness.percentile(single, 95):<14.3f} {per_query}")
+
+    if "unix" in transports:
+        print("\nВыигрыш Unix-сокета при одном запросе на соединение:")
+        for scenario in SCENARIOS:
+            tcp = statistics.mean(results[(scenario, "tcp", 1)])
+            unix = statistics.mean(results[(scenario, "unix", 1)])
+            print(f"  {scenario:<22} {tcp / unix:.2f}x")
+
+if __name__ == "__main__":
+    run_benchmark()
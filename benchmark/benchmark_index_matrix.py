@@ -0,0 +1,202 @@
+#!/usr/bin/env python3
+"""
+Матрица "вид индекса x вид запроса" для таблицы пользователей.
+
+Обобщение django_index_benchmark.py: вместо двух вариантов (btree по name
+и без индекса) на одних и тех же данных по очереди строятся индексы разных
+видов, и для каждого замеряются запросы на равенство, по префиксу,
+по диапазону и с логическим фильтром. Рядом с каждым замером сохраняется
+вывод EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON), размер индекса и время его
+построения.
+"""
+import datetime
+import statistics
+
+import django_index_benchmark
+import harness
+import loader
+import plans
+import sweep
+
+# Размеры таблицы для тестирования
+DB_SIZES = [10000, 100000, 1000000]
+
+# Количество запусков каждого запроса
+NUM_RUNS = 20
+
+# Таблица для матрицы (отдельная, чтобы не менять схему django_users)
+TABLE = "index_matrix_users"
+
+# Колонки таблицы в порядке значений user_rows()
+USER_COLUMNS = django_index_benchmark.USER_COLUMNS + ["created_at"]
+
+# created_at растет вместе с id: строка с id N создана через N секунд после START_TIME
+START_TIME = datetime.datetime(2025, 1, 1)
+
+# Количество строк, попадающих в запрос по диапазону
+RANGE_ROWS = 1000
+
+TEST_NAME = django_index_benchmark.TEST_NAME
+
+# Вид индекса -> {имя индекса: CREATE INDEX ...}
+INDEX_VARIANTS = {
+    "none": {},
+    "btree": {"ix_matrix_btree": f"CREATE INDEX ix_matrix_btree ON {TABLE} (name)"},
+    "btree_pattern": {"ix_matrix_pattern": f"CREATE INDEX ix_matrix_pattern ON {TABLE} (name varchar_pattern_ops)"},
+    "hash": {"ix_matrix_hash": f"CREATE INDEX ix_matrix_hash ON {TABLE} USING hash (name)"},
+    "partial": {"ix_matrix_partial": f"CREATE INDEX ix_matrix_partial ON {TABLE} (name) WHERE is_active"},
+    "covering": {"ix_matrix_covering": f"CREATE INDEX ix_matrix_covering ON {TABLE} (name) INCLUDE (email)"},
+    "expression": {"ix_matrix_lower": f"CREATE INDEX ix_matrix_lower ON {TABLE} (lower(name))"},
+    "composite": {"ix_matrix_composite": f"CREATE INDEX ix_matrix_composite ON {TABLE} (is_active, name)"},
+    "btree_created_at": {"ix_matrix_created_btree": f"CREATE INDEX ix_matrix_created_btree ON {TABLE} (created_at)"},
+    "brin": {"ix_matrix_created_brin": f"CREATE INDEX ix_matrix_created_brin ON {TABLE} USING brin (created_at)"},
+}
+
+# Вид запроса -> SQL с именованными параметрами
+QUERIES = {
+    "equality": f"SELECT * FROM {TABLE} WHERE name = %(name)s",
+    "equality_projection": f"SELECT name, email FROM {TABLE} WHERE name = %(name)s",
+    "lower_equality": f"SELECT * FROM {TABLE} WHERE lower(name) = lower(%(name)s)",
+    "prefix": f"SELECT * FROM {TABLE} WHERE name LIKE %(prefix)s",
+    "range": f"SELECT * FROM {TABLE} WHERE created_at BETWEEN %(start)s AND %(end)s",
+    "boolean_filter": f"SELECT * FROM {TABLE} WHERE is_active AND name = %(name)s",
+}
+
+def query_params(db_size):
+    """Параметры запросов для таблицы из db_size записей"""
+    start = START_TIME + datetime.timedelta(seconds=db_size // 2)
+    return {
+        "name": TEST_NAME,
+        # 'User Name 1000%' находит User Name 1000, 10000, 100000... - несколько строк
+        "prefix": f"User Name {db_size // 10}%",
+        "start": start,
+        "end": start + datetime.timedelta(seconds=RANGE_ROWS - 1),
+    }
+
+def user_rows(db_size, loaded=0):
+    """Строки django_index_benchmark.user_rows() с колонкой created_at"""
+    for row in django_index_benchmark.user_rows(db_size, loaded):
+        yield row + (START_TIME + datetime.timedelta(seconds=row[0]),)
+
+def create_table(conn):
+    """Пересоздает пустую таблицу без вторичных индексов"""
+    cursor = conn.cursor()
+    cursor.execute(f"DROP TABLE IF EXISTS {TABLE}")
+    cursor.execute(f"""
+    CREATE TABLE {TABLE} (
+        id SERIAL PRIMARY KEY,
+        username VARCHAR(150) NOT NULL,
+        name VARCHAR(150) NOT NULL,
+        email VARCHAR(254) NOT NULL,
+        is_active BOOLEAN NOT NULL DEFAULT TRUE,
+        created_at TIMESTAMP NOT NULL
+    )
+    """)
+    conn.commit()
+    cursor.close()
+
+def vacuum(conn):
+    """VACUUM обновляет карту видимости, без нее покрывающий индекс не дает Index Only Scan"""
+    conn.autocommit = True
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute(f"VACUUM {TABLE}")
+    finally:
+        conn.autocommit = False
+
+def index_size(conn, names):
+    """Суммарный размер индексов в байтах"""
+    with conn.cursor() as cursor:
+        total = 0
+        for name in names:
+            cursor.execute("SELECT pg_relation_size(%s::regclass)", (name,))
+            total += cursor.fetchone()[0]
+    return total
+
+@harness.suite("benchmark_index_matrix")
+def run_benchmark():
+    """Замеряет все виды запросов для каждого вида индекса на каждом размере таблицы"""
+    # (размер, вид индекса, вид запроса) -> {'times', 'plan'}
+    results = {}
+    # (размер, вид индекса) -> {'size_bytes', 'build_ms'}
+    indexes = {}
+
+    try:
+        conn = django_index_benchmark.connect()
+        create_table(conn)
+        cursor = conn.cursor()
+    except Exception as e:
+        print(f"Произошла ошибка при настройке базы данных: {e}")
+        return
+
+    existing = set()
+
+    def grow(loaded, db_size):
+        # Индексы удаляем до загрузки, чтобы не замерять их обновление
+        sweep.apply_variant(conn, INDEX_VARIANTS, "none", existing)
+        loader.copy_rows(conn, TABLE, USER_COLUMNS, user_rows(db_size, loaded))
+        vacuum(conn)
+
+    def measure(db_size, variant):
+        params = query_params(db_size)
+        for index_kind in INDEX_VARIANTS:
+            # Сначала удаляем индексы предыдущего вида, чтобы замерить только построение
+            sweep.apply_variant(conn, INDEX_VARIANTS, "none", existing)
+            build_ms = sweep.apply_variant(conn, INDEX_VARIANTS, index_kind, existing) * 1000
+            sweep.analyze(conn, [TABLE])
+            size_bytes = index_size(conn, INDEX_VARIANTS[index_kind])
+            indexes[(db_size, index_kind)] = {'size_bytes': size_bytes, 'build_ms': build_ms}
+            print(f"{index_kind}: построение {build_ms:.1f} ms, размер {size_bytes / 1024:.0f} KB")
+
+            for query, sql in QUERIES.items():
+                times = harness.measure(
+                    lambda: cursor.execute(sql, params) or cursor.fetchall(), iterations=NUM_RUNS
+                )
+                plan = plans.explain(cursor, sql, params)
+                conn.rollback()
+                results[(db_size, index_kind, query)] = {'times': times, 'plan': plan}
+                harness.record(
+                    query, times, dataset_size=db_size, driver="psycopg2",
+                    index=index_kind, index_size_bytes=size_bytes, index_build_ms=build_ms, plan=plan
+                )
+
+    try:
+        sweep.run_sweep(conn, DB_SIZES, grow, measure, [TABLE])
+    except Exception as e:
+        print(f"Произошла ошибка: {e}")
+    finally:
+        cursor.close()
+        conn.close()
+
+    if len(results) < len(DB_SIZES) * len(INDEX_VARIANTS) * len(QUERIES):
+        return
+
+    # Выводим результаты
+    print("\n=== РЕЗУЛЬТАТЫ: МАТРИЦА ИНДЕКСОВ ===")
+    for db_size in DB_SIZES:
+        print(f"\nРазмер таблицы: {db_size} записей")
+        print("-" * 120)
+        print(f"{'Индекс':<18} {'Размер (KB)':<13} {'Построение (ms)':<17}")
+        print("-" * 120)
+        for index_kind in INDEX_VARIANTS:
+            index = indexes[(db_size, index_kind)]
+            print(f"{index_kind:<18} {index['size_bytes'] / 1024:<13.0f} {index['build_ms']:<17.1f}")
+
+        for query in QUERIES:
+            print(f"\nЗапрос {query}:")
+            print("-" * 120)
+            print(f"{'Индекс':<18} {'Среднее (ms)':<14} {'p95 (ms)':<12} {'Блоки hit/read':<16} {'План'}")
+            print("-" * 120)
+            baseline = statistics.mean(results[(db_size, "none", query)]['times'])
+            best = min(INDEX_VARIANTS, key=lambda kind: statistics.mean(results[(db_size, kind, query)]['times']))
+            for index_kind in INDEX_VARIANTS:
+                result = results[(db_size, index_kind, query)]
+                mean = statistics.mean(result['times'])
+                hit, read = plans.buffers(result['plan'])
+                print(f"{index_kind:<18} {mean:<14.3f} {harness.percentile(result['times'], 95):<12.3f} "
+                      f"{f'{hit}/{read}':<16} {plans.describe(result['plan'])}")
+            best_mean = statistics.mean(results[(db_size, best, query)]['times'])
+            print(f"Лучший индекс: {best} ({baseline / best_mean:.1f}x быстрее, чем без индекса)")
+
+if __name__ == "__main__":
+    run_benchmark()
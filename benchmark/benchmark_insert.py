@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+import time
+import psycopg2.extras
+from sqlalchemy import create_engine, insert
+from sqlalchemy.orm import sessionmaker
+
+import backends
+import benchmark
+import harness
+import loader
+
+# Количество строк в таблице до начала вставки
+TABLE_SIZES = [0, 100000]
+
+# Размеры пакетов (одна транзакция на пакет)
+BATCH_SIZES = [100, 1000, 10000]
+
+# Количество вставляемых строк в каждом тесте
+INSERT_ROWS = 20000
+
+# Инициализация SQLAlchemy
+engine = create_engine(backends.DB_URL)
+Session = sessionmaker(bind=engine)
+
+# Модель User из benchmark.py
+User = benchmark.User
+
+INSERT_SQL = f"INSERT INTO users ({', '.join(loader.USER_COLUMNS)}) VALUES ({', '.join(['%s'] * len(loader.USER_COLUMNS))})"
+
+def batches(start, count, batch_size):
+    """Разбивает строки users с id из [start, start + count) на пакеты"""
+    for batch_start in range(start, start + count, batch_size):
+        batch_end = min(batch_start + batch_size, start + count)
+        yield list(loader.user_rows(batch_start, batch_end))
+
+def as_mappings(batch):
+    return [dict(zip(loader.USER_COLUMNS, row)) for row in batch]
+
+# Способы вставки: каждый получает пакет кортежей и вставляет его одной транзакцией
+def insert_orm_add_all(session, conn, batch):
+    session.add_all([User(**mapping) for mapping in as_mappings(batch)])
+    session.commit()
+    # Не даем карте идентичности расти от пакета к пакету
+    session.expunge_all()
+
+def insert_orm_bulk_mappings(session, conn, batch):
+    session.bulk_insert_mappings(User, as_mappings(batch))
+    session.commit()
+
+def insert_core(session, conn, batch):
+    # SQLAlchemy 2.0 выполняет список параметров через insertmanyvalues
+    with engine.begin() as connection:
+        connection.execute(insert(User.__table__), as_mappings(batch))
+
+def insert_executemany(session, conn, batch):
+    with conn.cursor() as cur:
+        cur.executemany(INSERT_SQL, batch)
+    conn.commit()
+
+def insert_execute_values(session, conn, batch):
+    with conn.cursor() as cur:
+        psycopg2.extras.execute_values(
+            cur, f"INSERT INTO users ({', '.join(loader.USER_COLUMNS)}) VALUES %s", batch, page_size=len(batch)
+        )
+    conn.commit()
+
+def insert_copy(session, conn, batch):
+    loader.copy_rows(conn, "users", loader.USER_COLUMNS, batch, verbose=False)
+
+# Название способа -> (функция вставки, драйвер)
+METHODS = {
+    "orm_add_all": (insert_orm_add_all, "sqlalchemy-orm"),
+    "orm_bulk_insert_mappings": (insert_orm_bulk_mappings, "sqlalchemy-orm"),
+    "core_insert": (insert_core, "sqlalchemy-core"),
+    "executemany": (insert_executemany, "psycopg2"),
+    "execute_values": (insert_execute_values, "psycopg2"),
+    "copy": (insert_copy, "psycopg2"),
+}
+
+def reset_table(conn, table_size):
+    """Пересоздает таблицу users и заполняет ее table_size строками"""
+    benchmark.Base.metadata.drop_all(engine)
+    benchmark.Base.metadata.create_all(engine)
+    if table_size > 0:
+        loader.copy_rows(conn, "users", loader.USER_COLUMNS, loader.user_rows(1, table_size + 1), verbose=False)
+    with conn.cursor() as cur:
+        cur.execute("ANALYZE users")
+    conn.commit()
+
+def run_method(method, table_size, batch_size, conn):
+    """Вставляет INSERT_ROWS строк заданным способом и возвращает время каждого пакета"""
+    insert_batch, _ = METHODS[method]
+    reset_table(conn, table_size)
+    session = Session()
+    times = []
+    try:
+        for batch in batches(table_size + 1, INSERT_ROWS, batch_size):
+            start_time = time.perf_counter()
+            insert_batch(session, conn, batch)
+            end_time = time.perf_counter()
+            times.append((end_time - start_time) * 1000)  # Время в миллисекундах
+    finally:
+        session.close()
+    return times
+
+@harness.suite("benchmark_insert")
+def run_benchmark():
+    """Сравнение способов вставки строк в таблицу users"""
+    results = {}
+
+    try:
+        conn = backends.current().connect()
+
+        for table_size in TABLE_SIZES:
+            for batch_size in BATCH_SIZES:
+                for method, (_, driver) in METHODS.items():
+                    print(f"Вставка {INSERT_ROWS} строк: {method}, пакет {batch_size}, таблица с {table_size} строками...")
+                    times = run_method(method, table_size, batch_size, conn)
+                    rows_per_second = INSERT_ROWS / (sum(times) / 1000)
+                    results[(table_size, batch_size, method)] = (rows_per_second, times)
+                    harness.record(
+                        method, times, dataset_size=table_size, driver=driver,
+                        batch_size=batch_size, rows=INSERT_ROWS, rows_per_second=rows_per_second
+                    )
+
+        conn.close()
+
+    except Exception as e:
+        print(f"Произошла ошибка: {e}")
+        if 'conn' in locals():
+            conn.close()
+
+    # Выводим результаты
+    print("\n=== РЕЗУЛЬТАТЫ БЕНЧМАРКА ВСТАВКИ ===")
+
+    for table_size in TABLE_SIZES:
+        print(f"\nТаблица с {table_size} строками до вставки:")
+        print("-" * 100)
+        print(f"{'Способ':<26} {'Пакет':<8} {'Строк/с':<12} {'p50 пакета (ms)':<17} {'p95 пакета (ms)':<17} {'Макс (ms)':<12}")
+        print("-" * 100)
+
+        for batch_size in BATCH_SIZES:
+            for method in METHODS:
+                key = (table_size, batch_size, method)
+                if key not in results:
+                    continue
+                rows_per_second, times = results[key]
+                print(f"{method:<26} {batch_size:<8} {rows_per_second:<12.0f} {harness.percentile(times, 50):<17.3f} {harness.percentile(times, 95):<17.3f} {max(times):<12.3f}")
+
+if __name__ == "__main__":
+    run_benchmark()
@@ -0,0 +1,198 @@
+#!/usr/bin/env python3
+import time
+import random
+import threading
+from concurrent.futures import ProcessPoolExecutor
+import psycopg2.pool
+from sqlalchemy import create_engine
+
+import backends
+import harness
+import histogram
+import django_index_benchmark
+
+# Размер таблицы django_users
+DB_SIZE = 100000
+
+# Количество параллельных клиентов
+WORKER_COUNTS = [1, 2, 4, 8, 16]
+
+# Размеры пула соединений (для потоков пул общий)
+POOL_SIZES = [1, 4, 16]
+
+# Количество процессов (у каждого процесса свой пул из одного соединения)
+PROCESS_COUNTS = [1, 2, 4, 8]
+
+# Пулы соединений: psycopg2 ThreadedConnectionPool и SQLAlchemy QueuePool
+DRIVERS = ["psycopg2", "sqlalchemy-core"]
+
+# Длительность нагрузки для одной конфигурации, секунды
+DURATION = 3
+
+# Сценарии из django_index_benchmark.py: SQL и генератор параметров запроса
+SCENARIOS = {
+    "pk_lookup": (
+        "SELECT * FROM django_users WHERE id = %(id)s",
+        lambda rng: {"id": rng.randint(1, DB_SIZE)}
+    ),
+    "limit_10": (
+        "SELECT * FROM django_users LIMIT 10",
+        lambda rng: {}
+    ),
+    "name_lookup": (
+        "SELECT * FROM django_users WHERE name = %(name)s",
+        lambda rng: {"name": django_index_benchmark.TEST_NAME}
+    ),
+}
+
+class Psycopg2Pool:
+    """Общий для потоков пул соединений psycopg2"""
+
+    def __init__(self, size):
+        self.pool = psycopg2.pool.ThreadedConnectionPool(size, size, backends.DB_URL)
+        # Соединения без транзакций, чтобы не платить за COMMIT после каждого SELECT
+        conns = [self.pool.getconn() for _ in range(size)]
+        for conn in conns:
+            conn.autocommit = True
+            self.pool.putconn(conn)
+        # ThreadedConnectionPool не ждет свободного соединения, поэтому ограничиваем выдачу
+        self.available = threading.Semaphore(size)
+
+    def query(self, sql, params):
+        with self.available:
+            conn = self.pool.getconn()
+            try:
+                with conn.cursor() as cur:
+                    cur.execute(sql, params)
+                    return cur.fetchall()
+            finally:
+                self.pool.putconn(conn)
+
+    def close(self):
+        self.pool.closeall()
+
+class SQLAlchemyPool:
+    """Общий для потоков QueuePool SQLAlchemy"""
+
+    def __init__(self, size):
+        self.engine = create_engine(
+            backends.DB_URL, pool_size=size, max_overflow=0, pool_timeout=60, isolation_level="AUTOCOMMIT"
+        )
+
+    def query(self, sql, params):
+        with self.engine.connect() as connection:
+            return connection.exec_driver_sql(sql, params).fetchall()
+
+    def close(self):
+        self.engine.dispose()
+
+POOLS = {
+    "psycopg2": Psycopg2Pool,
+    "sqlalchemy-core": SQLAlchemyPool,
+}
+
+def run_worker(pool, scenario, start_at, seed):
+    """Выполняет запросы сценария до истечения DURATION и возвращает гистограмму задержек"""
+    sql, make_params = SCENARIOS[scenario]
+    rng = random.Random(seed)
+
+    # Все клиенты начинают нагрузку одновременно
+    time.sleep(max(0, start_at - time.time()))
+    return harness.measure_histogram(lambda: pool.query(sql, make_params(rng)), duration=DURATION)
+
+def run_process_worker(driver, scenario, start_at, seed):
+    """Точка входа процесса: собственный пул из одного соединения"""
+    pool = POOLS[driver](1)
+    try:
+        return run_worker(pool, scenario, start_at, seed)
+    finally:
+        pool.close()
+
+def run_threads(driver, scenario, workers, pool_size):
+    """Запускает workers потоков с общим пулом из pool_size соединений"""
+    pool = POOLS[driver](pool_size)
+    results = [None] * workers
+    start_at = time.time() + 0.5
+
+    def target(index):
+        results[index] = run_worker(pool, scenario, start_at, index)
+
+    threads = [threading.Thread(target=target, args=(i,)) for i in range(workers)]
+    try:
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    finally:
+        pool.close()
+    return results
+
+def run_processes(driver, scenario, processes):
+    """Запускает processes процессов, у каждого свое соединение"""
+    # Запас времени на запуск интерпретаторов и подключение к базе
+    start_at = time.time() + 2
+    with ProcessPoolExecutor(max_workers=processes) as executor:
+        futures = [
+            executor.submit(run_process_worker, driver, scenario, start_at, i)
+            for i in range(processes)
+        ]
+        return [future.result() for future in futures]
+
+def summarize(per_worker_histograms):
+    """Объединяет гистограммы клиентов и считает QPS и перцентили задержки"""
+    latencies = histogram.Histogram()
+    for worker_histogram in per_worker_histograms:
+        latencies.merge(worker_histogram)
+    summary = latencies.summary()
+    summary['qps'] = latencies.count / DURATION
+    summary['histogram'] = latencies
+    return summary
+
+@harness.suite("benchmark_load", exclusive=True)
+def run_benchmark():
+    """Нагрузка несколькими клиентами через пул соединений"""
+    results = []
+
+    conn = django_index_benchmark.setup_database(DB_SIZE, with_index=True)
+    if not conn:
+        return
+    conn.close()
+
+    try:
+        for scenario in SCENARIOS:
+            for driver in DRIVERS:
+                for pool_size in POOL_SIZES:
+                    for workers in WORKER_COUNTS:
+                        print(f"{scenario}, {driver}: {workers} потоков, пул {pool_size}...")
+                        summary = summarize(run_threads(driver, scenario, workers, pool_size))
+                        results.append((scenario, driver, "threads", workers, pool_size, summary))
+
+                for processes in PROCESS_COUNTS:
+                    print(f"{scenario}, {driver}: {processes} процессов...")
+                    summary = summarize(run_processes(driver, scenario, processes))
+                    results.append((scenario, driver, "processes", processes, processes, summary))
+
+    except Exception as e:
+        print(f"Произошла ошибка: {e}")
+
+    for scenario, driver, mode, workers, pool_size, summary in results:
+        harness.record(
+            scenario, [], dataset_size=DB_SIZE, driver=driver, histogram=summary['histogram'],
+            mode=mode, workers=workers, pool_size=pool_size, qps=summary['qps']
+        )
+
+    # Выводим результаты
+    print("\n=== РЕЗУЛЬТАТЫ НАГРУЗОЧНОГО ТЕСТА ===")
+
+    for scenario in SCENARIOS:
+        print(f"\n{scenario}:")
+        print("-" * 127)
+        print(f"{'Драйвер':<17} {'Режим':<11} {'Клиентов':<10} {'Пул':<6} {'QPS':<12} {'p50 (ms)':<12} {'p95 (ms)':<12} {'p99 (ms)':<12} {'p99.9 (ms)':<12} {'Макс (ms)':<12}")
+        print("-" * 127)
+        for name, driver, mode, workers, pool_size, summary in results:
+            if name != scenario:
+                continue
+            print(f"{driver:<17} {mode:<11} {workers:<10} {pool_size:<6} {summary['qps']:<12.0f} {summary['p50']:<12.3f} {summary['p95']:<12.3f} {summary['p99']:<12.3f} {summary['p99.9']:<12.3f} {summary['max']:<12.3f}")
+
+if __name__ == "__main__":
+    run_benchmark()
@@ -0,0 +1,182 @@
+#!/usr/bin/env python3
+"""
+Стоимость представления строк результата: время и память на строку.
+
+Одни и те же строки таблицы users (id <= n) выбираются в разных видах:
+объекты ORM, объекты ORM с load_only, проекция колонок ORM
+(with_entities), Row из SQLAlchemy Core, кортежи psycopg2, словари
+(RealDictCursor), именованные кортежи (NamedTupleCursor) и легкие
+объекты с __slots__, собранные из кортежей.
+
+Для каждого вида замеряется время выборки и через tracemalloc - память
+на строку: retained - сколько занимает готовый результат, пока он жив
+(для ORM вместе с картой идентичности сессии), peak - пик во время
+выборки вместе с временными буферами драйвера.
+"""
+import gc
+import statistics
+import tracemalloc
+
+import psycopg2.extras
+from sqlalchemy import select
+from sqlalchemy.orm import sessionmaker, load_only
+
+import backends
+import benchmark
+import datasets
+import harness
+
+# Количество выбираемых строк
+ROW_COUNTS = [10000, 100000, 1000000]
+
+# Количество повторений замера времени
+NUM_RUNS = 3
+
+Session = sessionmaker()
+
+# Модель User из benchmark.py
+User = benchmark.User
+
+# Легкая запись без __dict__: атрибуты хранятся в слотах объекта
+class UserRecord:
+    __slots__ = ("id", "name", "email", "phone", "address", "city", "country", "zipcode")
+
+    def __init__(self, id, name, email, phone, address, city, country, zipcode):
+        self.id = id
+        self.name = name
+        self.email = email
+        self.phone = phone
+        self.address = address
+        self.city = city
+        self.country = country
+        self.zipcode = zipcode
+
+# Колонки для вариантов с проекцией
+PROJECTION = [User.id, User.name, User.email]
+
+SQL = "SELECT * FROM users WHERE id <= %s"
+
+class Context:
+    """Соединения, которые получают функции выборки"""
+
+    def __init__(self, conn, connection, session):
+        self.conn = conn
+        self.connection = connection
+        self.session = session
+
+def fetch_sql(ctx, n, cursor_factory=None):
+    with ctx.conn.cursor(cursor_factory=cursor_factory) as cur:
+        cur.execute(SQL, (n,))
+        rows = cur.fetchall()
+    ctx.conn.commit()
+    return rows
+
+def fetch_slots(ctx, n):
+    return [UserRecord(*row) for row in fetch_sql(ctx, n)]
+
+def fetch_core(ctx, n):
+    users = User.__table__
+    rows = ctx.connection.execute(select(users).where(users.c.id <= n)).all()
+    ctx.connection.commit()
+    return rows
+
+def fetch_orm(ctx, n):
+    return ctx.session.query(User).filter(User.id <= n).all()
+
+def fetch_orm_load_only(ctx, n):
+    return ctx.session.query(User).options(load_only(*PROJECTION)).filter(User.id <= n).all()
+
+def fetch_orm_with_entities(ctx, n):
+    return ctx.session.query(User).with_entities(*PROJECTION).filter(User.id <= n).all()
+
+# Вид результата -> (функция выборки, драйвер, количество колонок)
+FORMATS = {
+    "tuples": (fetch_sql, "psycopg2", 8),
+    "dicts": (lambda ctx, n: fetch_sql(ctx, n, psycopg2.extras.RealDictCursor), "psycopg2", 8),
+    "namedtuples": (lambda ctx, n: fetch_sql(ctx, n, psycopg2.extras.NamedTupleCursor), "psycopg2", 8),
+    "slots": (fetch_slots, "psycopg2", 8),
+    "core_rows": (fetch_core, "sqlalchemy-core", 8),
+    "orm_entities": (fetch_orm, "sqlalchemy-orm", 8),
+    "orm_load_only": (fetch_orm_load_only, "sqlalchemy-orm", len(PROJECTION)),
+    "orm_with_entities": (fetch_orm_with_entities, "sqlalchemy-orm", len(PROJECTION)),
+}
+
+def reset(ctx):
+    """Очищает карту идентичности, чтобы объекты ORM не переживали замер"""
+    ctx.session.rollback()
+    ctx.session.expunge_all()
+    gc.collect()
+
+def measure_memory(ctx, fetch, n):
+    """
+    Память результата выборки через tracemalloc
+
+    Returns:
+        (retained - занято, пока результат жив; peak - пик во время выборки), в байтах
+    """
+    reset(ctx)
+    tracemalloc.start()
+    try:
+        baseline = tracemalloc.get_traced_memory()[0]
+        result = fetch(ctx, n)
+        retained, peak = tracemalloc.get_traced_memory()
+        del result
+    finally:
+        tracemalloc.stop()
+    reset(ctx)
+    return retained - baseline, peak - baseline
+
+@harness.suite("benchmark_materialize")
+def run_benchmark():
+    """Сравнение видов результата по времени и памяти на строку"""
+    results = {}
+    backend = backends.current()
+    engine = backend.create_engine()
+
+    try:
+        conn = backend.connect()
+        datasets.ensure(conn, datasets.users(1, max(ROW_COUNTS) + 1))
+
+        with engine.connect() as connection:
+            session = Session(bind=engine)
+            ctx = Context(conn, connection, session)
+            try:
+                for n in ROW_COUNTS:
+                    print(f"\nВыборка {n} строк:")
+                    for name, (fetch, driver, columns) in FORMATS.items():
+                        samples = []
+                        for _ in range(NUM_RUNS):
+                            reset(ctx)
+                            samples.extend(harness.measure(lambda: fetch(ctx, n), iterations=1))
+                        retained, peak = measure_memory(ctx, fetch, n)
+                        results[(n, name)] = (statistics.median(samples), retained / n, peak / n)
+                        print(f"{name}: {statistics.median(samples):.2f} ms, {retained / n:.0f} байт/строку")
+                        harness.record(
+                            name, samples, dataset_size=n, driver=driver, columns=columns,
+                            retained_bytes_per_row=retained / n, peak_bytes_per_row=peak / n
+                        )
+            finally:
+                session.close()
+        conn.close()
+
+    except Exception as e:
+        print(f"Произошла ошибка: {e}")
+        if 'conn' in locals():
+            conn.close()
+    finally:
+        engine.dispose()
+
+    # Выводим результаты
+    print("\n=== РЕЗУЛЬТАТЫ ПО ВИДАМ РЕЗУЛЬТАТА ===")
+    print("-" * 100)
+    print(f"{'Строк':<10} {'Вид':<20} {'Время (ms)':<14} {'мкс/строку':<12} {'Байт/строку':<14} {'Пик байт/строку':<16}")
+    print("-" * 100)
+    for n in ROW_COUNTS:
+        for name in FORMATS:
+            if (n, name) not in results:
+                continue
+            time_ms, retained, peak = results[(n, name)]
+            print(f"{n:<10} {name:<20} {time_ms:<14.2f} {time_ms * 1000 / n:<12.2f} {retained:<14.0f} {peak:<16.0f}")
+
+if __name__ == "__main__":
+    run_benchmark()
@@ -0,0 +1,318 @@
+#!/usr/bin/env python3
+"""
+Нагрузка в открытом цикле на схеме User/Post/Comment из django_benchmark.py.
+
+Замеры в закрытом цикле (следующий запрос после ответа на предыдущий)
+занижают задержку под нагрузкой: пока запрос ждет, новые не отправляются,
+и очередь, которую увидели бы реальные клиенты, не возникает (coordinated
+omission). Здесь время начала каждой операции назначается заранее:
+операции приходят с заданной средней частотой (пуассоновский поток) и
+разбираются THREADS потоками, у каждого свое соединение. Задержка
+считается от назначенного времени начала, поэтому в нее входит ожидание
+свободного потока; время выполнения самого запроса (service) сохраняется
+отдельно.
+
+Смесь операций задается в MIX: чтение пользователя по первичному ключу,
+поиск по username, вставка поста и одобрение комментария. Частота
+перебирается по RATES; колено - наибольшая частота, на которой поток
+успевает за нагрузкой, а p99 задержки не превышает KNEE_FACTOR значений
+p99 на наименьшей частоте.
+
+Если поток отстал от расписания больше чем в MAX_OVERRUN раз, оставшиеся
+операции не выполняются, но попадают в гистограммы задержки со временем
+от назначенного начала до остановки нагрузки. Для таких частот задержка -
+нижняя граница (в записи latency_lower_bound, в таблице отмечена "*").
+"""
+import random
+import threading
+import time
+
+import backends
+import datagen
+import django_benchmark
+import harness
+import histogram
+import sweep
+
+# Количество пользователей (постов примерно в 2 раза, комментариев в 6 раз больше)
+DB_SIZE = 10000
+
+# Целевые частоты операций в секунду
+RATES = [100, 200, 500, 1000, 2000, 5000]
+
+# Количество потоков, которые выполняют операции
+THREADS = 8
+
+# Длительность нагрузки на одной частоте, секунды
+DURATION = 5
+
+# Если поток отстал от расписания больше чем в MAX_OVERRUN раз, оставшиеся
+# операции не выполняются и считаются пропущенными (их задержка - время
+# от назначенного начала до остановки нагрузки)
+MAX_OVERRUN = 2
+
+# Во сколько раз p99 может вырасти относительно наименьшей частоты до колена
+KNEE_FACTOR = 10
+
+# Доля операций каждого вида
+MIX = {
+    "pk_read": 0.5,
+    "username_lookup": 0.3,
+    "post_insert": 0.1,
+    "comment_approve": 0.1,
+}
+
+# Зерно расписания и параметров
+SEED = 42
+
+# Операции: SQL и генератор параметров по количеству пользователей и комментариев
+OPERATIONS = {
+    "pk_read": (
+        'SELECT * FROM "user" WHERE id = %s',
+        lambda rng, users, comments: (rng.randint(1, users),)
+    ),
+    "username_lookup": (
+        'SELECT * FROM "user" WHERE username = %s',
+        lambda rng, users, comments: (django_benchmark.username(rng.randint(1, users)),)
+    ),
+    "post_insert": (
+        "INSERT INTO post (title, content, author_id, is_published, created_at, updated_at) "
+        "VALUES (%s, %s, %s, true, now(), now())",
+        lambda rng, users, comments: ("Open loop post", "Open loop content", rng.randint(1, users))
+    ),
+    "comment_approve": (
+        "UPDATE comment SET is_approved = true, updated_at = now() WHERE id = %s",
+        lambda rng, users, comments: (rng.randint(1, comments),)
+    ),
+}
+
+def make_schedule(rate, rng):
+    """Расписание [(смещение от начала в секундах, операция)] пуассоновского потока с частотой rate"""
+    names = list(MIX)
+    weights = [MIX[name] for name in names]
+    schedule = []
+    offset = rng.expovariate(rate)
+    while offset < DURATION:
+        schedule.append((offset, rng.choices(names, weights)[0]))
+        offset += rng.expovariate(rate)
+    return schedule
+
+class Dispatcher:
+    """Раздает потокам операции из расписания по порядку"""
+
+    def __init__(self, schedule, start):
+        self.schedule = schedule
+        self.start = start
+        self.deadline = start + DURATION * MAX_OVERRUN
+        self.position = 0
+        self.lock = threading.Lock()
+
+    def next(self):
+        """(назначенное время perf_counter, операция) или None, если операции кончились"""
+        with self.lock:
+            if self.position >= len(self.schedule) or time.perf_counter() > self.deadline:
+                return None
+            offset, name = self.schedule[self.position]
+            self.position += 1
+        return self.start + offset, name
+
+def run_worker(conn, dispatcher, seed, users, comments):
+    """
+    Выполняет операции из расписания
+
+    Returns:
+        ({операция: гистограмма задержки от назначенного времени},
+         {операция: гистограмма времени выполнения}, время окончания последней операции)
+    """
+    rng = random.Random(seed)
+    latencies = {name: histogram.Histogram() for name in MIX}
+    service = {name: histogram.Histogram() for name in MIX}
+    finished = dispatcher.start
+    with conn.cursor() as cur:
+        while True:
+            task = dispatcher.next()
+            if task is None:
+                break
+            intended, name = task
+            delay = intended - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            sql, make_params = OPERATIONS[name]
+            start_time = time.perf_counter()
+            cur.execute(sql, make_params(rng, users, comments))
+            finished = time.perf_counter()
+            latencies[name].record((finished - intended) * 1000)  # Время в миллисекундах
+            service[name].record((finished - start_time) * 1000)
+    return latencies, service, finished
+
+def run_rate(conns, rate, rng, users, comments):
+    """Нагрузка с частотой rate; возвращает итоги по операциям и по всей смеси"""
+    schedule = make_schedule(rate, rng)
+    dispatcher = Dispatcher(schedule, time.perf_counter() + 0.5)
+    results = [None] * len(conns)
+    errors = []
+
+    def target(index):
+        # Исключение в потоке не доходит до join(), поэтому сохраняем его
+        try:
+            results[index] = run_worker(conns[index], dispatcher, SEED + index, users, comments)
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=target, args=(i,)) for i in range(len(conns))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    stopped = time.perf_counter()
+    if errors:
+        raise errors[0]
+
+    latencies = {name: histogram.Histogram() for name in MIX}
+    service = {name: histogram.Histogram() for name in MIX}
+    for worker_latencies, worker_service, _ in results:
+        for name in MIX:
+            latencies[name].merge(worker_latencies[name])
+            service[name].merge(worker_service[name])
+
+    # Невыполненные операции тоже ждали: без них из p99 выпали бы самые медленные
+    for offset, name in schedule[dispatcher.position:]:
+        latencies[name].record((stopped - dispatcher.start - offset) * 1000)
+    mix_latency = histogram.Histogram()
+    mix_service = histogram.Histogram()
+    for name in MIX:
+        mix_latency.merge(latencies[name])
+        mix_service.merge(service[name])
+
+    elapsed = max(finished for _, _, finished in results) - dispatcher.start
+    completed = mix_service.count
+    return {
+        "scheduled": len(schedule),
+        "offered_rate": len(schedule) / DURATION,
+        "completed": completed,
+        "dropped": len(schedule) - completed,
+        "achieved_rate": completed / elapsed if elapsed > 0 else 0.0,
+        "latencies": dict(latencies, mix=mix_latency),
+        "service": dict(service, mix=mix_service),
+    }
+
+def find_knee(summaries):
+    """
+    Наибольшая частота до насыщения или None, если насыщена уже наименьшая
+
+    Частота насыщена, если есть пропущенные операции, выполнено меньше 95%
+    фактически назначенного потока или p99 выросло больше чем в KNEE_FACTOR раз.
+    """
+    base_p99 = None
+    knee = None
+    for rate in sorted(summaries):
+        summary = summaries[rate]
+        mix = summary["latencies"]["mix"]
+        if not mix.count:
+            break
+        p99 = mix.percentile(99)
+        if base_p99 is None:
+            base_p99 = p99
+        saturated = (
+            summary["dropped"] > 0
+            or summary["achieved_rate"] < 0.95 * summary["offered_rate"]
+            or p99 > KNEE_FACTOR * base_p99
+        )
+        if saturated:
+            break
+        knee = rate
+    return knee
+
+def prepare(conn, engine):
+    """Пересоздает схему django_benchmark.py и заполняет ее DB_SIZE пользователями"""
+    print(f"\nНастройка базы данных с {DB_SIZE} пользователями...")
+    django_benchmark.Base.metadata.drop_all(engine)
+    django_benchmark.Base.metadata.create_all(engine)
+    django_benchmark.grow_database(conn, datagen.DatasetGenerator(), 0, DB_SIZE)
+    sweep.analyze(conn, django_benchmark.TABLES.values())
+
+    cur = conn.cursor()
+    cur.execute(f'SELECT max(id) FROM {django_benchmark.TABLES["user"]}')
+    users = cur.fetchone()[0]
+    cur.execute("SELECT max(id) FROM comment")
+    comments = cur.fetchone()[0]
+    cur.close()
+    conn.commit()
+    return users, comments
+
+@harness.suite("benchmark_openloop", exclusive=True)
+def run_benchmark():
+    """Смешанная нагрузка в открытом цикле с перебором частоты"""
+    summaries = {}
+    backend = backends.current()
+    engine = backend.create_engine()
+    rng = random.Random(SEED)
+    conns = []
+
+    try:
+        conn = backend.connect()
+        users, comments = prepare(conn, engine)
+        conn.close()
+
+        # Соединения без транзакций: каждая операция фиксируется сразу
+        for _ in range(THREADS):
+            worker_conn = backend.connect()
+            worker_conn.autocommit = True
+            conns.append(worker_conn)
+
+        for rate in RATES:
+            print(f"\nЧастота {rate} оп/с, {THREADS} потоков...")
+            summary = run_rate(conns, rate, rng, users, comments)
+            summaries[rate] = summary
+            mix = summary["latencies"]["mix"]
+            if mix.count:
+                print(f"Выполнено {summary['completed']} из {summary['scheduled']}, "
+                      f"{summary['achieved_rate']:.0f} оп/с, p99 {mix.percentile(99):.3f} ms")
+            for name, latencies in summary["latencies"].items():
+                if not latencies.count:
+                    continue
+                service = summary["service"][name]
+                harness.record(
+                    name, [], dataset_size=DB_SIZE, driver=backend.driver, histogram=latencies,
+                    rate=rate, workers=THREADS, offered_rate=summary["offered_rate"],
+                    achieved_rate=summary["achieved_rate"], dropped=summary["dropped"],
+                    latency_lower_bound=summary["dropped"] > 0,
+                    service_p50=service.percentile(50) if service.count else None,
+                    service_p99=service.percentile(99) if service.count else None
+                )
+
+    except Exception as e:
+        print(f"Произошла ошибка: {e}")
+    finally:
+        for worker_conn in conns:
+            worker_conn.close()
+        engine.dispose()
+
+    # Выводим результаты
+    print("\n=== РЕЗУЛЬТАТЫ НАГРУЗКИ В ОТКРЫТОМ ЦИКЛЕ (вся смесь) ===")
+    print("-" * 118)
+    print(f"{'Частота':<10} {'Достигнуто':<12} {'Пропущено':<11} {'p50 (ms)':<11} {'p99 (ms)':<11} {'p99.9 (ms)':<12} "
+          f"{'Макс (ms)':<12} {'Выполнение p50':<16} {'Выполнение p99':<16}")
+    print("-" * 118)
+    for rate, summary in summaries.items():
+        mix = summary["latencies"]["mix"]
+        service = summary["service"]["mix"]
+        if not service.count:
+            continue
+        # "*" - были пропущенные операции, задержка - нижняя граница
+        mark = "*" if summary["dropped"] else ""
+        print(f"{rate:<10} {summary['achieved_rate']:<12.0f} {summary['dropped']:<11} "
+              f"{f'{mix.percentile(50):.3f}{mark}':<11} {f'{mix.percentile(99):.3f}{mark}':<11} "
+              f"{f'{mix.percentile(99.9):.3f}{mark}':<12} {f'{mix.max:.3f}{mark}':<12} "
+              f"{service.percentile(50):<16.3f} {service.percentile(99):<16.3f}")
+    if any(summary["dropped"] for summary in summaries.values()):
+        print("* часть операций не выполнена, задержка - нижняя граница")
+
+    knee = find_knee(summaries)
+    if knee is None:
+        print("\nКолено не найдено: нагрузка насыщает базу уже на наименьшей частоте")
+    else:
+        print(f"\nКолено пропускной способности: {knee} оп/с")
+
+if __name__ == "__main__":
+    run_benchmark()
@@ -0,0 +1,211 @@
+#!/usr/bin/env python3
+"""
+Постраничное чтение на разной глубине: OFFSET, keyset и серверный курсор.
+
+Страница из PAGE_SIZE строк в порядке id запрашивается на глубине от
+начала таблицы до ее последних страниц тремя способами:
+- offset - ORDER BY id LIMIT n OFFSET k: сервер читает и отбрасывает k строк;
+- keyset - WHERE id > последний_id ORDER BY id LIMIT n: поиск по индексу
+  первичного ключа, стоимость не зависит от глубины;
+- cursor - открытый серверный курсор (именованный курсор psycopg2,
+  yield_per в ORM), который уже стоит на нужной глубине: замеряется
+  получение следующих страниц. Стоимость перемещения курсора на глубину
+  (MOVE на сервере, пропуск строк на клиенте в ORM) сохраняется отдельно
+  в поле position_ms.
+
+Таблица users берется из кэша наборов данных, post и comment - из схемы
+django_benchmark.py, которая наращивается по DJANGO_SIZES.
+"""
+import statistics
+import time
+
+from sqlalchemy import select
+from sqlalchemy.orm import sessionmaker
+
+import backends
+import benchmark
+import datagen
+import datasets
+import django_benchmark
+import harness
+import sweep
+
+# Размеры таблицы users
+USER_SIZES = [10000, 100000, 1000000]
+
+# Количество пользователей в схеме django_benchmark.py (постов примерно в 2 раза,
+# комментариев в 6 раз больше)
+DJANGO_SIZES = [1000, 10000, 100000]
+
+# Количество строк на странице
+PAGE_SIZE = 20
+
+# Глубина страницы как доля таблицы; 1.0 - последние страницы
+DEPTH_FRACTIONS = [0, 0.001, 0.01, 0.1, 0.5, 1.0]
+
+# Количество повторений каждого замера (для курсора - количество страниц подряд)
+NUM_RUNS = 10
+
+# Способы постраничного чтения
+METHODS = ["offset", "keyset", "cursor"]
+
+Session = sessionmaker()
+
+# Модель User из benchmark.py
+User = benchmark.User
+
+# Таблица в SQL -> модель ORM
+MODELS = {
+    "users": User,
+    "post": django_benchmark.Post,
+    "comment": django_benchmark.Comment,
+}
+
+def depths(rows):
+    """Смещения страниц для таблицы из rows строк; после последнего остается NUM_RUNS страниц"""
+    deepest = max(0, rows - PAGE_SIZE * NUM_RUNS)
+    return sorted({min(int(rows * fraction), deepest) for fraction in DEPTH_FRACTIONS})
+
+def last_id_before(cur, table, offset):
+    """id последней строки перед страницей со смещением offset (0 - до первой строки)"""
+    if offset == 0:
+        return 0
+    cur.execute(f"SELECT id FROM {table} ORDER BY id OFFSET %s LIMIT 1", (offset - 1,))
+    return cur.fetchone()[0]
+
+def measure_sql(conn, table, offset, last_id):
+    """Замеры psycopg2: {способ: (значения в ms, время перемещения курсора в ms)}"""
+    cur = conn.cursor()
+    results = {}
+
+    def offset_page():
+        cur.execute(f"SELECT * FROM {table} ORDER BY id LIMIT %s OFFSET %s", (PAGE_SIZE, offset))
+        return cur.fetchall()
+
+    def keyset_page():
+        cur.execute(f"SELECT * FROM {table} WHERE id > %s ORDER BY id LIMIT %s", (last_id, PAGE_SIZE))
+        return cur.fetchall()
+
+    results["offset"] = (harness.measure(offset_page, iterations=NUM_RUNS), None)
+    results["keyset"] = (harness.measure(keyset_page, iterations=NUM_RUNS), None)
+    cur.close()
+    conn.commit()
+
+    # Серверный курсор живет внутри транзакции; MOVE ABSOLUTE k ставит его на k-ю строку
+    with conn.cursor(name=f"page_{table}") as named:
+        named.execute(f"SELECT * FROM {table} ORDER BY id")
+        start_time = time.perf_counter()
+        named.scroll(offset, mode="absolute")
+        position_ms = (time.perf_counter() - start_time) * 1000
+        results["cursor"] = (harness.measure(lambda: named.fetchmany(PAGE_SIZE), iterations=NUM_RUNS), position_ms)
+    conn.commit()
+    return results
+
+def measure_orm(session, model, offset, last_id):
+    """Замеры SQLAlchemy ORM: {способ: (значения в ms, время перемещения курсора в ms)}"""
+    results = {}
+    results["offset"] = (harness.measure(
+        lambda: session.query(model).order_by(model.id).offset(offset).limit(PAGE_SIZE).all(),
+        iterations=NUM_RUNS
+    ), None)
+    results["keyset"] = (harness.measure(
+        lambda: session.query(model).filter(model.id > last_id).order_by(model.id).limit(PAGE_SIZE).all(),
+        iterations=NUM_RUNS
+    ), None)
+    session.rollback()
+
+    # yield_per открывает серверный курсор и отдает объекты пачками по PAGE_SIZE;
+    # перемещение на глубину - чтение и пропуск пачек на клиенте
+    result = session.execute(select(model).order_by(model.id), execution_options={"yield_per": PAGE_SIZE})
+    pages = result.scalars().partitions()
+    start_time = time.perf_counter()
+    for _ in range(offset // PAGE_SIZE):
+        next(pages)
+    position_ms = (time.perf_counter() - start_time) * 1000
+    results["cursor"] = (harness.measure(lambda: next(pages), iterations=NUM_RUNS), position_ms)
+    result.close()
+    session.rollback()
+    session.expunge_all()
+    return results
+
+def measure_table(conn, engine, table, dataset_size, results):
+    """Замеряет все способы на всех глубинах для одной таблицы"""
+    cur = conn.cursor()
+    cur.execute(f"SELECT count(*) FROM {table}")
+    rows = cur.fetchone()[0]
+    offsets = [(offset, last_id_before(cur, table, offset)) for offset in depths(rows)]
+    cur.close()
+    conn.commit()
+    print(f"\nТаблица {table}: {rows} строк, глубина страниц {', '.join(str(offset) for offset, _ in offsets)}")
+
+    session = Session(bind=engine)
+    try:
+        for offset, last_id in offsets:
+            for driver, measured in (
+                ("psycopg2", measure_sql(conn, table, offset, last_id)),
+                ("sqlalchemy-orm", measure_orm(session, MODELS[table], offset, last_id)),
+            ):
+                for method, (samples, position_ms) in measured.items():
+                    results[(table, rows, driver, method, offset)] = statistics.median(samples)
+                    harness.record(
+                        method, samples, dataset_size=dataset_size, driver=driver,
+                        table=table, rows=rows, depth=offset, page_size=PAGE_SIZE, position_ms=position_ms
+                    )
+    finally:
+        session.close()
+
+def print_results(results):
+    tables = sorted({(table, rows) for table, rows, _, _, _ in results}, key=lambda key: (key[0], key[1]))
+    for table, rows in tables:
+        for driver in ("psycopg2", "sqlalchemy-orm"):
+            print(f"\n{table}, {rows} строк ({driver}), медиана на страницу из {PAGE_SIZE} строк:")
+            print("-" * 60)
+            print(f"{'Глубина':<12} " + " ".join(f"{method + ' (ms)':<15}" for method in METHODS))
+            print("-" * 60)
+            offsets = sorted({offset for t, r, d, _, offset in results if (t, r, d) == (table, rows, driver)})
+            for offset in offsets:
+                cells = [results.get((table, rows, driver, method, offset)) for method in METHODS]
+                print(f"{offset:<12} " + " ".join(f"{value:<15.3f}" if value is not None else f"{'-':<15}" for value in cells))
+
+@harness.suite("benchmark_pagination")
+def run_benchmark():
+    """Сравнение OFFSET, keyset и серверного курсора на разной глубине"""
+    results = {}
+    backend = backends.current()
+    engine = backend.create_engine()
+
+    try:
+        conn = backend.connect()
+
+        # users: каждый размер - отдельный набор из кэша datasets.py
+        for db_size in USER_SIZES:
+            datasets.ensure(conn, datasets.users(1, db_size + 1))
+            measure_table(conn, engine, "users", db_size, results)
+
+        # post и comment: набор django_benchmark.py растет от меньшего размера к большему
+        django_benchmark.Base.metadata.drop_all(engine)
+        django_benchmark.Base.metadata.create_all(engine)
+        generator = datagen.DatasetGenerator()
+
+        def grow(loaded, db_size):
+            django_benchmark.grow_database(conn, generator, loaded, db_size)
+
+        def measure(db_size, variant):
+            for table in ("post", "comment"):
+                measure_table(conn, engine, table, db_size, results)
+
+        sweep.run_sweep(conn, DJANGO_SIZES, grow, measure, django_benchmark.TABLES.values())
+        conn.close()
+
+    except Exception as e:
+        print(f"Произошла ошибка: {e}")
+        if 'conn' in locals():
+            conn.close()
+    finally:
+        engine.dispose()
+
+    print("\n=== РЕЗУЛЬТАТЫ ПОСТРАНИЧНОГО ЧТЕНИЯ ===")
+    print_results(results)
+
+if __name__ == "__main__":
+    run_benchmark()
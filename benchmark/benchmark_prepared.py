@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+import random
+import statistics
+from sqlalchemy import create_engine, select, bindparam
+from sqlalchemy.orm import sessionmaker
+
+import backends
+import benchmark
+import harness
+import loader
+
+# Количество строк в таблице users
+DB_SIZE = 100000
+
+# Количество запросов по случайным ID в каждом сценарии
+NUM_LOOKUPS = 100000
+
+# Зерно генератора ID, чтобы все сценарии запрашивали одну и ту же последовательность
+SEED = 42
+
+# Инициализация SQLAlchemy: обычный движок и движок без кэша скомпилированных запросов
+engine = create_engine(backends.DB_URL)
+engine_no_cache = create_engine(backends.DB_URL, query_cache_size=0)
+Session = sessionmaker(bind=engine)
+SessionNoCache = sessionmaker(bind=engine_no_cache)
+
+# Модель User из benchmark.py
+User = benchmark.User
+
+# Сценарии: функция получает соединение psycopg2 и возвращает функцию запроса по ID
+# и объект, который нужно закрыть после замера
+def adhoc_sql(conn):
+    # ID подставляется в текст запроса: сервер разбирает и планирует каждый запрос заново
+    cur = conn.cursor()
+    return lambda user_id: cur.execute(f"SELECT * FROM users WHERE id = {user_id}") or cur.fetchone(), cur
+
+def parameterized_sql(conn):
+    # psycopg2 подставляет параметры на клиенте, поэтому сервер все равно получает новый текст
+    cur = conn.cursor()
+    return lambda user_id: cur.execute("SELECT * FROM users WHERE id = %s", (user_id,)) or cur.fetchone(), cur
+
+def prepared_sql(conn):
+    # Запрос разбирается один раз, далее выполняется готовый оператор
+    cur = conn.cursor()
+    cur.execute("DEALLOCATE ALL")
+    cur.execute("PREPARE get_user (integer) AS SELECT * FROM users WHERE id = $1")
+    return lambda user_id: cur.execute("EXECUTE get_user (%s)", (user_id,)) or cur.fetchone(), cur
+
+def core_lookup(connection):
+    statement = select(User.__table__).where(User.__table__.c.id == bindparam("user_id"))
+    return lambda user_id: connection.execute(statement, {"user_id": user_id}).fetchone(), connection
+
+def core_cached(conn):
+    return core_lookup(engine.connect())
+
+def core_no_cache(conn):
+    return core_lookup(engine_no_cache.connect())
+
+def orm_cached(conn):
+    session = Session()
+    return lambda user_id: session.query(User).filter(User.id == user_id).first(), session
+
+def orm_no_cache(conn):
+    session = SessionNoCache()
+    return lambda user_id: session.query(User).filter(User.id == user_id).first(), session
+
+# Название сценария -> (функция подготовки, драйвер)
+SCENARIOS = {
+    "adhoc_sql": (adhoc_sql, "psycopg2"),
+    "parameterized_sql": (parameterized_sql, "psycopg2"),
+    "prepared_sql": (prepared_sql, "psycopg2"),
+    "core_cached": (core_cached, "sqlalchemy-core"),
+    "core_no_cache": (core_no_cache, "sqlalchemy-core"),
+    "orm_cached": (orm_cached, "sqlalchemy-orm"),
+    "orm_no_cache": (orm_no_cache, "sqlalchemy-orm"),
+}
+
+def run_scenario(scenario, conn):
+    """Выполняет NUM_LOOKUPS запросов по одной и той же последовательности случайных ID"""
+    setup, _ = SCENARIOS[scenario]
+    lookup, resource = setup(conn)
+    rng = random.Random(SEED)
+    ids = iter([rng.randint(1, DB_SIZE) for _ in range(NUM_LOOKUPS)])
+    try:
+        return harness.measure(lambda: lookup(next(ids)), iterations=NUM_LOOKUPS)
+    finally:
+        resource.close()
+        conn.rollback()
+
+@harness.suite("benchmark_prepared")
+def run_benchmark():
+    """Сравнение стоимости подготовки запроса для горячего цикла запросов по ID"""
+    results = {}
+
+    try:
+        conn = backends.current().connect()
+
+        # Пересоздаем и заполняем таблицу users
+        benchmark.Base.metadata.drop_all(engine)
+        benchmark.Base.metadata.create_all(engine)
+        loader.copy_rows(conn, "users", loader.USER_COLUMNS, loader.user_rows(1, DB_SIZE + 1))
+        with conn.cursor() as cur:
+            cur.execute("ANALYZE users")
+        conn.commit()
+
+        for scenario, (_, driver) in SCENARIOS.items():
+            print(f"{scenario}: {NUM_LOOKUPS} запросов...")
+            times = run_scenario(scenario, conn)
+            results[scenario] = times
+            harness.record(scenario, times, dataset_size=DB_SIZE, driver=driver)
+
+        conn.close()
+
+    except Exception as e:
+        print(f"Произошла ошибка: {e}")
+        if 'conn' in locals():
+            conn.close()
+
+    if len(results) < len(SCENARIOS):
+        return
+
+    # Выводим результаты
+    print("\n=== РЕЗУЛЬТАТЫ: ПОДГОТОВКА ЗАПРОСОВ ===")
+    print("-" * 80)
+    print(f"{'Сценарий':<20} {'Среднее (ms)':<15} {'Медиана (ms)':<15} {'p99 (ms)':<15} {'К prepared':<15}")
+    print("-" * 80)
+
+    mean = {scenario: statistics.mean(times) for scenario, times in results.items()}
+    for scenario, times in results.items():
+        relative = mean[scenario] / mean["prepared_sql"]
+        print(f"{scenario:<20} {mean[scenario]:<15.4f} {statistics.median(times):<15.4f} {harness.percentile(times, 99):<15.4f} {relative:<15.2f}x")
+
+    # Разложение разницы ORM и SQL на составляющие
+    print("-" * 80)
+    print("Разложение времени запроса ORM (среднее на запрос):")
+    print(f"  Разбор и планирование на сервере:   {mean['parameterized_sql'] - mean['prepared_sql']:.4f} ms")
+    print(f"  Компиляция запроса SQLAlchemy (ORM): {mean['orm_no_cache'] - mean['orm_cached']:.4f} ms")
+    print(f"  Компиляция запроса SQLAlchemy (Core): {mean['core_no_cache'] - mean['core_cached']:.4f} ms")
+    print(f"  Core поверх psycopg2:               {mean['core_cached'] - mean['parameterized_sql']:.4f} ms")
+    print(f"  ORM поверх Core (гидратация и др.): {mean['orm_cached'] - mean['core_cached']:.4f} ms")
+
+if __name__ == "__main__":
+    run_benchmark()
@@ -0,0 +1,208 @@
+#!/usr/bin/env python3
+"""
+Жизненный цикл сессии SQLAlchemy ORM и размер карты идентичности.
+
+benchmark.py выполняет все чтения в одной долгоживущей сессии, поэтому в
+его результаты попадает состояние этой сессии. Здесь оно задается явно:
+
+1. В сессию загружается N объектов (IDENTITY_MAP_SIZES), ссылки на них
+   удерживаются - карта идентичности хранит объекты по слабым ссылкам.
+   Для каждого N и каждого сочетания expire_on_commit и autoflush
+   замеряются:
+   - get_hit - session.get() объекта из карты, без запроса к базе;
+   - get_miss - session.get() объекта не из карты, запрос к базе;
+   - query - выборка страницы из PAGE_SIZE строк;
+   - autoflush_query - та же выборка после изменения одного объекта
+     (с autoflush перед запросом выполняется UPDATE);
+   - commit - фиксация изменения одного объекта (с expire_on_commit
+     помечаются устаревшими все N объектов);
+   - read_after_commit - чтение атрибута у TOUCHED_OBJECTS объектов после
+     фиксации (устаревшие объекты перечитываются по одному запросу).
+2. REQUESTS обращений по случайному id: новая сессия на каждое обращение
+   (fresh_session) против одной сессии на все (reused_session).
+
+Наборы из кэша только читаются, поэтому изменения выполняются в отдельной
+таблице session_users, которая удаляется после прогона.
+"""
+import itertools
+import random
+import statistics
+import time
+
+from sqlalchemy import Column, Integer, String
+from sqlalchemy.orm import sessionmaker, declarative_base
+
+import backends
+import datasets
+import harness
+
+# Количество строк в таблице
+TABLE_SIZE = 200000
+
+# Количество объектов в карте идентичности перед замерами
+IDENTITY_MAP_SIZES = [0, 1000, 10000, 100000]
+
+# Количество повторений быстрых операций (get, query)
+NUM_RUNS = 200
+
+# Количество фиксаций на каждый вариант сессии
+NUM_COMMITS = 20
+
+# Количество строк в странице для query
+PAGE_SIZE = 10
+
+# Количество объектов, которые читаются после фиксации
+TOUCHED_OBJECTS = 100
+
+# Количество обращений в сравнении новой и повторно используемой сессии
+REQUESTS = 2000
+
+# Зерно выбора id
+SEED = 42
+
+Base = declarative_base()
+
+# Копия таблицы users из benchmark.py, которую можно изменять
+class User(Base):
+    __tablename__ = 'session_users'
+
+    id = Column(Integer, primary_key=True)
+    name = Column(String)
+    email = Column(String)
+    phone = Column(String)
+    address = Column(String)
+    city = Column(String)
+    country = Column(String)
+    zipcode = Column(String)
+
+    def __repr__(self):
+        return f"<User(id={self.id}, name='{self.name}')>"
+
+def measure_map(engine, size, expire_on_commit, autoflush, rng):
+    """Замеры операций в сессии с size объектами в карте идентичности: {операция: значения в ms}"""
+    session = sessionmaker(bind=engine, expire_on_commit=expire_on_commit, autoflush=autoflush)()
+    results = {}
+    try:
+        loaded = session.query(User).filter(User.id <= size).order_by(User.id).all()
+
+        if loaded:
+            results["get_hit"] = harness.measure(lambda: session.get(User, rng.randint(1, size)), iterations=NUM_RUNS)
+
+        def get_miss():
+            # Объект удаляется из сессии, чтобы размер карты не менялся
+            session.expunge(session.get(User, rng.randint(size + 1, TABLE_SIZE)))
+
+        results["get_miss"] = harness.measure(get_miss, iterations=NUM_RUNS)
+        # Страница берется за пределами загруженных строк, чтобы выборка шла в базу
+        page = lambda: session.query(User).filter(User.id > size).order_by(User.id).limit(PAGE_SIZE).all()
+        results["query"] = harness.measure(page, iterations=NUM_RUNS)
+
+        # Изменяемый объект: загруженный или первый из страницы
+        target = loaded[0] if loaded else page()[0]
+        counter = itertools.count()
+
+        def autoflush_query():
+            target.name = f"session_{next(counter)}"
+            page()
+
+        results["autoflush_query"] = harness.measure(autoflush_query, iterations=NUM_RUNS)
+        session.commit()
+
+        touched = loaded[:TOUCHED_OBJECTS] or page()
+        commits = []
+        reads = []
+        for _ in range(NUM_COMMITS):
+            target.name = f"session_{next(counter)}"
+            start_time = time.perf_counter()
+            session.commit()
+            commits.append((time.perf_counter() - start_time) * 1000)
+            start_time = time.perf_counter()
+            for user in touched:
+                user.name
+            reads.append((time.perf_counter() - start_time) * 1000)
+        results["commit"] = commits
+        results["read_after_commit"] = reads
+    finally:
+        session.close()
+    return results
+
+def measure_lifecycle(engine, rng):
+    """Новая сессия на каждое обращение против одной сессии: {вариант: (значения в ms, объектов в карте)}"""
+    ids = [rng.randint(1, TABLE_SIZE) for _ in range(REQUESTS)]
+    Session = sessionmaker(bind=engine)
+    results = {}
+
+    def fresh(user_id):
+        with Session() as session:
+            session.get(User, user_id)
+
+    results["fresh_session"] = ([harness.measure(lambda: fresh(user_id), iterations=1)[0] for user_id in ids], 1)
+
+    # Объекты удерживаются, как в долгой пакетной задаче, которая накапливает результаты
+    with Session() as session:
+        kept = []
+        samples = [harness.measure(lambda: kept.append(session.get(User, user_id)), iterations=1)[0] for user_id in ids]
+        results["reused_session"] = (samples, len(session.identity_map))
+    return results
+
+@harness.suite("benchmark_session", portable=True)
+def run_benchmark():
+    """Влияние размера карты идентичности и настроек сессии на задержку"""
+    results = {}
+    backend = backends.current()
+    engine = backend.create_engine()
+    rng = random.Random(SEED)
+
+    try:
+        conn = engine.raw_connection()
+        try:
+            datasets.ensure(conn, datasets.users(1, TABLE_SIZE + 1, table=User.__tablename__))
+        finally:
+            conn.close()
+
+        for size in IDENTITY_MAP_SIZES:
+            for expire_on_commit in (True, False):
+                for autoflush in (True, False):
+                    print(f"\nКарта идентичности: {size} объектов, expire_on_commit={expire_on_commit}, autoflush={autoflush}")
+                    measured = measure_map(engine, size, expire_on_commit, autoflush, rng)
+                    for operation, samples in measured.items():
+                        results[(size, expire_on_commit, autoflush, operation)] = statistics.median(samples)
+                        print(f"{operation}: {statistics.median(samples):.3f} ms")
+                        harness.record(
+                            operation, samples, dataset_size=TABLE_SIZE, driver="sqlalchemy-orm",
+                            identity_map=size, expire_on_commit=expire_on_commit, autoflush=autoflush
+                        )
+
+        print(f"\n{REQUESTS} обращений по случайному id:")
+        for session_mode, (samples, identity_map) in measure_lifecycle(engine, rng).items():
+            results[session_mode] = statistics.median(samples)
+            print(f"{session_mode}: медиана {statistics.median(samples):.3f} ms, в карте {identity_map} объектов")
+            harness.record(
+                session_mode, samples, dataset_size=TABLE_SIZE, driver="sqlalchemy-orm",
+                session=session_mode, identity_map=identity_map
+            )
+
+    except Exception as e:
+        print(f"Произошла ошибка: {e}")
+    finally:
+        # Таблица изменялась, поэтому снимок набора в ней больше не хранится
+        User.__table__.drop(engine, checkfirst=True)
+        engine.dispose()
+
+    # Выводим результаты
+    operations = ["get_hit", "get_miss", "query", "autoflush_query", "commit", "read_after_commit"]
+    for expire_on_commit in (True, False):
+        for autoflush in (True, False):
+            print(f"\n=== expire_on_commit={expire_on_commit}, autoflush={autoflush}: медиана (ms) ===")
+            print("-" * 110)
+            print(f"{'Объектов':<10} " + " ".join(f"{operation:<17}" for operation in operations))
+            print("-" * 110)
+            for size in IDENTITY_MAP_SIZES:
+                cells = [results.get((size, expire_on_commit, autoflush, operation)) for operation in operations]
+                print(f"{size:<10} " + " ".join(f"{value:<17.3f}" if value is not None else f"{'-':<17}" for value in cells))
+
+    if "fresh_session" in results and "reused_session" in results:
+        print(f"\nНовая сессия на обращение: {results['fresh_session']:.3f} ms, одна сессия: {results['reused_session']:.3f} ms")
+
+if __name__ == "__main__":
+    run_benchmark()
@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+from sqlalchemy import create_engine, select
+from sqlalchemy.orm import sessionmaker
+
+import backends
+import benchmark
+import harness
+import loader
+import sweep
+
+# Размеры таблицы; таблица дозаполняется от меньшего размера к большему
+DB_SIZES = [10000, 100000, 1000000]
+
+# Добавлять ли размеры из sweep.SCALE_TIERS больше DB_SIZES (10M и 50M строк)
+LARGE_SCALE = False
+
+# Способы, которые держат всю выборку в памяти, не выполняются на таблицах
+# больше этого размера: на 10M строк orm_all требует десятки гигабайт
+FULL_FETCH_MAX_ROWS = 1000000
+
+# Количество строк, которое серверный курсор передает за один раз
+ITERSIZE = 2000
+
+# Замерять ли память Python через tracemalloc (требует повторного чтения таблицы)
+TRACE_MEMORY = True
+
+# Инициализация SQLAlchemy
+engine = create_engine(backends.DB_URL)
+Session = sessionmaker(bind=engine)
+
+# Модель User из benchmark.py
+User = benchmark.User
+
+# Способы чтения таблицы: каждый перебирает все строки и возвращает их количество.
+# Потоковые способы идут первыми, чтобы полная выборка не поднимала базовый RSS.
+def read_named_cursor(conn):
+    # Серверный курсор: строки приходят пачками по ITERSIZE
+    with conn.cursor(name="stream_users") as cur:
+        cur.itersize = ITERSIZE
+        cur.execute("SELECT * FROM users")
+        count = sum(1 for _ in cur)
+    conn.commit()
+    return count
+
+def read_core_stream_results(conn):
+    with engine.connect() as connection:
+        result = connection.execution_options(stream_results=True, max_row_buffer=ITERSIZE).execute(
+            select(User.__table__)
+        )
+        return sum(1 for _ in result)
+
+def read_orm_yield_per(conn):
+    session = Session()
+    try:
+        # yield_per включает stream_results и не держит все объекты в памяти
+        return sum(1 for _ in session.query(User).yield_per(ITERSIZE))
+    finally:
+        session.close()
+
+def read_fetchall(conn):
+    with conn.cursor() as cur:
+        cur.execute("SELECT * FROM users")
+        rows = cur.fetchall()
+    conn.commit()
+    return len(rows)
+
+def read_orm_all(conn):
+    session = Session()
+    try:
+        return len(session.query(User).all())
+    finally:
+        session.close()
+
+# Название способа -> (функция чтения, драйвер)
+MODES = {
+    "named_cursor": (read_named_cursor, "psycopg2"),
+    "core_stream_results": (read_core_stream_results, "sqlalchemy-core"),
+    "orm_yield_per": (read_orm_yield_per, "sqlalchemy-orm"),
+    "fetchall": (read_fetchall, "psycopg2"),
+    "orm_all": (read_orm_all, "sqlalchemy-orm"),
+}
+
+# Способы, которые выбирают таблицу целиком
+FULL_FETCH_MODES = {"fetchall", "orm_all"}
+
+def format_bytes(value):
+    if value is None:
+        return "-"
+    return f"{value / (1024 * 1024):.1f}"
+
+@harness.suite("benchmark_stream")
+def run_benchmark():
+    """Сравнение полной выборки и потокового чтения больших таблиц"""
+    results = {}
+    db_sizes = DB_SIZES + [size for size in sweep.SCALE_TIERS if size > max(DB_SIZES)] if LARGE_SCALE else DB_SIZES
+
+    try:
+        conn = backends.current().connect()
+
+        # Пересоздаем таблицу users
+        benchmark.Base.metadata.drop_all(engine)
+        benchmark.Base.metadata.create_all(engine)
+
+        loaded = 0
+        for db_size in db_sizes:
+            # Дозаполняем таблицу до нужного размера
+            print(f"\nДозаполняю таблицу users до {db_size} строк...")
+            loader.copy_rows(conn, "users", loader.USER_COLUMNS, loader.user_rows(loaded + 1, db_size + 1))
+            loaded = db_size
+            with conn.cursor() as cur:
+                cur.execute("ANALYZE users")
+            conn.commit()
+
+            for mode, (read, driver) in MODES.items():
+                if mode in FULL_FETCH_MODES and db_size > FULL_FETCH_MAX_ROWS:
+                    print(f"{mode}: пропущен, {db_size} строк больше FULL_FETCH_MAX_ROWS")
+                    continue
+                memory = harness.measure_memory(lambda: read(conn), trace=TRACE_MEMORY)
+                results[(db_size, mode)] = memory
+                rows_per_second = db_size / (memory["time_ms"] / 1000)
+                print(f"{mode}: {memory['time_ms']:.2f} ms, пик RSS {format_bytes(memory['rss_peak_bytes'])} MB")
+                harness.record(
+                    mode, [memory["time_ms"]], dataset_size=db_size, driver=driver,
+                    rows_per_second=rows_per_second,
+                    rss_peak_bytes=memory["rss_peak_bytes"],
+                    tracemalloc_peak_bytes=memory.get("tracemalloc_peak_bytes")
+                )
+
+        conn.close()
+
+    except Exception as e:
+        print(f"Произошла ошибка: {e}")
+        if 'conn' in locals():
+            conn.close()
+
+    # Выводим результаты
+    print("\n=== РЕЗУЛЬТАТЫ ПОТОКОВОГО ЧТЕНИЯ ===")
+    print("-" * 100)
+    print(f"{'Размер БД':<10} {'Способ':<22} {'Время (ms)':<14} {'Строк/с':<12} {'Пик RSS (MB)':<14} {'Пик tracemalloc (MB)':<20}")
+    print("-" * 100)
+
+    for db_size in db_sizes:
+        for mode in MODES:
+            if (db_size, mode) not in results:
+                continue
+            memory = results[(db_size, mode)]
+            rows_per_second = db_size / (memory["time_ms"] / 1000)
+            print(f"{db_size:<10} {mode:<22} {memory['time_ms']:<14.2f} {rows_per_second:<12.0f} {format_bytes(memory['rss_peak_bytes']):<14} {format_bytes(memory.get('tracemalloc_peak_bytes')):<20}")
+
+if __name__ == "__main__":
+    run_benchmark()
@@ -0,0 +1,377 @@
+#!/usr/bin/env python3
+"""
+Изменение загруженных данных: UPDATE, DELETE и upsert.
+
+На таблицах users (benchmark.py) и django_users (django_index_benchmark.py)
+разного размера замеряются:
+- update_pk - UPDATE одной строки по первичному ключу в своей транзакции;
+- update_executemany - BATCH_SIZE строк через cursor.executemany();
+- update_values - BATCH_SIZE строк одним UPDATE ... FROM (VALUES ...);
+- orm_dirty_flush - изменение BATCH_SIZE загруженных объектов и commit
+  (время загрузки объектов не входит в замер);
+- orm_bulk_update - session.bulk_update_mappings() для BATCH_SIZE строк;
+- upsert - INSERT ... ON CONFLICT (id) DO UPDATE, половина строк уже есть
+  в таблице, половина новых;
+- delete_range - DELETE диапазона из BATCH_SIZE строк по id.
+
+Каждый сценарий выполняется с вторичным индексом по name и без него (для
+django_users - INDEX_VARIANTS из django_index_benchmark.py). Изменяется
+колонка name, поэтому с индексом PostgreSQL не может обновить строку без
+записи в индекс (HOT). Кроме времени на строку сохраняется объем WAL на
+строку - мера усиления записи. WAL общий для всего кластера, поэтому набор
+выполняется отдельно от остальных (exclusive), а перед каждым сценарием
+выполняется CHECKPOINT.
+
+Перед каждым вариантом таблица заполняется заново: users восстанавливается
+из кэша наборов данных и удаляется после замеров, django_users
+загружается так же, как в django_index_benchmark.py.
+"""
+import itertools
+import random
+import statistics
+import time
+
+import psycopg2.errors
+from psycopg2.extras import execute_values
+from sqlalchemy import Boolean, Column, Integer, String
+from sqlalchemy.orm import sessionmaker, declarative_base
+
+import backends
+import benchmark
+import datasets
+import django_index_benchmark
+import harness
+import loader
+
+# Размеры таблиц
+WRITE_SIZES = [10000, 100000, 1000000]
+
+# Количество строк в пакетных сценариях
+BATCH_SIZE = 1000
+
+# Количество повторений update_pk
+NUM_RUNS = 100
+
+# Количество пакетов в пакетных сценариях
+NUM_BATCHES = 10
+
+# Зерно выбора id
+SEED = 42
+
+# Вторичный индекс по name для users (имя отличается от индекса django_users)
+USERS_INDEX_VARIANTS = {
+    "with_index": {"idx_plain_users_name": "CREATE INDEX idx_plain_users_name ON users (name)"},
+    "without_index": {},
+}
+
+# Сценарии в порядке выполнения: upsert и delete_range последние, так как
+# меняют количество строк
+OPERATIONS = [
+    "update_pk", "update_executemany", "update_values",
+    "orm_dirty_flush", "orm_bulk_update", "upsert", "delete_range",
+]
+
+Base = declarative_base()
+Session = sessionmaker()
+
+# Модель User из benchmark.py
+User = benchmark.User
+
+# Определение модели для таблицы django_users из django_index_benchmark.py
+class DjangoUser(Base):
+    __tablename__ = 'django_users'
+
+    id = Column(Integer, primary_key=True)
+    username = Column(String(150), unique=True, nullable=False)
+    name = Column(String(150), nullable=False)
+    email = Column(String(254), unique=True, nullable=False)
+    is_active = Column(Boolean, nullable=False, default=True)
+
+    def __repr__(self):
+        return f"<DjangoUser(id={self.id}, username='{self.username}')>"
+
+def prepare_users(conn, size, variant):
+    """Восстанавливает users из кэша наборов данных и создает индексы варианта"""
+    datasets.ensure(conn, datasets.users(1, size + 1))
+    cur = conn.cursor()
+    for ddl in USERS_INDEX_VARIANTS[variant].values():
+        cur.execute(ddl)
+    cur.execute("ANALYZE users")
+    conn.commit()
+    cur.close()
+
+def reset_users(conn):
+    # Таблица изменена, при следующем ensure() она восстанавливается из снимка
+    cur = conn.cursor()
+    cur.execute("DROP TABLE IF EXISTS users")
+    conn.commit()
+    cur.close()
+
+def prepare_django_users(conn, size, variant):
+    """Заново заполняет django_users; индекс по name создается до загрузки, как в django_index_benchmark.py"""
+    django_index_benchmark.create_table(conn, with_index=variant == "with_index")
+    backends.current().load(conn, "django_users", django_index_benchmark.USER_COLUMNS,
+                            django_index_benchmark.user_rows(size), verbose=False)
+    cur = conn.cursor()
+    cur.execute("ANALYZE django_users")
+    conn.commit()
+    cur.close()
+
+def users_row(user_id, name):
+    return (user_id, name, f"upsert{user_id}@example.com", "", "", "", "", "")
+
+def django_users_row(user_id, name):
+    return (user_id, f"user{user_id}", name, f"user{user_id}@example.com", True)
+
+# Таблица -> (подготовка, сброс после замеров, модель, колонки, строка для upsert)
+TABLES = {
+    "users": (prepare_users, reset_users, User, loader.USER_COLUMNS, users_row),
+    "django_users": (prepare_django_users, lambda conn: None, DjangoUser,
+                     django_index_benchmark.USER_COLUMNS, django_users_row),
+}
+
+class Context:
+    """Состояние прогона сценариев на одной таблице"""
+
+    def __init__(self, conn, session, table, size):
+        self.conn = conn
+        self.session = session
+        self.table = table
+        self.size = size
+        self.model = TABLES[table][2]
+        self.columns = TABLES[table][3]
+        self.row = TABLES[table][4]
+        self.rng = random.Random(SEED)
+        self.counter = itertools.count()
+        # Следующий id за пределами таблицы для новых строк upsert
+        self.next_id = size + 1
+
+    def ids(self, count):
+        return self.rng.sample(range(1, self.size + 1), count)
+
+    def name(self):
+        return f"Updated {next(self.counter)}"
+
+def timed(func):
+    start_time = time.perf_counter()
+    func()
+    return (time.perf_counter() - start_time) * 1000
+
+def update_pk(ctx):
+    cur = ctx.conn.cursor()
+
+    def run():
+        cur.execute(f"UPDATE {ctx.table} SET name = %s WHERE id = %s", (ctx.name(), ctx.ids(1)[0]))
+        ctx.conn.commit()
+
+    elapsed = timed(run)
+    cur.close()
+    return elapsed, 1
+
+def update_executemany(ctx):
+    cur = ctx.conn.cursor()
+    params = [(ctx.name(), user_id) for user_id in ctx.ids(BATCH_SIZE)]
+
+    def run():
+        cur.executemany(f"UPDATE {ctx.table} SET name = %s WHERE id = %s", params)
+        ctx.conn.commit()
+
+    elapsed = timed(run)
+    cur.close()
+    return elapsed, BATCH_SIZE
+
+def update_values(ctx):
+    cur = ctx.conn.cursor()
+    params = [(user_id, ctx.name()) for user_id in ctx.ids(BATCH_SIZE)]
+
+    def run():
+        execute_values(
+            cur,
+            f"UPDATE {ctx.table} AS t SET name = v.name FROM (VALUES %s) AS v(id, name) WHERE t.id = v.id",
+            params, page_size=BATCH_SIZE
+        )
+        ctx.conn.commit()
+
+    elapsed = timed(run)
+    cur.close()
+    return elapsed, BATCH_SIZE
+
+def orm_dirty_flush(ctx):
+    model = ctx.model
+    objects = ctx.session.query(model).filter(model.id.in_(ctx.ids(BATCH_SIZE))).all()
+    for obj in objects:
+        obj.name = ctx.name()
+    elapsed = timed(ctx.session.commit)
+    ctx.session.expunge_all()
+    return elapsed, len(objects)
+
+def orm_bulk_update(ctx):
+    mappings = [{"id": user_id, "name": ctx.name()} for user_id in ctx.ids(BATCH_SIZE)]
+
+    def run():
+        ctx.session.bulk_update_mappings(ctx.model, mappings)
+        ctx.session.commit()
+
+    return timed(run), BATCH_SIZE
+
+def upsert(ctx):
+    cur = ctx.conn.cursor()
+    existing = ctx.ids(BATCH_SIZE // 2)
+    new = range(ctx.next_id, ctx.next_id + BATCH_SIZE - len(existing))
+    ctx.next_id = new.stop
+    rows = [ctx.row(user_id, ctx.name()) for user_id in itertools.chain(existing, new)]
+    columns = ", ".join(ctx.columns)
+
+    def run():
+        execute_values(
+            cur,
+            f"INSERT INTO {ctx.table} ({columns}) VALUES %s ON CONFLICT (id) DO UPDATE SET name = EXCLUDED.name",
+            rows, page_size=BATCH_SIZE
+        )
+        ctx.conn.commit()
+
+    elapsed = timed(run)
+    cur.close()
+    return elapsed, BATCH_SIZE
+
+def delete_range(ctx):
+    cur = ctx.conn.cursor()
+    start = ctx.rng.randint(1, ctx.size - BATCH_SIZE)
+
+    def run():
+        cur.execute(f"DELETE FROM {ctx.table} WHERE id >= %s AND id < %s", (start, start + BATCH_SIZE))
+        ctx.conn.commit()
+
+    elapsed = timed(run)
+    deleted = cur.rowcount
+    cur.close()
+    return elapsed, deleted
+
+# Сценарий -> (функция одного повторения, драйвер, количество повторений)
+SCENARIOS = {
+    "update_pk": (update_pk, "psycopg2", NUM_RUNS),
+    "update_executemany": (update_executemany, "psycopg2", NUM_BATCHES),
+    "update_values": (update_values, "psycopg2", NUM_BATCHES),
+    "orm_dirty_flush": (orm_dirty_flush, "sqlalchemy-orm", NUM_BATCHES),
+    "orm_bulk_update": (orm_bulk_update, "sqlalchemy-orm", NUM_BATCHES),
+    "upsert": (upsert, "psycopg2", NUM_BATCHES),
+    "delete_range": (delete_range, "psycopg2", NUM_BATCHES),
+}
+
+def wal_lsn(conn):
+    cur = conn.cursor()
+    cur.execute("SELECT pg_current_wal_lsn()")
+    lsn = cur.fetchone()[0]
+    cur.close()
+    conn.commit()
+    return lsn
+
+def wal_bytes(conn, start_lsn):
+    """Объем WAL в байтах с позиции start_lsn"""
+    cur = conn.cursor()
+    cur.execute("SELECT pg_wal_lsn_diff(pg_current_wal_lsn(), %s)", (start_lsn,))
+    size = cur.fetchone()[0]
+    cur.close()
+    conn.commit()
+    return float(size)
+
+# Разрешен ли CHECKPOINT пользователю (нужны права суперпользователя или роль pg_checkpoint)
+_checkpoint_allowed = [True]
+
+def checkpoint(conn):
+    """
+    Контрольная точка перед сценарием: после нее первое изменение каждой
+    страницы пишет в WAL полный образ страницы. Без CHECKPOINT эти образы
+    достаются тому сценарию, который первым изменил страницу после
+    загрузки или после контрольной точки сервера по времени
+    """
+    if not _checkpoint_allowed[0]:
+        return
+    cur = conn.cursor()
+    try:
+        cur.execute("CHECKPOINT")
+    except psycopg2.errors.InsufficientPrivilege:
+        conn.rollback()
+        _checkpoint_allowed[0] = False
+        print("Нет прав на CHECKPOINT (GRANT pg_checkpoint TO benchmark): полные образы страниц "
+              "в WAL достанутся сценарию, который первым изменит каждую страницу")
+        return
+    finally:
+        cur.close()
+    conn.commit()
+
+def measure_operation(ctx, operation):
+    """
+    Выполняет сценарий и возвращает значения в ms на повторение,
+    количество строк и объем WAL на строку
+    """
+    func, _, iterations = SCENARIOS[operation]
+    checkpoint(ctx.conn)
+    start_lsn = wal_lsn(ctx.conn)
+    samples = []
+    rows = 0
+    for _ in range(iterations):
+        elapsed, count = func(ctx)
+        samples.append(elapsed)
+        rows += count
+    return samples, rows, wal_bytes(ctx.conn, start_lsn) / max(rows, 1)
+
+@harness.suite("benchmark_write", exclusive=True)
+def run_benchmark():
+    """Сравнение способов изменения данных с вторичным индексом и без него"""
+    results = {}
+    backend = backends.current()
+    engine = backend.create_engine()
+
+    try:
+        conn = backend.connect()
+        for table, (prepare, reset, _, _, _) in TABLES.items():
+            for size in WRITE_SIZES:
+                for variant in ("with_index", "without_index"):
+                    print(f"\nТаблица {table}: {size} строк, {variant}")
+                    prepare(conn, size, variant)
+                    session = Session(bind=engine)
+                    ctx = Context(conn, session, table, size)
+                    try:
+                        for operation in OPERATIONS:
+                            samples, rows, wal_per_row = measure_operation(ctx, operation)
+                            rows_per_op = rows / len(samples)
+                            per_row_ms = statistics.median(samples) / rows_per_op
+                            results[(table, size, variant, operation)] = (per_row_ms, wal_per_row)
+                            print(f"{operation}: {per_row_ms * 1000:.1f} мкс/строку, WAL {wal_per_row:.0f} байт/строку")
+                            harness.record(
+                                operation, samples, dataset_size=size, driver=SCENARIOS[operation][1],
+                                table=table, name_index=variant == "with_index", batch_size=rows_per_op,
+                                wal_bytes_per_row=wal_per_row
+                            )
+                    finally:
+                        session.close()
+                        reset(conn)
+        conn.close()
+
+    except Exception as e:
+        print(f"Произошла ошибка: {e}")
+        if 'conn' in locals():
+            conn.close()
+    finally:
+        engine.dispose()
+
+    # Выводим результаты
+    for table in TABLES:
+        for size in WRITE_SIZES:
+            print(f"\n=== {table}, {size} строк: время и WAL на строку ===")
+            print("-" * 100)
+            print(f"{'Сценарий':<20} {'С индексом (мкс)':<18} {'Без индекса (мкс)':<19} "
+                  f"{'WAL с индексом':<16} {'WAL без индекса':<16} {'Усиление':<10}")
+            print("-" * 100)
+            for operation in OPERATIONS:
+                with_index = results.get((table, size, "with_index", operation))
+                without_index = results.get((table, size, "without_index", operation))
+                if with_index is None or without_index is None:
+                    continue
+                amplification = with_index[1] / without_index[1] if without_index[1] else float("nan")
+                print(f"{operation:<20} {with_index[0] * 1000:<18.1f} {without_index[0] * 1000:<19.1f} "
+                      f"{with_index[1]:<16.0f} {without_index[1]:<16.0f} {amplification:<10.2f}")
+
+if __name__ == "__main__":
+    run_benchmark()
@@ -0,0 +1,198 @@
+#!/usr/bin/env python3
+"""
+Генерация тестовых данных для схемы user / post / comment из django_benchmark.py.
+
+Данные создаются блоками с помощью NumPy: количество постов у пользователя,
+комментариев у поста, авторы комментариев и флаги генерируются векторно
+для всего блока. ID назначаются заранее, поэтому post.author_id,
+comment.post_id и comment.author_id всегда ссылаются на существующие строки.
+Блоки можно сразу передавать в loader.copy_rows, так что в памяти находится
+только один блок. При одном и том же зерне и размере блока данные совпадают.
+"""
+import datetime
+
+import numpy as np
+
+# Зерно генератора по умолчанию
+SEED = 42
+
+# Количество пользователей в одном блоке
+CHUNK_SIZE = 10000
+
+# Параметр распределения Ципфа (чем меньше, тем сильнее перекос)
+ZIPF_A = 2.0
+
+# Верхняя граница количества постов у пользователя и комментариев у поста
+MAX_CHILDREN = 1000
+
+# Колонки таблиц в порядке значений в генерируемых строках
+USER_COLUMNS = ["id", "username", "email", "first_name", "last_name", "is_active", "is_staff",
+                "date_joined", "created_at", "updated_at"]
+POST_COLUMNS = ["id", "title", "content", "author_id", "is_published", "created_at", "updated_at"]
+COMMENT_COLUMNS = ["id", "post_id", "author_id", "content", "is_approved", "created_at", "updated_at"]
+
+COLUMNS = {
+    "user": USER_COLUMNS,
+    "post": POST_COLUMNS,
+    "comment": COMMENT_COLUMNS,
+}
+
+
+def sample_counts(rng, distribution, mean, size, zipf_a=ZIPF_A):
+    """
+    Генерирует количество дочерних записей для size родительских
+
+    Args:
+        distribution: uniform (от 0 до 2 * mean), poisson, zipf (mean не используется) или fixed
+        mean: среднее количество
+    """
+    if distribution == "uniform":
+        counts = rng.integers(0, int(2 * mean) + 1, size)
+    elif distribution == "poisson":
+        counts = rng.poisson(mean, size)
+    elif distribution == "zipf":
+        counts = rng.zipf(zipf_a, size) - 1
+    elif distribution == "fixed":
+        counts = np.full(size, int(mean))
+    else:
+        raise ValueError(f"Неизвестное распределение: {distribution}")
+    return np.minimum(counts, MAX_CHILDREN).astype(np.int64)
+
+
+def sample_ids(rng, distribution, high, size, zipf_a=ZIPF_A):
+    """
+    Выбирает size ID из диапазона [1, high]
+
+    При распределении zipf чаще всего выбираются младшие ID:
+    первые пользователи оказываются самыми активными комментаторами.
+    """
+    if distribution == "uniform":
+        return rng.integers(1, high + 1, size)
+    if distribution == "zipf":
+        return (rng.zipf(zipf_a, size) - 1) % high + 1
+    raise ValueError(f"Неизвестное распределение: {distribution}")
+
+
+def index_within_parent(counts):
+    """Порядковый номер каждой дочерней записи внутри своего родителя (с 0)"""
+    starts = np.cumsum(counts) - counts
+    return np.arange(counts.sum()) - np.repeat(starts, counts)
+
+
+def format_datetimes(values):
+    """
+    Даты NumPy в виде 'YYYY-MM-DD HH:MM:SS'
+
+    NumPy разделяет дату и время буквой T, которую PostgreSQL принимает,
+    а разбор DateTime в SQLAlchemy для SQLite - нет.
+    """
+    return np.char.replace(np.asarray(values).astype(str), "T", " ")
+
+
+def repeat_text(templates, repeats):
+    return [text * times for text, times in zip(templates, repeats.tolist())]
+
+
+class DatasetGenerator:
+    """
+    Генератор пользователей, постов и комментариев
+
+    Генератор запоминает последние выданные ID, поэтому повторный вызов
+    generate() дополняет уже созданный набор данных, а не начинает заново.
+    """
+
+    def __init__(self, seed=SEED, posts_distribution="uniform", posts_mean=2,
+                 comments_distribution="uniform", comments_mean=3,
+                 commenters_distribution="uniform", zipf_a=ZIPF_A, now=None):
+        self.rng = np.random.default_rng(seed)
+        self.posts_distribution = posts_distribution
+        self.posts_mean = posts_mean
+        self.comments_distribution = comments_distribution
+        self.comments_mean = comments_mean
+        self.commenters_distribution = commenters_distribution
+        self.zipf_a = zipf_a
+        # Фиксированная точка отсчета дат, чтобы данные не зависели от времени запуска
+        self.now = np.datetime64(now or datetime.datetime(2025, 1, 1), "s")
+        self.users = 0
+        self.posts = 0
+        self.comments = 0
+
+    def generate(self, num_users, chunk_size=CHUNK_SIZE):
+        """
+        Генерирует еще num_users пользователей с их постами и комментариями
+
+        Yields:
+            (таблица, колонки, строки) - сначала пользователи блока, затем их посты и комментарии
+        """
+        end = self.users + num_users
+        while self.users < end:
+            size = min(chunk_size, end - self.users)
+            yield from self._chunk(size)
+
+    def _dates(self, size, max_days):
+        days = self.rng.integers(1, max_days + 1, size)
+        return format_datetimes(self.now - days.astype("timedelta64[D]")).tolist()
+
+    def _chunk(self, size):
+        rng = self.rng
+        now = str(format_datetimes(self.now))
+
+        # Пользователи
+        user_ids = np.arange(self.users + 1, self.users + size + 1)
+        self.users += size
+        ids = user_ids.tolist()
+        yield "user", USER_COLUMNS, zip(
+            ids,
+            [f"user{i}" for i in ids],
+            [f"user{i}@example.com" for i in ids],
+            [f"First{i}" for i in ids],
+            [f"Last{i}" for i in ids],
+            (rng.random(size) < 0.75).tolist(),  # 75% активных
+            (rng.random(size) < 0.25).tolist(),  # 25% сотрудников
+            self._dates(size, 1000),
+            [now] * size,
+            [now] * size,
+        )
+
+        # Посты пользователей блока
+        post_counts = sample_counts(rng, self.posts_distribution, self.posts_mean, size, self.zipf_a)
+        num_posts = int(post_counts.sum())
+        post_ids = np.arange(self.posts + 1, self.posts + num_posts + 1)
+        self.posts += num_posts
+        post_authors = np.repeat(user_ids, post_counts).tolist()
+        post_numbers = (index_within_parent(post_counts) + 1).tolist()
+        yield "post", POST_COLUMNS, zip(
+            post_ids.tolist(),
+            [f"Post {j} by User {a}" for j, a in zip(post_numbers, post_authors)],
+            repeat_text(
+                [f"This is post content {j} by user {a}. " for j, a in zip(post_numbers, post_authors)],
+                rng.integers(1, 11, num_posts)
+            ),
+            post_authors,
+            (rng.random(num_posts) < 0.75).tolist(),  # 75% опубликованных
+            [now] * num_posts,
+            [now] * num_posts,
+        )
+
+        # Комментарии к постам блока от любых уже созданных пользователей
+        comment_counts = sample_counts(rng, self.comments_distribution, self.comments_mean, num_posts, self.zipf_a)
+        num_comments = int(comment_counts.sum())
+        comment_ids = np.arange(self.comments + 1, self.comments + num_comments + 1)
+        self.comments += num_comments
+        comment_posts = np.repeat(post_ids, comment_counts)
+        comment_post_numbers = np.repeat(np.asarray(post_numbers, dtype=np.int64), comment_counts).tolist()
+        comment_numbers = (index_within_parent(comment_counts) + 1).tolist()
+        comment_authors = sample_ids(rng, self.commenters_distribution, self.users, num_comments, self.zipf_a).tolist()
+        yield "comment", COMMENT_COLUMNS, zip(
+            comment_ids.tolist(),
+            comment_posts.tolist(),
+            comment_authors,
+            repeat_text(
+                [f"This is comment {k} for post {j} by user {a}. "
+                 for k, j, a in zip(comment_numbers, comment_post_numbers, comment_authors)],
+                rng.integers(1, 4, num_comments)
+            ),
+            (rng.random(num_comments) < 0.75).tolist(),  # 75% одобренных
+            [now] * num_comments,
+            [now] * num_comments,
+        )
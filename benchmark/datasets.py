@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+"""
+Кэш наборов тестовых данных.
+
+Набор данных описывается спецификацией: DDL таблицы, генератор строк с
+аргументами и зерном, индексы. Хэш спецификации (spec_hash) определяет
+снимок - заполненную таблицу, которая создается один раз и хранится в
+той же базе (схема dataset_cache в PostgreSQL, таблицы dataset_cache_* в
+SQLite). ensure() приводит рабочую таблицу к спецификации:
+
+1. Таблица уже содержит этот набор - ничего не делается. На PostgreSQL в
+   комментарий таблицы записываются хэш, xid транзакции, которая ее
+   заполнила, и количество строк; перед повторным использованием
+   проверяется, что строк столько же и у всех тот же xmin (один проход
+   count(*) без чтения строк в Python, примерно в 20 раз быстрее
+   восстановления). Таблица, которую изменили без пересоздания,
+   восстанавливается заново.
+2. Снимок есть - таблица пересоздается и заполняется из снимка одним
+   INSERT ... SELECT на стороне сервера. Это копирование всех строк,
+   O(N), но без генерации строк в Python: в PostgreSQL нет способа
+   клонировать таблицу без копирования (CREATE DATABASE ... TEMPLATE
+   копирует всю базу).
+3. Снимка нет - строки генерируются и загружаются в снимок (COPY или
+   executemany), затем выполняется шаг 2.
+
+В SQLite комментариев к таблицам нет, поэтому шаг 1 не выполняется, а
+файл базы пересоздается при каждом backends.use(): снимки переиспользуются
+только наборами одного запуска, между запусками кэша нет.
+
+Изменения в таблице набора обнаруживаются при следующем ensure(), но
+скрипту, который меняет данные, проще работать со своей таблицей.
+"""
+import hashlib
+import json
+import time
+
+import backends
+import loader
+
+# Версия генераторов: увеличивается при изменении строк, которые они
+# возвращают, чтобы старые снимки не использовались
+DATASET_VERSION = 1
+
+# Зерно генераторов по умолчанию
+SEED = 42
+
+# Генераторы строк по имени в спецификации
+GENERATORS = {
+    "user_rows": loader.user_rows,
+}
+
+# Таблица users из benchmark.py, benchmark_raw.py и benchmark_size.py
+USERS_DDL = """
+    CREATE TABLE {table} (
+        id INTEGER PRIMARY KEY,
+        name VARCHAR(255),
+        email VARCHAR(255),
+        phone VARCHAR(255),
+        address VARCHAR(255),
+        city VARCHAR(255),
+        country VARCHAR(255),
+        zipcode VARCHAR(255)
+    )
+"""
+
+
+def users(start, stop, table="users", seed=SEED, indexes=()):
+    """Спецификация таблицы users с id из диапазона [start, stop)"""
+    return {
+        "table": table,
+        "ddl": USERS_DDL,
+        "columns": loader.USER_COLUMNS,
+        "generator": "user_rows",
+        "args": [start, stop],
+        "seed": seed,
+        "indexes": list(indexes),
+    }
+
+
+def spec_hash(spec):
+    """Короткий хэш содержимого набора (имя рабочей таблицы в него не входит)"""
+    content = {key: value for key, value in spec.items() if key != "table"}
+    content["version"] = DATASET_VERSION
+    digest = hashlib.sha1(json.dumps(content, sort_keys=True).encode("utf-8"))
+    return digest.hexdigest()[:12]
+
+
+def _create_table(cur, spec, table):
+    cur.execute(" ".join(spec["ddl"].format(table=table).split()))
+
+
+def ensure(conn, spec, verbose=True):
+    """
+    Приводит таблицу spec["table"] к набору данных spec
+
+    Args:
+        conn: соединение DB-API текущего бэкенда (на PostgreSQL - psycopg2
+            или engine.raw_connection())
+        spec: спецификация набора (например, users())
+        verbose: выводить ли, откуда взяты данные
+
+    Returns:
+        {"status": "reused" | "restored" | "generated", "seconds": время подготовки}
+    """
+    backend = backends.current()
+    table = spec["table"]
+    digest = spec_hash(spec)
+    snapshot = backend.snapshot_name(table, digest)
+    start_time = time.perf_counter()
+    cur = conn.cursor()
+    try:
+        tag = (backend.table_tag(cur, table) or "").split(" ", 1)
+        if tag[0] == digest and len(tag) == 2 and backend.table_unchanged(cur, table, tag[1]):
+            status = "reused"
+        else:
+            # Снимок создает только один процесс, остальные ждут и используют его
+            backend.lock_snapshot(cur, digest)
+            status = "restored"
+            if not backend.table_exists(cur, snapshot):
+                status = "generated"
+                _create_table(cur, spec, snapshot)
+                rows = GENERATORS[spec["generator"]](*spec["args"], seed=spec["seed"])
+                backend.load(conn, snapshot, spec["columns"], rows, commit=False, verbose=verbose)
+            cur.execute(f"DROP TABLE IF EXISTS {table}")
+            _create_table(cur, spec, table)
+            columns = ", ".join(spec["columns"])
+            cur.execute(f"INSERT INTO {table} ({columns}) SELECT {columns} FROM {snapshot}")
+            version = backend.table_version(cur, table, cur.rowcount)
+            for ddl in spec["indexes"]:
+                cur.execute(ddl.format(table=table))
+            cur.execute(f"ANALYZE {table}")
+            backend.set_table_tag(cur, table, f"{digest} {version}")
+        conn.commit()
+    finally:
+        cur.close()
+
+    elapsed = time.perf_counter() - start_time
+    if verbose:
+        sources = {"reused": "уже загружен", "restored": "восстановлен из снимка", "generated": "сгенерирован"}
+        print(f"Набор {table} [{digest}]: {sources[status]} за {elapsed:.3f} s")
+    return {"status": status, "seconds": elapsed}
+
+
+def clear(conn):
+    """Удаляет все снимки текущего бэкенда"""
+    backend = backends.current()
+    cur = conn.cursor()
+    try:
+        for snapshot in backend.snapshot_tables(cur):
+            cur.execute(f"DROP TABLE IF EXISTS {snapshot}")
+        conn.commit()
+    finally:
+        cur.close()
@@ -1,20 +1,15 @@
 #!/usr/bin/env python3
-import time
-import random
 import statistics
-import psycopg2
-from sqlalchemy import create_engine, Column, Integer, String, Boolean, DateTime, func
+from sqlalchemy import Column, Integer, String, Boolean, DateTime, func
 from sqlalchemy.orm import sessionmaker, declarative_base
 from sqlalchemy.ext.declarative import declared_attr
-from datetime import datetime, timedelta
 
-# Параметры подключения к PostgreSQL
-DB_USER = "benchmark"
-DB_PASSWORD = "benchmark"
-DB_HOST = "localhost"
-DB_PORT = "5432"
-DB_NAME = "benchmark"
-DB_URL = f"postgresql://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
+import backends
+import datagen
+import harness
+import histogram
+import plans
+import sweep
 
 # ID тестового пользователя, который будет запрашиваться
 TEST_USER_ID = 42
@@ -22,13 +17,26 @@ TEST_USER_ID = 42
 # Размеры баз данных для тестирования
 DB_SIZES = [1, 10, 100, 1000, 10000]
 
+# Добавлять ли размеры из sweep.SCALE_TIERS (1M, 10M, 50M пользователей;
+# вместе с постами и комментариями строк примерно в 9 раз больше)
+LARGE_SCALE = False
+
+# Запрашивать ли случайных пользователей по всему диапазону ID вместо TEST_USER_ID
+SAMPLE_KEYS = False
+
 # Количество повторений для каждого теста
 NUM_RUNS = 10
 
-# Инициализация SQLAlchemy (имитация Django ORM)
-engine = create_engine(DB_URL)
+# Имена таблиц моделей в SQL ("user" - зарезервированное слово)
+TABLES = {
+    "user": '"user"',
+    "post": "post",
+    "comment": "comment",
+}
+
+# Инициализация SQLAlchemy (имитация Django ORM); движок создается для текущего бэкенда
 Base = declarative_base()
-Session = sessionmaker(bind=engine)
+Session = sessionmaker()
 
 # Базовый класс модели (имитация Django Model)
 class DjangoBase:
@@ -73,143 +81,136 @@ class Comment(Base, DjangoBase):
     def __repr__(self):
         return f"<Comment(id={self.id}, post_id={self.post_id})>"
 
-# Функция для генерации случайной даты в прошлом
-def random_past_date():
-    days_ago = random.randint(1, 1000)
-    return datetime.now() - timedelta(days=days_ago)
-
 # Функция для замера времени выполнения
 def measure_execution_time(func):
-    times = []
-    for _ in range(NUM_RUNS):
-        start_time = time.time()
-        result = func()
-        end_time = time.time()
-        times.append((end_time - start_time) * 1000)  # Время в миллисекундах
+    times = harness.measure(func, iterations=NUM_RUNS)  # Время в миллисекундах
+    
+    tail = histogram.Histogram.from_samples(times)
     
     return {
         'mean': statistics.mean(times),
         'median': statistics.median(times),
         'stdev': statistics.stdev(times) if len(times) > 1 else 0,
         'min': min(times),
-        'max': max(times)
+        'max': max(times),
+        'p99': tail.percentile(99),
+        'p99.9': tail.percentile(99.9),
+        'samples': times
     }
 
-def setup_database(db_size):
-    """Настраивает базу данных с заданным количеством записей"""
-    print(f"\nНастройка базы данных с {db_size} пользователями...")
+def test_user_row(date_joined, created_at, updated_at):
+    """Строка тестового пользователя, которого ищут запросы"""
+    return (TEST_USER_ID, f"testuser{TEST_USER_ID}", f"testuser{TEST_USER_ID}@example.com",
+            "Test", "User", True, False, date_joined, created_at, updated_at)
+
+def username(user_id):
+    """Имя пользователя с заданным ID (тестовый пользователь называется иначе)"""
+    return f"testuser{user_id}" if user_id == TEST_USER_ID else f"user{user_id}"
+
+def grow_database(conn, generator, loaded, db_size):
+    """
+    Дозаполняет набор данных с loaded до db_size пользователей
     
-    # Пересоздаем таблицы
-    Base.metadata.drop_all(engine)
-    Base.metadata.create_all(engine)
+    Тестовый пользователь загружается первым; сгенерированный пользователь
+    с тем же ID пропускается, а его посты достаются тестовому пользователю.
+    """
+    backend = backends.current()
+    if loaded == 0:
+        now = str(datagen.format_datetimes(generator.now))
+        backend.load(conn, TABLES["user"], datagen.USER_COLUMNS, [test_user_row(now, now, now)], verbose=False)
     
-    session = Session()
-    
-    # Создаем тестового пользователя, которого будем запрашивать
-    test_user = User(
-        id=TEST_USER_ID,
-        username=f"testuser{TEST_USER_ID}",
-        email=f"testuser{TEST_USER_ID}@example.com",
-        first_name="Test",
-        last_name="User",
-        is_active=True,
-        is_staff=False,
-        date_joined=random_past_date()
-    )
-    session.add(test_user)
-    
-    # Создаем остальных пользователей
-    remaining_users = db_size - 1
-    if remaining_users > 0:
-        batch_size = 1000
-        for i in range(1, remaining_users + 1):
-            user_id = i if i < TEST_USER_ID else i + 1  # Пропускаем ID тестового пользователя
-            user = User(
-                id=user_id,
-                username=f"user{user_id}",
-                email=f"user{user_id}@example.com",
-                first_name=f"First{user_id}",
-                last_name=f"Last{user_id}",
-                is_active=random.choice([True, True, True, False]),  # 75% активных
-                is_staff=random.choice([False, False, False, True]),  # 25% сотрудников
-                date_joined=random_past_date()
-            )
-            session.add(user)
-            
-            # Добавляем посты для пользователя (в среднем 2 поста на пользователя)
-            num_posts = random.randint(0, 4)
-            for j in range(num_posts):
-                post = Post(
-                    title=f"Post {j+1} by User {user_id}",
-                    content=f"This is post content {j+1} by user {user_id}. " * random.randint(1, 10),
-                    author_id=user_id,
-                    is_published=random.choice([True, True, True, False])  # 75% опубликованных
-                )
-                session.add(post)
-                
-                # Добавляем комментарии к посту (в среднем 3 комментария на пост)
-                num_comments = random.randint(0, 6)
-                for k in range(num_comments):
-                    comment_author_id = random.randint(1, db_size)
-                    if comment_author_id == TEST_USER_ID:
-                        comment_author_id = random.randint(1, db_size)  # Повторная попытка, чтобы снизить вероятность
-                    
-                    comment = Comment(
-                        post_id=post.id if post.id else 1,
-                        author_id=comment_author_id,
-                        content=f"This is comment {k+1} for post {j+1} by user {comment_author_id}. " * random.randint(1, 3),
-                        is_approved=random.choice([True, True, True, False])  # 75% одобренных
-                    )
-                    session.add(comment)
-            
-            # Сохраняем каждые batch_size записей, чтобы не перегружать память
-            if i % batch_size == 0 or i == remaining_users:
-                session.commit()
-    
-    session.commit()
-    session.close()
-    print(f"База данных настроена: {db_size} пользователей")
+    # Сколько ID нужно сгенерировать, чтобы вместе с тестовым получилось db_size пользователей
+    num_generated = db_size if db_size > TEST_USER_ID else db_size - 1
+    for table, columns, rows in generator.generate(num_generated - generator.users):
+        if table == "user":
+            rows = (row for row in rows if row[0] != TEST_USER_ID)
+        backend.load(conn, TABLES[table], columns, rows, verbose=False)
+    
+    for table in TABLES.values():
+        backend.reset_sequence(conn, table)
 
+@harness.suite("django_benchmark", portable=True)
 def run_django_benchmark():
     """Имитирует запросы Django ORM"""
     results = {}
+    db_sizes = DB_SIZES + sweep.SCALE_TIERS if LARGE_SCALE else DB_SIZES
+    backend = backends.current()
+    engine = backend.create_engine()
+    Session.configure(bind=engine)
+    
+    # Пересоздаем таблицы один раз: дальше набор данных только растет
+    Base.metadata.drop_all(engine)
+    Base.metadata.create_all(engine)
+    conn = engine.raw_connection()
+    generator = datagen.DatasetGenerator()
+    tracker = plans.PlanTracker()
+    
+    def grow(loaded, db_size):
+        grow_database(conn, generator, loaded, db_size)
+    
+    def track_plan(scenario, db_size, query):
+        # EXPLAIN (FORMAT JSON) есть только в PostgreSQL
+        if not backend.supports_explain:
+            return {}
+        # План того же SQL, который ORM отправляет для .first()
+        sql = str(query.limit(1).statement.compile(engine, compile_kwargs={"literal_binds": True}))
+        with conn.cursor() as cursor:
+            plan = plans.explain(cursor, sql)
+        conn.rollback()
+        return tracker.check(scenario, db_size, plan)
     
     # Тест 1: Получение пользователя с заданным ID - простой запрос
-    for db_size in DB_SIZES:
-        setup_database(db_size)
-        
+    def measure(db_size, variant):
         # Создаем новую сессию для тестирования
         session = Session()
+        keys = sweep.lookup_keys(db_size, TEST_USER_ID, SAMPLE_KEYS)
         
         # Тест: User.objects.get(id=TEST_USER_ID)
         times = measure_execution_time(
-            lambda: session.query(User).filter(User.id == TEST_USER_ID).first()
+            lambda: session.query(User).filter(User.id == next(keys)).first()
         )
         results[f'get_by_id_{db_size}'] = times
+        harness.record('get_by_id', times['samples'], dataset_size=db_size, driver="sqlalchemy-orm",
+                       sampled_keys=SAMPLE_KEYS, **track_plan('get_by_id', db_size, session.query(User).filter(User.id == TEST_USER_ID)))
         
         # Тест: User.objects.filter(id=TEST_USER_ID).first()
         times = measure_execution_time(
-            lambda: session.query(User).filter(User.id == TEST_USER_ID).first()
+            lambda: session.query(User).filter(User.id == next(keys)).first()
         )
         results[f'filter_by_id_{db_size}'] = times
+        harness.record('filter_by_id', times['samples'], dataset_size=db_size, driver="sqlalchemy-orm",
+                       sampled_keys=SAMPLE_KEYS, **track_plan('filter_by_id', db_size, session.query(User).filter(User.id == TEST_USER_ID)))
         
         # Тест: User.objects.get(username='testuser42')
         times = measure_execution_time(
-            lambda: session.query(User).filter(User.username == f"testuser{TEST_USER_ID}").first()
+            lambda: session.query(User).filter(User.username == username(next(keys))).first()
         )
         results[f'get_by_username_{db_size}'] = times
+        harness.record('get_by_username', times['samples'], dataset_size=db_size, driver="sqlalchemy-orm",
+                       sampled_keys=SAMPLE_KEYS, **track_plan('get_by_username', db_size, session.query(User).filter(User.username == f"testuser{TEST_USER_ID}")))
         
         # Тест: сложный запрос - поиск активных пользователей с постами
         times = measure_execution_time(
             lambda: session.query(User).filter(
                 User.is_active == True,
-                User.id == TEST_USER_ID
+                User.id == next(keys)
             ).first()
         )
         results[f'complex_query_{db_size}'] = times
+        harness.record('complex_query', times['samples'], dataset_size=db_size, driver="sqlalchemy-orm",
+                       sampled_keys=SAMPLE_KEYS, **track_plan('complex_query', db_size, session.query(User).filter(User.is_active == True, User.id == TEST_USER_ID)))
         
         session.close()
     
+    try:
+        sweep.run_sweep(conn, db_sizes, grow, measure, TABLES.values())
+    finally:
+        conn.close()
+        engine.dispose()
+    
+    if backend.supports_explain:
+        tracker.print_summary()
+    
     # Выводим результаты
     print("\n=== РЕЗУЛЬТАТЫ ТЕСТОВ ===\n")
     
@@ -223,19 +224,19 @@ def run_django_benchmark():
     for test_code, test_name in test_names:
         print(f"\n{test_name}:")
         print("-" * 80)
-        print(f"{'Размер БД':<10} {'Среднее (ms)':<15} {'Медиана (ms)':<15} {'Мин (ms)':<15} {'Макс (ms)':<15} {'Стд. откл.':<15}")
+        print(f"{'Размер БД':<10} {'Среднее (ms)':<15} {'Медиана (ms)':<15} {'Мин (ms)':<15} {'p99 (ms)':<15} {'Макс (ms)':<15} {'Стд. откл.':<15}")
         print("-" * 80)
         
-        for db_size in DB_SIZES:
+        for db_size in db_sizes:
             key = f'{test_code}_{db_size}'
             result = results[key]
-            print(f"{db_size:<10} {result['mean']:<15.3f} {result['median']:<15.3f} {result['min']:<15.3f} {result['max']:<15.3f} {result['stdev']:<15.3f}")
+            print(f"{db_size:<10} {result['mean']:<15.3f} {result['median']:<15.3f} {result['min']:<15.3f} {result['p99']:<15.3f} {result['max']:<15.3f} {result['stdev']:<15.3f}")
         
         # Сравнение с базой в 1 запись
         baseline = results[f'{test_code}_1']['mean']
         print("-" * 80)
         print(f"Относительная производительность (отношение ко времени с 1 записью):")
-        for db_size in DB_SIZES[1:]:  # Пропускаем первый элемент (1 запись)
+        for db_size in db_sizes[1:]:  # Пропускаем первый элемент (1 запись)
             key = f'{test_code}_{db_size}'
             relative = results[key]['mean'] / baseline
             performance = "медленнее" if relative > 1 else "быстрее"
@@ -1,15 +1,12 @@
 #!/usr/bin/env python3
-import time
 import random
 import statistics
-import psycopg2
 
-# Параметры подключения к PostgreSQL
-DB_USER = "benchmark"
-DB_PASSWORD = "benchmark"
-DB_HOST = "localhost"
-DB_PORT = "5432"
-DB_NAME = "benchmark"
+import backends
+import harness
+import histogram
+import plans
+import sweep
 
 # ID тестового пользователя для поиска
 TEST_USER_ID = 42
@@ -19,26 +16,100 @@ TEST_NAME = "John Doe"
 # Размеры баз данных для тестирования
 DB_SIZES = [10, 100, 1000, 10000, 100000]
 
+# Добавлять ли размеры из sweep.SCALE_TIERS (1M, 10M, 50M записей)
+LARGE_SCALE = False
+
+# Запрашивать ли случайных пользователей по всему диапазону ID вместо тестового
+SAMPLE_KEYS = False
+
 # Количество запусков для каждого теста
 NUM_RUNS = 20
 
+# Колонки таблицы django_users в порядке значений user_rows()
+USER_COLUMNS = ["id", "username", "name", "email", "is_active"]
+
+# Варианты индексов, которые переключаются на одних и тех же данных
+INDEX_VARIANTS = {
+    "with_index": {"idx_users_name": "CREATE INDEX idx_users_name ON django_users (name)"},
+    "without_index": {},
+}
+
 def measure_execution_time(func):
     """Замеряет время выполнения функции"""
-    times = []
-    for _ in range(NUM_RUNS):
-        start_time = time.time()
-        func()
-        end_time = time.time()
-        times.append((end_time - start_time) * 1000)  # Время в миллисекундах
+    times = harness.measure(func, iterations=NUM_RUNS)  # Время в миллисекундах
+    
+    tail = histogram.Histogram.from_samples(times)
     
     return {
         'mean': statistics.mean(times),
         'median': statistics.median(times),
         'stdev': statistics.stdev(times) if len(times) > 1 else 0,
         'min': min(times),
-        'max': max(times)
+        'max': max(times),
+        'p99': tail.percentile(99),
+        'p99.9': tail.percentile(99.9),
+        'samples': times
     }
 
+def user_rows(db_size, loaded=0):
+    """
+    Генерирует строки django_users: тестовый пользователь и db_size - 1 остальных
+    
+    Args:
+        db_size: итоговое количество записей в таблице
+        loaded: количество уже загруженных записей (для дозаполнения таблицы)
+    """
+    if loaded == 0:
+        yield (TEST_USER_ID, f"user{TEST_USER_ID}", TEST_NAME, f"user{TEST_USER_ID}@example.com", True)
+    
+    for j in range(max(loaded - 1, 0), db_size - 1):
+        # Пропускаем ID тестового пользователя
+        user_id = j + 1
+        if user_id >= TEST_USER_ID:
+            user_id += 1
+        
+        yield (
+            user_id,
+            f"user{user_id}",
+            f"User Name {user_id}",
+            f"user{user_id}@example.com",
+            random.choice([True, True, True, False])  # 75% активных пользователей
+        )
+
+def user_name(user_id):
+    """Имя пользователя с заданным ID (у тестового пользователя - TEST_NAME)"""
+    return TEST_NAME if user_id == TEST_USER_ID else f"User Name {user_id}"
+
+def connect():
+    """Открывает соединение с базой данных текущего бэкенда"""
+    return backends.current().connect()
+
+def create_table(conn, with_index=True):
+    """Пересоздает пустую таблицу django_users"""
+    cursor = conn.cursor()
+    
+    # Удаляем таблицу, если она существует
+    cursor.execute("DROP TABLE IF EXISTS django_users")
+    conn.commit()
+    
+    # Создаем новую таблицу
+    cursor.execute(f"""
+    CREATE TABLE django_users (
+        id {backends.current().serial_pk},
+        username VARCHAR(150) UNIQUE NOT NULL,
+        name VARCHAR(150) NOT NULL,
+        email VARCHAR(254) UNIQUE NOT NULL,
+        is_active BOOLEAN NOT NULL DEFAULT TRUE
+    )
+    """)
+    
+    # Создаем индекс для поля name, если указано
+    if with_index:
+        cursor.execute(INDEX_VARIANTS["with_index"]["idx_users_name"])
+    
+    conn.commit()
+    cursor.close()
+
 def setup_database(db_size, with_index=True):
     """
     Настраивает базу данных для тестирования
@@ -51,67 +122,14 @@ def setup_database(db_size, with_index=True):
     
     try:
         # Соединение с базой данных
-        conn = psycopg2.connect(
-            user=DB_USER,
-            password=DB_PASSWORD,
-            host=DB_HOST,
-            port=DB_PORT,
-            database=DB_NAME
-        )
-        
-        cursor = conn.cursor()
-        
-        # Удаляем таблицу, если она существует
-        cursor.execute("DROP TABLE IF EXISTS django_users")
-        conn.commit()
-        
-        # Создаем новую таблицу
-        cursor.execute("""
-        CREATE TABLE django_users (
-            id SERIAL PRIMARY KEY,
-            username VARCHAR(150) UNIQUE NOT NULL,
-            name VARCHAR(150) NOT NULL,
-            email VARCHAR(254) UNIQUE NOT NULL,
-            is_active BOOLEAN NOT NULL DEFAULT TRUE
-        )
-        """)
-        
-        # Создаем индекс для поля name, если указано
-        if with_index:
-            cursor.execute("CREATE INDEX idx_users_name ON django_users (name)")
-        
-        conn.commit()
-        
-        # Вставляем тестового пользователя с заданным ID
-        cursor.execute("""
-        INSERT INTO django_users (id, username, name, email, is_active)
-        VALUES (%s, %s, %s, %s, %s)
-        """, (TEST_USER_ID, f"user{TEST_USER_ID}", TEST_NAME, f"user{TEST_USER_ID}@example.com", True))
+        conn = connect()
+        create_table(conn, with_index)
         
-        # Создаем остальных пользователей пакетными вставками
-        batch_size = 1000
-        for i in range(0, db_size - 1, batch_size):
-            values = []
-            for j in range(i, min(i + batch_size, db_size - 1)):
-                # Пропускаем ID тестового пользователя
-                user_id = j + 1
-                if user_id >= TEST_USER_ID:
-                    user_id += 1
-                
-                values.append((
-                    user_id,
-                    f"user{user_id}",
-                    f"User Name {user_id}",
-                    f"user{user_id}@example.com",
-                    random.choice([True, True, True, False])  # 75% активных пользователей
-                ))
-            
-            args_str = ','.join(cursor.mogrify("(%s,%s,%s,%s,%s)", v).decode('utf-8') for v in values)
-            if args_str:  # Проверяем, что есть что вставлять
-                cursor.execute(f"INSERT INTO django_users (id, username, name, email, is_active) VALUES {args_str}")
-                conn.commit()
+        # Загружаем тестового пользователя и остальных пользователей (COPY на PostgreSQL)
+        backends.current().load(conn, "django_users", USER_COLUMNS, user_rows(db_size))
         
         # Анализируем таблицу для обновления статистики запросов
+        cursor = conn.cursor()
         cursor.execute("ANALYZE django_users")
         conn.commit()
         
@@ -124,6 +142,7 @@ def setup_database(db_size, with_index=True):
             conn.close()
         return None
 
+@harness.suite("django_index_benchmark", portable=True)
 def run_benchmark():
     """Запускает бенчмарк с разными размерами баз данных и с/без индексации"""
     
@@ -135,64 +154,86 @@ def run_benchmark():
     
     # Результаты для запросов по имени без индекса
     name_results_without_index = {}
+    db_sizes = DB_SIZES + sweep.SCALE_TIERS if LARGE_SCALE else DB_SIZES
+    backend = backends.current()
+    pk_query = backend.sql("SELECT * FROM django_users WHERE id = %s")
+    name_query = backend.sql("SELECT * FROM django_users WHERE name = %s")
     
-    # Тесты с индексацией по name
-    for db_size in DB_SIZES:
-        conn = setup_database(db_size, with_index=True)
-        if not conn:
-            continue
-        
+    try:
+        conn = connect()
+        create_table(conn, with_index=False)
         cursor = conn.cursor()
-        
-        # Тест: запрос по первичному ключу (id)
-        pk_times = measure_execution_time(
-            lambda: cursor.execute("SELECT * FROM django_users WHERE id = %s", (TEST_USER_ID,)) or cursor.fetchone()
-        )
-        pk_results_with_index[db_size] = pk_times
-        
-        # Тест: запрос по имени (с индексом)
-        name_times = measure_execution_time(
-            lambda: cursor.execute("SELECT * FROM django_users WHERE name = %s", (TEST_NAME,)) or cursor.fetchone()
-        )
-        name_results_with_index[db_size] = name_times
-        
-        cursor.close()
-        conn.close()
+        tracker = plans.PlanTracker()
+    except Exception as e:
+        print(f"Произошла ошибка при настройке базы данных: {e}")
+        return
+    
+    def grow(loaded, db_size):
+        # Дозагружаем только недостающих пользователей
+        backend.load(conn, "django_users", USER_COLUMNS, user_rows(db_size, loaded))
     
-    # Тесты без индексации по name
-    for db_size in DB_SIZES:
-        conn = setup_database(db_size, with_index=False)
-        if not conn:
-            continue
+    def track_plan(scenario, db_size, query, params, variant=None):
+        # EXPLAIN (FORMAT JSON) есть только в PostgreSQL
+        if not backend.supports_explain:
+            return {}
+        return tracker.check(scenario, db_size, plans.explain(cursor, query, params), variant)
+    
+    def measure(db_size, variant):
+        with_index = variant == "with_index"
+        keys = sweep.lookup_keys(db_size, TEST_USER_ID, SAMPLE_KEYS)
         
-        cursor = conn.cursor()
+        if with_index:
+            # Тест: запрос по первичному ключу (id)
+            pk_times = measure_execution_time(
+                lambda: backends.fetchone(cursor, pk_query, (next(keys),))
+            )
+            pk_results_with_index[db_size] = pk_times
+            harness.record("pk_lookup", pk_times['samples'], dataset_size=db_size, driver=backend.driver, name_index=True,
+                           sampled_keys=SAMPLE_KEYS, **track_plan("pk_lookup", db_size, pk_query, (TEST_USER_ID,)))
         
-        # Тест: запрос по имени (без индекса)
+        # Тест: запрос по имени (с индексом или без)
         name_times = measure_execution_time(
-            lambda: cursor.execute("SELECT * FROM django_users WHERE name = %s", (TEST_NAME,)) or cursor.fetchone()
+            lambda: backends.fetchone(cursor, name_query, (user_name(next(keys)),))
         )
-        name_results_without_index[db_size] = name_times
-        
+        if with_index:
+            name_results_with_index[db_size] = name_times
+        else:
+            name_results_without_index[db_size] = name_times
+        harness.record("name_lookup", name_times['samples'], dataset_size=db_size, driver=backend.driver, name_index=with_index,
+                       sampled_keys=SAMPLE_KEYS, **track_plan("name_lookup", db_size, name_query, (TEST_NAME,), variant))
+    
+    # Таблица растет от меньшего размера к большему, индекс переключается на тех же данных
+    try:
+        sweep.run_sweep(conn, db_sizes, grow, measure, ["django_users"], INDEX_VARIANTS)
+    except Exception as e:
+        print(f"Произошла ошибка: {e}")
+    finally:
         cursor.close()
         conn.close()
     
+    if backend.supports_explain:
+        tracker.print_summary()
+    
+    if len(name_results_without_index) < len(db_sizes):
+        return
+    
     # Выводим результаты
     print("\n=== РЕЗУЛЬТАТЫ БЕНЧМАРКА ===\n")
     
     # Запросы по первичному ключу (id)
     print("\nЗапрос по первичному ключу (id):")
     print("-" * 100)
-    print(f"{'Размер БД':<10} {'Среднее (ms)':<15} {'Медиана (ms)':<15} {'Мин (ms)':<15} {'Макс (ms)':<15} {'Стд. откл.':<15}")
+    print(f"{'Размер БД':<10} {'Среднее (ms)':<15} {'Медиана (ms)':<15} {'Мин (ms)':<15} {'p99 (ms)':<15} {'Макс (ms)':<15} {'Стд. откл.':<15}")
     print("-" * 100)
     
-    baseline_pk = pk_results_with_index[DB_SIZES[0]]['mean']
-    for db_size in DB_SIZES:
+    baseline_pk = pk_results_with_index[db_sizes[0]]['mean']
+    for db_size in db_sizes:
         result = pk_results_with_index[db_size]
-        print(f"{db_size:<10} {result['mean']:<15.3f} {result['median']:<15.3f} {result['min']:<15.3f} {result['max']:<15.3f} {result['stdev']:<15.3f}")
+        print(f"{db_size:<10} {result['mean']:<15.3f} {result['median']:<15.3f} {result['min']:<15.3f} {result['p99']:<15.3f} {result['max']:<15.3f} {result['stdev']:<15.3f}")
     
     print("-" * 100)
-    print(f"Относительная производительность (отношение ко времени с {DB_SIZES[0]} записями):")
-    for db_size in DB_SIZES[1:]:
+    print(f"Относительная производительность (отношение ко времени с {db_sizes[0]} записями):")
+    for db_size in db_sizes[1:]:
         relative = pk_results_with_index[db_size]['mean'] / baseline_pk
         performance = "медленнее" if relative > 1 else "быстрее"
         print(f"{db_size:<10} {relative:<15.3f}x {performance}")
@@ -200,17 +241,17 @@ def run_benchmark():
     # Запросы по имени с индексом
     print("\nЗапрос по имени с индексом:")
     print("-" * 100)
-    print(f"{'Размер БД':<10} {'Среднее (ms)':<15} {'Медиана (ms)':<15} {'Мин (ms)':<15} {'Макс (ms)':<15} {'Стд. откл.':<15}")
+    print(f"{'Размер БД':<10} {'Среднее (ms)':<15} {'Медиана (ms)':<15} {'Мин (ms)':<15} {'p99 (ms)':<15} {'Макс (ms)':<15} {'Стд. откл.':<15}")
     print("-" * 100)
     
-    baseline_name_idx = name_results_with_index[DB_SIZES[0]]['mean']
-    for db_size in DB_SIZES:
+    baseline_name_idx = name_results_with_index[db_sizes[0]]['mean']
+    for db_size in db_sizes:
         result = name_results_with_index[db_size]
-        print(f"{db_size:<10} {result['mean']:<15.3f} {result['median']:<15.3f} {result['min']:<15.3f} {result['max']:<15.3f} {result['stdev']:<15.3f}")
+        print(f"{db_size:<10} {result['mean']:<15.3f} {result['median']:<15.3f} {result['min']:<15.3f} {result['p99']:<15.3f} {result['max']:<15.3f} {result['stdev']:<15.3f}")
     
     print("-" * 100)
-    print(f"Относительная производительность (отношение ко времени с {DB_SIZES[0]} записями):")
-    for db_size in DB_SIZES[1:]:
+    print(f"Относительная производительность (отношение ко времени с {db_sizes[0]} записями):")
+    for db_size in db_sizes[1:]:
         relative = name_results_with_index[db_size]['mean'] / baseline_name_idx
         performance = "медленнее" if relative > 1 else "быстрее"
         print(f"{db_size:<10} {relative:<15.3f}x {performance}")
@@ -218,17 +259,17 @@ def run_benchmark():
     # Запросы по имени без индекса
     print("\nЗапрос по имени без индекса:")
     print("-" * 100)
-    print(f"{'Размер БД':<10} {'Среднее (ms)':<15} {'Медиана (ms)':<15} {'Мин (ms)':<15} {'Макс (ms)':<15} {'Стд. откл.':<15}")
+    print(f"{'Размер БД':<10} {'Среднее (ms)':<15} {'Медиана (ms)':<15} {'Мин (ms)':<15} {'p99 (ms)':<15} {'Макс (ms)':<15} {'Стд. откл.':<15}")
     print("-" * 100)
     
-    baseline_name_no_idx = name_results_without_index[DB_SIZES[0]]['mean']
-    for db_size in DB_SIZES:
+    baseline_name_no_idx = name_results_without_index[db_sizes[0]]['mean']
+    for db_size in db_sizes:
         result = name_results_without_index[db_size]
-        print(f"{db_size:<10} {result['mean']:<15.3f} {result['median']:<15.3f} {result['min']:<15.3f} {result['max']:<15.3f} {result['stdev']:<15.3f}")
+        print(f"{db_size:<10} {result['mean']:<15.3f} {result['median']:<15.3f} {result['min']:<15.3f} {result['p99']:<15.3f} {result['max']:<15.3f} {result['stdev']:<15.3f}")
     
     print("-" * 100)
-    print(f"Относительная производительность (отношение ко времени с {DB_SIZES[0]} записями):")
-    for db_size in DB_SIZES[1:]:
+    print(f"Относительная производительность (отношение ко времени с {db_sizes[0]} записями):")
+    for db_size in db_sizes[1:]:
         relative = name_results_without_index[db_size]['mean'] / baseline_name_no_idx
         performance = "медленнее" if relative > 1 else "быстрее"
         print(f"{db_size:<10} {relative:<15.3f}x {performance}")
@@ -239,7 +280,7 @@ def run_benchmark():
     print(f"{'Размер БД':<10} {'Без индекса (ms)':<20} {'С индексом (ms)':<20} {'Ускорение':<15}")
     print("-" * 100)
     
-    for db_size in DB_SIZES:
+    for db_size in db_sizes:
         without_idx = name_results_without_index[db_size]['mean']
         with_idx = name_results_with_index[db_size]['mean']
         speedup = without_idx / with_idx
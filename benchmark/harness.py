@@ -0,0 +1,462 @@
+#!/usr/bin/env python3
+"""
+Общий модуль для запуска бенчмарков внутри одного процесса.
+
+Скрипты регистрируют свои наборы сценариев декоратором suite(), а каждый
+замер передают в record(). Каждая запись - один JSON-объект с сырыми
+значениями по итерациям, гистограммой задержек, размером набора данных,
+драйвером, бэкендом, коммитом и отпечатком машины.
+
+С jobs > 1 run_suites() выполняет прогоны наборов в пуле процессов.
+Каждый процесс работает в своей схеме PostgreSQL (backends.isolate),
+поэтому наборы с одинаковыми именами таблиц не мешают друг другу, а
+записи собираются в родительском процессе.
+"""
+import contextlib
+import datetime
+import gc
+import hashlib
+import importlib
+import io
+import json
+import multiprocessing
+import os
+import platform
+import subprocess
+import threading
+import time
+import tracemalloc
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import backends
+import histogram as _histogram
+
+# Модули, которые регистрируют свои наборы сценариев при импорте
+SUITE_MODULES = [
+    "benchmark",
+    "benchmark_raw",
+    "benchmark_size",
+    "django_benchmark",
+    "django_index_benchmark",
+    "benchmark_insert",
+    "benchmark_stream",
+    "benchmark_load",
+    "benchmark_prepared",
+    "benchmark_index_matrix",
+    "benchmark_coldstart",
+    "benchmark_connect",
+    "benchmark_pagination",
+    "benchmark_aggregate",
+    "benchmark_materialize",
+    "benchmark_session",
+    "benchmark_write",
+    "benchmark_openloop",
+]
+
+# Зарегистрированные наборы сценариев: имя -> функция без аргументов
+SUITES = {}
+
+# Наборы, которые работают на любом бэкенде из backends.BACKENDS
+PORTABLE = set()
+
+# Наборы, которые при параллельном запуске выполняются по одному после остальных:
+# они сами создают параллельную нагрузку или меряют ее
+EXCLUSIVE = set()
+
+# Префикс схемы PostgreSQL процесса пула: worker_0, worker_1, ...
+WORKER_SCHEMA_PREFIX = "worker_"
+
+# Записи, собранные за время работы процесса
+RECORDS = []
+
+# Наибольшее количество исходных значений, которые сохраняются в записи;
+# при большем количестве в записи остается только гистограмма
+MAX_SAMPLES = 10000
+
+# Контекст текущего запуска (заполняется в run_suite)
+_context = {"suite": None, "run": None}
+
+# Поток для построчной записи JSON (None - запись только в RECORDS)
+_output = None
+
+# Кэш для коммита и отпечатка машины
+_metadata = {}
+
+
+def suite(name, portable=False, exclusive=False):
+    """
+    Декоратор: регистрирует функцию как набор сценариев с именем name
+
+    portable=True - набор получает базу через backends.current() и может
+    выполняться не только на PostgreSQL.
+    exclusive=True - при параллельном запуске набор не делит машину с
+    другими наборами.
+    """
+    def decorator(func):
+        SUITES[name] = func
+        if portable:
+            PORTABLE.add(name)
+        if exclusive:
+            EXCLUSIVE.add(name)
+        return func
+    return decorator
+
+
+def measure(func, iterations=10):
+    """Выполняет func заданное число раз и возвращает время каждой итерации в ms"""
+    samples = []
+    for _ in range(iterations):
+        start_time = time.perf_counter()
+        func()
+        end_time = time.perf_counter()
+        samples.append((end_time - start_time) * 1000)
+    return samples
+
+
+def measure_histogram(func, iterations=10, into=None, duration=None):
+    """
+    Выполняет func заданное число раз и возвращает гистограмму времени итераций
+
+    В отличие от measure() отдельные значения не сохраняются, поэтому
+    память не зависит от количества итераций.
+
+    Args:
+        into: гистограмма, в которую добавляются значения (по умолчанию новая)
+        duration: выполнять func, пока не пройдет duration секунд (iterations
+            тогда не используется)
+    """
+    result = into if into is not None else _histogram.Histogram()
+    if duration is None:
+        for _ in range(iterations):
+            start_time = time.perf_counter()
+            func()
+            end_time = time.perf_counter()
+            result.record((end_time - start_time) * 1000)
+        return result
+
+    deadline = time.perf_counter() + duration
+    while True:
+        start_time = time.perf_counter()
+        if start_time >= deadline:
+            break
+        func()
+        end_time = time.perf_counter()
+        result.record((end_time - start_time) * 1000)
+    return result
+
+
+def measure_cold(open_session, call, close_session=None, sessions=10, warmup=20, steady=100):
+    """
+    Замеряет холодный старт: открытие сессии, первый вызов, разогрев и установившийся режим
+
+    Для каждой из sessions новых сессий open_session() открывает сессию
+    (соединение, сессию ORM и т.п.), затем call(session) выполняется
+    warmup раз подряд (первый из них - первый вызов на новой сессии)
+    и еще steady раз для установившегося режима.
+
+    Returns:
+        {"open": [ms на сессию], "first": [ms на сессию],
+         "warmup": [медиана k-го вызова по сессиям], "steady": [ms всех вызовов после разогрева]}
+    """
+    result = {"open": [], "first": [], "warmup": [], "steady": []}
+    curves = []
+    for _ in range(sessions):
+        start_time = time.perf_counter()
+        session = open_session()
+        result["open"].append((time.perf_counter() - start_time) * 1000)
+        try:
+            curve = measure(lambda: call(session), iterations=warmup)
+            result["steady"].extend(measure(lambda: call(session), iterations=steady))
+        finally:
+            if close_session is not None:
+                close_session(session)
+        result["first"].append(curve[0])
+        curves.append(curve)
+    result["warmup"] = [percentile(values, 50) for values in zip(*curves)]
+    return result
+
+
+def percentile(samples, q):
+    """Возвращает q-й перцентиль (0-100) с линейной интерполяцией между значениями"""
+    ordered = sorted(samples)
+    if not ordered:
+        return None
+    position = (len(ordered) - 1) * q / 100
+    lower = int(position)
+    upper = min(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (position - lower)
+
+
+def rss_bytes():
+    """Текущий размер резидентной памяти процесса (None, если недоступен)"""
+    try:
+        with open("/proc/self/statm") as statm:
+            return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+def measure_memory(func, trace=True, interval=0.005):
+    """
+    Выполняет func и замеряет время и пиковое потребление памяти
+
+    RSS опрашивается фоновым потоком во время выполнения и учитывает память
+    драйвера (буферы libpq), которую tracemalloc не видит. Для tracemalloc
+    func выполняется повторно, чтобы трассировка не искажала время.
+
+    Returns:
+        словарь с time_ms, rss_peak_bytes (прирост относительно начала)
+        и tracemalloc_peak_bytes (если trace=True)
+    """
+    gc.collect()
+    baseline = rss_bytes()
+    peak = [baseline]
+    stop = threading.Event()
+
+    def sample():
+        while not stop.wait(interval):
+            peak[0] = max(peak[0], rss_bytes())
+
+    sampler = threading.Thread(target=sample, daemon=True)
+    if baseline is not None:
+        sampler.start()
+    start_time = time.perf_counter()
+    func()
+    end_time = time.perf_counter()
+    stop.set()
+    if baseline is not None:
+        sampler.join()
+        peak[0] = max(peak[0], rss_bytes())
+
+    result = {
+        "time_ms": (end_time - start_time) * 1000,
+        "rss_peak_bytes": peak[0] - baseline if baseline is not None else None,
+    }
+
+    if trace:
+        gc.collect()
+        tracemalloc.start()
+        try:
+            func()
+            result["tracemalloc_peak_bytes"] = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+    return result
+
+
+def git_commit():
+    """Возвращает хэш текущего коммита или None, если git недоступен"""
+    if "commit" not in _metadata:
+        try:
+            _metadata["commit"] = subprocess.run(
+                ["git", "rev-parse", "HEAD"],
+                cwd=os.path.dirname(os.path.abspath(__file__)),
+                capture_output=True, text=True, check=True
+            ).stdout.strip()
+        except (OSError, subprocess.CalledProcessError):
+            _metadata["commit"] = None
+    return _metadata["commit"]
+
+
+def host_fingerprint():
+    """Описание машины, на которой выполняется бенчмарк, и его короткий хэш"""
+    if "host" not in _metadata:
+        info = {
+            "hostname": platform.node(),
+            "platform": platform.platform(),
+            "machine": platform.machine(),
+            "processor": platform.processor(),
+            "cpu_count": os.cpu_count(),
+            "python": platform.python_version(),
+        }
+        digest = hashlib.sha1(json.dumps(info, sort_keys=True).encode("utf-8"))
+        info["id"] = digest.hexdigest()[:12]
+        _metadata["host"] = info
+    return _metadata["host"]
+
+
+def record(scenario, samples, dataset_size=None, driver=None, histogram=None, **extra):
+    """
+    Сохраняет результат одного сценария
+
+    Args:
+        scenario: название сценария
+        samples: время каждой итерации в ms (может быть пустым, если передана histogram);
+            если значений больше MAX_SAMPLES, в запись попадает только гистограмма
+        dataset_size: количество строк в тестовой таблице
+        driver: способ доступа к базе (sqlalchemy-orm, psycopg2, ...)
+        histogram: гистограмма задержек (по умолчанию строится по samples)
+        extra: дополнительные поля записи
+    """
+    if histogram is None:
+        histogram = _histogram.Histogram.from_samples(samples)
+    entry = {
+        "suite": _context["suite"],
+        "run": _context["run"],
+        "scenario": scenario,
+        "driver": driver,
+        "backend": backends.current().name,
+        "dataset_size": dataset_size,
+        "unit": "ms",
+        "samples": list(samples) if len(samples) <= MAX_SAMPLES else [],
+        "histogram": histogram.to_dict(),
+        "percentiles": histogram.summary(),
+        "timestamp": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        "commit": git_commit(),
+        "host": host_fingerprint(),
+    }
+    if _context.get("jobs"):
+        # Замер выполнялся одновременно с другими наборами
+        entry["jobs"] = _context["jobs"]
+    entry.update(extra)
+    _store(entry)
+    return entry
+
+
+def _store(entry):
+    RECORDS.append(entry)
+    if _output is not None:
+        _output.write(json.dumps(entry, ensure_ascii=False) + "\n")
+        _output.flush()
+
+
+def load_suites(modules=None):
+    """Импортирует модули бенчмарков, чтобы они зарегистрировали свои сценарии"""
+    for module in modules or SUITE_MODULES:
+        importlib.import_module(module)
+    return SUITES
+
+
+def run_suite(name, run=0, quiet=False):
+    """Выполняет один набор сценариев и возвращает созданные им записи"""
+    start = len(RECORDS)
+    _context["suite"] = name
+    _context["run"] = run
+    try:
+        with contextlib.redirect_stdout(io.StringIO()) if quiet else contextlib.nullcontext():
+            SUITES[name]()
+    except Exception as e:
+        print(f"Произошла ошибка в наборе {name}: {e}")
+    finally:
+        _context["suite"] = None
+        _context["run"] = None
+    return RECORDS[start:]
+
+
+def split_cpus(cpus, jobs):
+    """Делит CPU на jobs непересекающихся групп подряд идущих номеров (или по одному CPU, если их мало)"""
+    cpus = sorted(cpus)
+    if len(cpus) < jobs:
+        return [{cpu} for cpu in cpus]
+    return [set(cpus[len(cpus) * i // jobs:len(cpus) * (i + 1) // jobs]) for i in range(jobs)]
+
+
+def _init_worker(counter, cpu_sets, jobs):
+    """Подготовка процесса пула: номер, привязка к CPU и своя схема"""
+    global _output
+    # Файл результатов пишет только родительский процесс
+    _output = None
+    _context["jobs"] = jobs
+    with counter.get_lock():
+        index = counter.value
+        counter.value += 1
+    if cpu_sets:
+        os.sched_setaffinity(0, cpu_sets[index % len(cpu_sets)])
+    backends.isolate(f"{WORKER_SCHEMA_PREFIX}{index}")
+    load_suites()
+
+
+def _run_task(backend_name, name, run, quiet):
+    with backends.use(backend_name):
+        return run_suite(name, run, quiet=quiet)
+
+
+def _tasks(names, runs, backend_names):
+    """Прогоны (бэкенд, набор, номер прогона) в порядке последовательного запуска"""
+    tasks = []
+    for backend_name in backend_names:
+        for name in names:
+            if backend_name != backends.DEFAULT_BACKEND and name not in PORTABLE:
+                print(f"  {name}: пропущен, работает только на {backends.DEFAULT_BACKEND}")
+                continue
+            tasks.extend((backend_name, name, run) for run in range(runs))
+    return tasks
+
+
+def _run_parallel(tasks, runs, quiet, jobs, cpus):
+    """Выполняет прогоны в пуле из jobs процессов, а наборы из EXCLUSIVE - затем по одному"""
+    shared = [task for task in tasks if task[1] not in EXCLUSIVE]
+    exclusive = [task for task in tasks if task[1] in EXCLUSIVE]
+    cpu_sets = split_cpus(cpus, jobs) if cpus else None
+    counter = multiprocessing.Value("i", 0)
+
+    print(f"  Параллельный запуск: {len(shared)} прогонов в {jobs} процессах")
+    with ProcessPoolExecutor(max_workers=jobs, initializer=_init_worker,
+                             initargs=(counter, cpu_sets, jobs)) as pool:
+        futures = {pool.submit(_run_task, *task, quiet): task for task in shared}
+        for future in as_completed(futures):
+            backend_name, name, run = futures[future]
+            print(f"  {name} ({backend_name}): прогон {run + 1}/{runs} завершен")
+            for entry in future.result():
+                _store(entry)
+
+    for backend_name, name, run in exclusive:
+        print(f"  {name} ({backend_name}): прогон {run + 1}/{runs} (отдельно от других наборов)...")
+        with backends.use(backend_name):
+            run_suite(name, run, quiet=quiet)
+
+
+def run_suites(names=None, runs=1, output=None, quiet=False, backend_names=None, jobs=1, cpus=None):
+    """
+    Выполняет наборы сценариев в текущем процессе
+
+    Args:
+        names: имена наборов (по умолчанию все зарегистрированные)
+        runs: количество прогонов каждого набора
+        output: путь к файлу JSON Lines для записи результатов
+        quiet: подавлять вывод самих скриптов
+        backend_names: бэкенды из backends.BACKENDS (по умолчанию только
+            backends.DEFAULT_BACKEND); наборы, которые не помечены как
+            portable, на остальных бэкендах пропускаются
+        jobs: количество процессов для параллельного запуска прогонов
+        cpus: номера CPU; с jobs > 1 каждый процесс привязывается к своей
+            группе, иначе к ним привязывается текущий процесс
+
+    Returns:
+        список записей, созданных за время запуска
+    """
+    global _output
+    load_suites()
+    names = names or list(SUITES)
+    start = len(RECORDS)
+    stream = open(output, "a", encoding="utf-8") if output else None
+    _output = stream
+    try:
+        if jobs > 1:
+            tasks = _tasks(names, runs, backend_names or [backends.DEFAULT_BACKEND])
+            _run_parallel(tasks, runs, quiet, jobs, cpus)
+            return RECORDS[start:]
+        if cpus:
+            os.sched_setaffinity(0, cpus)
+        for backend_name in backend_names or [backends.DEFAULT_BACKEND]:
+            with backends.use(backend_name):
+                for name in names:
+                    if backend_name != backends.DEFAULT_BACKEND and name not in PORTABLE:
+                        print(f"  {name}: пропущен, работает только на {backends.DEFAULT_BACKEND}")
+                        continue
+                    for run in range(runs):
+                        print(f"  {name} ({backend_name}): прогон {run + 1}/{runs}...")
+                        run_suite(name, run, quiet=quiet)
+    finally:
+        _output = None
+        if stream is not None:
+            stream.close()
+    return RECORDS[start:]
+
+
+def group_samples(records, key):
+    """Группирует значения записей по ключу key(record) -> список значений"""
+    groups = {}
+    for entry in records:
+        groups.setdefault(key(entry), []).extend(entry["samples"])
+    return groups
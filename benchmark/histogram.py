@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+"""
+Гистограммы задержек с логарифмическими корзинами (в духе HdrHistogram).
+
+Значения хранятся в наносекундах. Каждый интервал [2^k, 2^(k+1)) делится
+на 2^(SUB_BUCKET_BITS - 1) равных корзин, поэтому относительная ошибка
+любого перцентиля не превышает 2^-(SUB_BUCKET_BITS - 1) (0.8% при 8 битах),
+а количество корзин не зависит от количества значений: гистограмма
+миллиона запросов занимает столько же памяти, сколько гистограмма сотни.
+
+Гистограммы потоков и процессов складываются через merge(), сохраняются
+в JSON через to_dict() и восстанавливаются через from_dict().
+"""
+
+# Количество бит точности: 2^(SUB_BUCKET_BITS - 1) корзин на каждую степень двойки
+SUB_BUCKET_BITS = 8
+
+# Перцентили, которые выводятся в отчетах
+PERCENTILES = [50, 90, 95, 99, 99.9]
+
+# Наносекунд в миллисекунде
+NS_PER_MS = 1000000
+
+
+def percentile_label(q):
+    """Подпись перцентиля: 50 -> 'p50', 99.9 -> 'p99.9'"""
+    return f"p{q:g}"
+
+
+class Histogram:
+    """Гистограмма задержек в ms с фиксированной относительной точностью"""
+
+    def __init__(self, sub_bucket_bits=SUB_BUCKET_BITS):
+        self.sub_bucket_bits = sub_bucket_bits
+        self.sub_bucket_count = 1 << sub_bucket_bits
+        self.half_count = self.sub_bucket_count // 2
+        # Индекс корзины -> количество значений (хранятся только непустые корзины)
+        self.counts = {}
+        self.count = 0
+        self.total_ns = 0
+        self.min_ns = None
+        self.max_ns = None
+
+    def _index(self, value):
+        if value < self.sub_bucket_count:
+            return value
+        shift = value.bit_length() - self.sub_bucket_bits
+        top = value >> shift
+        return self.sub_bucket_count + (shift - 1) * self.half_count + (top - self.half_count)
+
+    def _bounds(self, index):
+        """Наименьшее и наибольшее значение в нс, попадающие в корзину"""
+        if index < self.sub_bucket_count:
+            return index, index
+        shift, offset = divmod(index - self.sub_bucket_count, self.half_count)
+        shift += 1
+        top = offset + self.half_count
+        return top << shift, ((top + 1) << shift) - 1
+
+    def record(self, value_ms, count=1):
+        """Добавляет значение в ms (count раз)"""
+        value = max(0, int(value_ms * NS_PER_MS))
+        index = self._index(value)
+        self.counts[index] = self.counts.get(index, 0) + count
+        self.count += count
+        self.total_ns += value * count
+        self.min_ns = value if self.min_ns is None else min(self.min_ns, value)
+        self.max_ns = value if self.max_ns is None else max(self.max_ns, value)
+
+    def record_all(self, samples):
+        for value in samples:
+            self.record(value)
+        return self
+
+    def merge(self, other):
+        """Добавляет значения другой гистограммы с той же точностью"""
+        if other.sub_bucket_bits != self.sub_bucket_bits:
+            raise ValueError("Нельзя объединить гистограммы с разной точностью")
+        for index, count in other.counts.items():
+            self.counts[index] = self.counts.get(index, 0) + count
+        self.count += other.count
+        self.total_ns += other.total_ns
+        for value in (other.min_ns, other.max_ns):
+            if value is not None:
+                self.min_ns = value if self.min_ns is None else min(self.min_ns, value)
+                self.max_ns = value if self.max_ns is None else max(self.max_ns, value)
+        return self
+
+    def percentile(self, q):
+        """q-й перцентиль (0-100) в ms; None для пустой гистограммы"""
+        if not self.count:
+            return None
+        if q >= 100:
+            return self.max
+        rank = max(1, -(-self.count * q // 100))  # округление вверх
+        seen = 0
+        for index in sorted(self.counts):
+            seen += self.counts[index]
+            if seen >= rank:
+                return self._value(index)
+        return self.max
+
+    def _value(self, index):
+        """Значение корзины в ms: середина, но не за пределами наблюдаемых значений"""
+        lower, upper = self._bounds(index)
+        return min(max((lower + upper) / 2, self.min_ns), self.max_ns) / NS_PER_MS
+
+    def values(self):
+        """Пары (значение в ms, количество) по непустым корзинам в порядке возрастания"""
+        return [(self._value(index), self.counts[index]) for index in sorted(self.counts)]
+
+    @property
+    def min(self):
+        return self.min_ns / NS_PER_MS if self.min_ns is not None else None
+
+    @property
+    def max(self):
+        return self.max_ns / NS_PER_MS if self.max_ns is not None else None
+
+    @property
+    def mean(self):
+        return self.total_ns / self.count / NS_PER_MS if self.count else None
+
+    def summary(self):
+        """{'count', 'mean', 'min', 'p50', 'p90', 'p95', 'p99', 'p99.9', 'max'} в ms"""
+        result = {"count": self.count, "mean": self.mean, "min": self.min}
+        for q in PERCENTILES:
+            result[percentile_label(q)] = self.percentile(q)
+        result["max"] = self.max
+        return result
+
+    def to_dict(self):
+        """Представление для JSON"""
+        return {
+            "sub_bucket_bits": self.sub_bucket_bits,
+            "unit": "ns",
+            "count": self.count,
+            "total": self.total_ns,
+            "min": self.min_ns,
+            "max": self.max_ns,
+            # Ключи JSON - строки, поэтому корзины хранятся парами [индекс, количество]
+            "buckets": sorted(self.counts.items()),
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        histogram = cls(data["sub_bucket_bits"])
+        histogram.counts = {index: count for index, count in data["buckets"]}
+        histogram.count = data["count"]
+        histogram.total_ns = data["total"]
+        histogram.min_ns = data["min"]
+        histogram.max_ns = data["max"]
+        return histogram
+
+    @classmethod
+    def from_samples(cls, samples):
+        return cls().record_all(samples)
@@ -0,0 +1,466 @@
+#!/usr/bin/env python3
+"""
+История результатов бенчмарков и проверка на регрессии.
+
+Каждый запуск run_suites.py добавляет свои записи в файл SQLite
+(HISTORY_PATH): строку в таблице runs на запуск и по строке в таблице
+results на каждую запись harness.record() - с исходными значениями,
+гистограммой, коммитом и отпечатком машины.
+
+Команда compare сравнивает последний запуск со скользящей базой из
+BASELINE_RUNS предыдущих запусков на той же машине. Для каждого
+сценария считается односторонний U-критерий Манна-Уитни и бутстреп
+доверительного интервала для относительного изменения медианы.
+Замедление считается регрессией, если p < ALPHA, нижняя граница
+интервала выше нуля, а медиана выросла больше чем на MIN_SLOWDOWN.
+При найденных регрессиях команда завершается с кодом 1, поэтому ее
+можно использовать как проверку в CI:
+
+    python history.py trend --suite benchmark_raw
+    python history.py compare
+"""
+import argparse
+import fnmatch
+import json
+import math
+import sqlite3
+import sys
+
+import numpy as np
+
+import histogram
+
+# Файл истории по умолчанию
+HISTORY_PATH = "history.sqlite3"
+
+# Количество предыдущих запусков, из которых складывается база
+BASELINE_RUNS = 5
+
+# Уровень значимости критерия Манна-Уитни
+ALPHA = 0.01
+
+# Минимальный рост медианы, который считается регрессией (0.05 = 5%)
+MIN_SLOWDOWN = 0.05
+
+# Минимальное количество значений в базе и в текущем запуске
+MIN_SAMPLES = 5
+
+# Минимальное количество предыдущих запусков в базе: значения одного запуска
+# не показывают разброс между запусками, и вывод по ним ненадежен
+MIN_BASELINE_RUNS = 3
+
+# Параметры бутстрепа
+BOOTSTRAP_ITERATIONS = 1000
+CONFIDENCE = 0.95
+SEED = 42
+
+# Поля, которые harness.record() добавляет в каждую запись: ключ сценария и служебные данные
+RECORD_FIELDS = {
+    "suite", "run", "scenario", "driver", "backend", "dataset_size", "unit",
+    "samples", "histogram", "percentiles", "timestamp", "commit", "host",
+}
+
+# Дополнительные поля с измеренными значениями (шаблоны fnmatch); все
+# остальные дополнительные поля отличают один вариант сценария от другого
+MEASURED_FIELDS = [
+    "*_ms", "*_bytes*", "*_per_second", "*_rate", "service_p*", "qps", "rows",
+    "dropped", "latency_lower_bound", "breakdown", "plan", "plan_*", "misestimates",
+]
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY,
+    started_at TEXT NOT NULL,
+    commit_hash TEXT,
+    host_id TEXT,
+    host TEXT
+);
+CREATE TABLE IF NOT EXISTS results (
+    id INTEGER PRIMARY KEY,
+    run_id INTEGER NOT NULL REFERENCES runs (id),
+    suite TEXT NOT NULL,
+    scenario TEXT NOT NULL,
+    backend TEXT,
+    driver TEXT,
+    dataset_size INTEGER,
+    variant TEXT NOT NULL,
+    repetition INTEGER,
+    count INTEGER NOT NULL,
+    mean REAL,
+    p50 REAL,
+    p99 REAL,
+    samples TEXT NOT NULL,
+    histogram TEXT NOT NULL,
+    extra TEXT NOT NULL,
+    recorded_at TEXT
+);
+CREATE INDEX IF NOT EXISTS results_scenario
+    ON results (suite, scenario, backend, driver, dataset_size, variant);
+"""
+
+# Колонки results, которые однозначно определяют сценарий
+KEY_COLUMNS = ["suite", "scenario", "backend", "driver", "dataset_size", "variant"]
+
+
+def connect(path=HISTORY_PATH):
+    """Открывает файл истории и создает таблицы, если их нет"""
+    conn = sqlite3.connect(path)
+    conn.executescript(SCHEMA)
+    return conn
+
+
+def variant(entry):
+    """JSON с дополнительными полями записи, кроме измеренных значений (MEASURED_FIELDS)"""
+    fields = {
+        key: value for key, value in entry.items()
+        if key not in RECORD_FIELDS and not any(fnmatch.fnmatchcase(key, pattern) for pattern in MEASURED_FIELDS)
+    }
+    return json.dumps(fields, sort_keys=True, default=str)
+
+
+def scenario_key(entry):
+    """Ключ сценария в порядке KEY_COLUMNS"""
+    return (entry["suite"], entry["scenario"], entry.get("backend"), entry["driver"],
+            entry["dataset_size"], variant(entry))
+
+
+def append(records, path=HISTORY_PATH):
+    """
+    Сохраняет записи одного запуска
+
+    Returns:
+        id запуска в таблице runs или None, если записей нет
+    """
+    if not records:
+        return None
+    first = records[0]
+    host = first.get("host") or {}
+    stored = {"samples", "histogram", "percentiles", "host", "commit"}
+    conn = connect(path)
+    try:
+        cur = conn.execute(
+            "INSERT INTO runs (started_at, commit_hash, host_id, host) VALUES (?, ?, ?, ?)",
+            (min(entry["timestamp"] for entry in records), first.get("commit"), host.get("id"),
+             json.dumps(host, ensure_ascii=False))
+        )
+        run_id = cur.lastrowid
+        rows = []
+        for entry in records:
+            summary = entry["percentiles"]
+            extra = {key: value for key, value in entry.items() if key not in stored}
+            rows.append((run_id, *scenario_key(entry), entry["run"], summary["count"],
+                         summary["mean"], summary["p50"], summary["p99"],
+                         json.dumps(entry["samples"]), json.dumps(entry["histogram"]),
+                         json.dumps(extra, ensure_ascii=False, default=str), entry["timestamp"]))
+        columns = ["run_id", *KEY_COLUMNS, "repetition", "count", "mean", "p50", "p99",
+                   "samples", "histogram", "extra", "recorded_at"]
+        conn.executemany(
+            f"INSERT INTO results ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})",
+            rows
+        )
+        conn.commit()
+    finally:
+        conn.close()
+    return run_id
+
+
+def weighted_values(samples, histogram_data):
+    """
+    Значения записи в виде пар (значение в ms, количество)
+
+    Если исходные значения не сохранены (benchmark_load.py), используются
+    корзины гистограммы.
+    """
+    if samples:
+        return [(value, 1) for value in samples]
+    return histogram.Histogram.from_dict(histogram_data).values()
+
+
+def _arrays(pairs):
+    values = np.array([value for value, _ in pairs], dtype=float)
+    counts = np.array([count for _, count in pairs], dtype=np.int64)
+    order = np.argsort(values, kind="stable")
+    return values[order], counts[order]
+
+
+def weighted_median(values, counts):
+    """Нижняя медиана значений values, каждое из которых повторяется counts раз"""
+    cumulative = np.cumsum(counts, axis=-1)
+    middle = (cumulative[..., -1:] + 1) // 2
+    return values[np.argmax(cumulative >= middle, axis=-1)]
+
+
+def mann_whitney(baseline, current):
+    """
+    Односторонний U-критерий Манна-Уитни: значения current больше baseline
+
+    Нормальное приближение с поправкой на связки и на непрерывность.
+
+    Args:
+        baseline, current: списки пар (значение, количество)
+
+    Returns:
+        (U для current, p-value)
+    """
+    merged = {}
+    for value, count in current:
+        merged.setdefault(value, [0, 0])[0] += count
+    for value, count in baseline:
+        merged.setdefault(value, [0, 0])[1] += count
+    n1 = sum(count for _, count in current)
+    n2 = sum(count for _, count in baseline)
+    n = n1 + n2
+
+    rank = 0
+    rank_sum = 0.0
+    ties = 0.0
+    for value in sorted(merged):
+        in_current, in_baseline = merged[value]
+        tied = in_current + in_baseline
+        # Одинаковые значения получают средний ранг
+        rank_sum += in_current * (rank + (tied + 1) / 2)
+        ties += tied ** 3 - tied
+        rank += tied
+
+    u = rank_sum - n1 * (n1 + 1) / 2
+    variance = n1 * n2 / 12 * ((n + 1) - ties / (n * (n - 1)))
+    if variance <= 0:
+        return u, 1.0
+    z = (u - n1 * n2 / 2 - 0.5) / math.sqrt(variance)
+    return u, 0.5 * math.erfc(z / math.sqrt(2))
+
+
+def bootstrap_median_change(baseline, current, iterations=BOOTSTRAP_ITERATIONS,
+                            confidence=CONFIDENCE, seed=SEED):
+    """
+    Доверительный интервал для относительного изменения медианы (0.1 = на 10% медленнее)
+
+    Выборки перевыбираются с возвращением через мультиномиальное
+    распределение по различным значениям, поэтому стоимость не зависит
+    от количества повторов одного значения.
+
+    Returns:
+        (нижняя граница, верхняя граница)
+    """
+    rng = np.random.default_rng(seed)
+    medians = []
+    for pairs in (baseline, current):
+        values, counts = _arrays(pairs)
+        total = int(counts.sum())
+        resampled = rng.multinomial(total, counts / total, size=iterations)
+        medians.append(weighted_median(values, resampled))
+    changes = np.sort(medians[1] / medians[0] - 1)
+    tail = (1 - confidence) / 2
+    return float(np.quantile(changes, tail)), float(np.quantile(changes, 1 - tail))
+
+
+def compare_scenario(baseline, current, baseline_runs=None, min_runs=MIN_BASELINE_RUNS):
+    """
+    Сравнивает значения сценария в базе и в текущем запуске
+
+    Args:
+        baseline_runs: количество запусков, из которых собрана база
+            (None - не проверять)
+        min_runs: минимальное количество запусков в базе
+
+    Returns:
+        словарь с медианами, изменением, интервалом, p-value и статусом
+        (regression, improvement, unchanged, insufficient, insufficient_baseline)
+    """
+    n_baseline = sum(count for _, count in baseline)
+    n_current = sum(count for _, count in current)
+    result = {"baseline_count": n_baseline, "current_count": n_current, "baseline_runs": baseline_runs}
+    if baseline_runs is not None and baseline_runs < min_runs:
+        result["status"] = "insufficient_baseline"
+        return result
+    if n_baseline < MIN_SAMPLES or n_current < MIN_SAMPLES:
+        result["status"] = "insufficient"
+        return result
+
+    baseline_median = float(weighted_median(*_arrays(baseline)))
+    current_median = float(weighted_median(*_arrays(current)))
+    change = current_median / baseline_median - 1 if baseline_median else 0.0
+    _, p_slower = mann_whitney(baseline, current)
+    _, p_faster = mann_whitney(current, baseline)
+    low, high = bootstrap_median_change(baseline, current)
+
+    if p_slower < ALPHA and low > 0 and change > MIN_SLOWDOWN:
+        status = "regression"
+    elif p_faster < ALPHA and high < 0 and change < -MIN_SLOWDOWN:
+        status = "improvement"
+    else:
+        status = "unchanged"
+    result.update({
+        "baseline_median": baseline_median,
+        "current_median": current_median,
+        "change": change,
+        "ci": (low, high),
+        "p_value": p_slower,
+        "status": status,
+    })
+    return result
+
+
+def latest_run(conn):
+    row = conn.execute("SELECT id FROM runs ORDER BY id DESC LIMIT 1").fetchone()
+    return row[0] if row else None
+
+
+def run_values(conn, run_id):
+    """{ключ сценария: пары значений} для всех записей запуска"""
+    groups = {}
+    rows = conn.execute(
+        f"SELECT {', '.join(KEY_COLUMNS)}, samples, histogram FROM results WHERE run_id = ? ORDER BY id",
+        (run_id,)
+    )
+    for row in rows:
+        key = row[:len(KEY_COLUMNS)]
+        samples, histogram_data = json.loads(row[-2]), json.loads(row[-1])
+        groups.setdefault(key, []).extend(weighted_values(samples, histogram_data))
+    return groups
+
+
+def baseline_values(conn, key, run_id, host_id, baseline_runs=BASELINE_RUNS):
+    """Значения сценария из baseline_runs последних запусков до run_id на той же машине"""
+    condition = " AND ".join(f"results.{column} IS ?" for column in KEY_COLUMNS)
+    rows = conn.execute(
+        f"SELECT results.run_id, results.samples, results.histogram FROM results "
+        f"JOIN runs ON runs.id = results.run_id "
+        f"WHERE {condition} AND results.run_id < ? AND runs.host_id IS ? "
+        f"ORDER BY results.run_id DESC",
+        (*key, run_id, host_id)
+    )
+    pairs = []
+    runs = set()
+    for found_run, samples, histogram_data in rows:
+        if found_run not in runs and len(runs) == baseline_runs:
+            break
+        runs.add(found_run)
+        pairs.extend(weighted_values(json.loads(samples), json.loads(histogram_data)))
+    return pairs, len(runs)
+
+
+def scenario_label(key):
+    suite, scenario, backend, driver, dataset_size, variant_json = key
+    label = f"{suite}: {scenario} [{backend}, {driver}, {dataset_size}]"
+    fields = json.loads(variant_json)
+    if fields:
+        label += " " + ", ".join(f"{name}={value}" for name, value in fields.items())
+    return label
+
+
+STATUS_NAMES = {
+    "regression": "РЕГРЕССИЯ",
+    "improvement": "ускорение",
+    "unchanged": "без изменений",
+    "insufficient": "мало данных",
+    "insufficient_baseline": "мало запусков",
+}
+
+
+def compare(path=HISTORY_PATH, run_id=None, baseline_runs=BASELINE_RUNS):
+    """
+    Сравнивает запуск run_id (по умолчанию последний) со скользящей базой и выводит таблицу
+
+    Returns:
+        список (ключ сценария, результат compare_scenario) для регрессий
+    """
+    conn = connect(path)
+    try:
+        run_id = run_id or latest_run(conn)
+        if run_id is None:
+            print(f"В {path} нет запусков")
+            return []
+        commit_hash, host_id = conn.execute(
+            "SELECT commit_hash, host_id FROM runs WHERE id = ?", (run_id,)
+        ).fetchone()
+        print(f"\n=== СРАВНЕНИЕ ЗАПУСКА {run_id} ({(commit_hash or '-')[:12]}) С {baseline_runs} ПРЕДЫДУЩИМИ ===")
+        print("-" * 180)
+        print(f"{'Сценарий':<80} {'Запусков':<9} {'База (ms)':<12} {'Сейчас (ms)':<12} {'Изменение':<11} "
+              f"{'95% ДИ':<20} {'p':<10} {'Статус':<15}")
+        print("-" * 180)
+
+        # С --baseline-runs меньше MIN_BASELINE_RUNS достаточно всех запрошенных запусков
+        min_runs = min(MIN_BASELINE_RUNS, baseline_runs)
+        regressions = []
+        for key, current in run_values(conn, run_id).items():
+            baseline, found_runs = baseline_values(conn, key, run_id, host_id, baseline_runs)
+            result = compare_scenario(baseline, current, found_runs, min_runs)
+            status = STATUS_NAMES[result["status"]]
+            if result["status"] in ("insufficient", "insufficient_baseline"):
+                print(f"{scenario_label(key):<80} {found_runs:<9} {'-':<12} {'-':<12} {'-':<11} {'-':<20} {'-':<10} {status:<15}")
+                continue
+            low, high = result["ci"]
+            interval = f"[{low:+.1%}, {high:+.1%}]"
+            print(f"{scenario_label(key):<80} {found_runs:<9} {result['baseline_median']:<12.3f} "
+                  f"{result['current_median']:<12.3f} {result['change']:<+11.1%} {interval:<20} "
+                  f"{result['p_value']:<10.2g} {status:<15}")
+            if result["status"] == "regression":
+                regressions.append((key, result))
+    finally:
+        conn.close()
+
+    print(f"\nРегрессий: {len(regressions)}")
+    return regressions
+
+
+def trend(path=HISTORY_PATH, suite=None, scenario=None, backend=None, limit=20):
+    """Выводит медиану и p99 каждого сценария по последним limit запускам"""
+    filters = {"suite": suite, "scenario": scenario, "backend": backend}
+    conditions = [f"results.{column} = ?" for column, value in filters.items() if value is not None]
+    params = [value for value in filters.values() if value is not None]
+    conn = connect(path)
+    try:
+        rows = conn.execute(
+            f"SELECT {', '.join('results.' + column for column in KEY_COLUMNS)}, runs.id, runs.started_at, "
+            f"runs.commit_hash, SUM(results.count), AVG(results.p50), AVG(results.p99) "
+            f"FROM results JOIN runs ON runs.id = results.run_id "
+            f"WHERE runs.id IN (SELECT id FROM runs ORDER BY id DESC LIMIT ?) "
+            f"{''.join(' AND ' + condition for condition in conditions)} "
+            f"GROUP BY {', '.join('results.' + column for column in KEY_COLUMNS)}, runs.id "
+            f"ORDER BY results.suite, results.scenario, results.backend, results.driver, "
+            f"results.dataset_size, results.variant, runs.id",
+            (limit, *params)
+        ).fetchall()
+    finally:
+        conn.close()
+
+    current_key = None
+    for row in rows:
+        key = row[:len(KEY_COLUMNS)]
+        run_id, started_at, commit_hash, count, p50, p99 = row[len(KEY_COLUMNS):]
+        if key != current_key:
+            current_key = key
+            print(f"\n{scenario_label(key)}:")
+            print(f"{'Запуск':<8} {'Время':<27} {'Коммит':<14} {'Значений':<10} {'p50 (ms)':<12} {'p99 (ms)':<12}")
+        # p50 и p99 равны NULL, если у сценария нет ни одного значения
+        p50, p99 = (f"{value:.3f}" if value is not None else "-" for value in (p50, p99))
+        print(f"{run_id:<8} {started_at:<27} {(commit_hash or '-')[:12]:<14} {count:<10} {p50:<12} {p99:<12}")
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="История результатов бенчмарков")
+    parser.add_argument("--history", default=HISTORY_PATH, help="файл SQLite с историей")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    compare_parser = commands.add_parser("compare", help="сравнить запуск с предыдущими и найти регрессии")
+    compare_parser.add_argument("--run", type=int, help="id запуска (по умолчанию последний)")
+    compare_parser.add_argument("--baseline-runs", type=int, default=BASELINE_RUNS,
+                                help="количество предыдущих запусков в базе")
+
+    trend_parser = commands.add_parser("trend", help="показать изменение медианы и p99 по запускам")
+    trend_parser.add_argument("--suite")
+    trend_parser.add_argument("--scenario")
+    trend_parser.add_argument("--backend")
+    trend_parser.add_argument("--limit", type=int, default=20, help="количество последних запусков")
+
+    args = parser.parse_args()
+    if args.command == "compare":
+        regressions = compare(args.history, run_id=args.run, baseline_runs=args.baseline_runs)
+        sys.exit(1 if regressions else 0)
+    trend(args.history, suite=args.suite, scenario=args.scenario, backend=args.backend, limit=args.limit)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+"""
+Загрузка тестовых данных через COPY ... FROM STDIN.
+
+Строки берутся из генератора и превращаются в текстовый формат COPY
+по мере того, как PostgreSQL их читает, поэтому весь набор данных
+никогда не хранится в памяти целиком. Для SQLite, где COPY нет,
+insert_rows() загружает строки пакетами через executemany.
+"""
+import itertools
+import random
+import re
+import time
+
+# Размер блока, который psycopg2 читает из потока за один раз
+BUFFER_SIZE = 64 * 1024
+
+# Количество строк в одном executemany при загрузке без COPY
+INSERT_BATCH_SIZE = 10000
+
+# Колонки таблицы users из benchmark.py, benchmark_raw.py и benchmark_size.py
+USER_COLUMNS = ["id", "name", "email", "phone", "address", "city", "country", "zipcode"]
+
+# Экранирование спецсимволов текстового формата COPY
+_ESCAPES = str.maketrans({"\\": "\\\\", "\t": "\\t", "\n": "\\n", "\r": "\\r"})
+
+# Символы, при наличии которых строку нужно экранировать по полям
+_SPECIAL = re.compile(r"[\\\n\r]")
+
+
+def format_value(value):
+    """Преобразует значение Python в поле текстового формата COPY"""
+    # bool и datetime через str() дают формат, который PostgreSQL принимает на вход
+    if value is None:
+        return "\\N"
+    return str(value).translate(_ESCAPES)
+
+
+def format_row(row):
+    """Преобразует кортеж значений в строку COPY"""
+    # Быстрый путь: значения без NULL и спецсимволов достаточно привести к str
+    line = "\t".join(map(str, row))
+    if None in row or line.count("\t") != len(row) - 1 or _SPECIAL.search(line):
+        line = "\t".join(format_value(value) for value in row)
+    return (line + "\n").encode("utf-8")
+
+
+class RowStream:
+    """Файлоподобный объект, который формирует данные COPY по мере чтения"""
+
+    def __init__(self, rows):
+        self._lines = map(format_row, rows)
+        self._buffer = bytearray()
+        self.rows = 0
+
+    def read(self, size=-1):
+        while size < 0 or len(self._buffer) < size:
+            line = next(self._lines, None)
+            if line is None:
+                break
+            self._buffer += line
+            self.rows += 1
+        if size < 0:
+            size = len(self._buffer)
+        chunk = bytes(self._buffer[:size])
+        del self._buffer[:size]
+        return chunk
+
+    def readline(self, size=-1):
+        if not self._buffer:
+            line = next(self._lines, None)
+            if line is None:
+                return b""
+            self.rows += 1
+            return line
+        return self.read(self._buffer.find(b"\n") + 1 or -1)
+
+
+def copy_rows(conn, table, columns, rows, commit=True, verbose=True):
+    """
+    Загружает строки в таблицу через COPY ... FROM STDIN
+
+    Args:
+        conn: соединение psycopg2 (или engine.raw_connection() SQLAlchemy)
+        table: имя таблицы
+        columns: список колонок в порядке значений в строках
+        rows: итерируемый набор кортежей
+        commit: фиксировать ли транзакцию после загрузки
+        verbose: выводить ли скорость загрузки
+
+    Returns:
+        (количество строк, время загрузки в секундах)
+    """
+    stream = RowStream(rows)
+    start_time = time.perf_counter()
+    cur = conn.cursor()
+    try:
+        cur.copy_expert(f"COPY {table} ({', '.join(columns)}) FROM STDIN", stream, size=BUFFER_SIZE)
+    finally:
+        cur.close()
+    if commit:
+        conn.commit()
+    elapsed = time.perf_counter() - start_time
+    if verbose:
+        rate = stream.rows / elapsed if elapsed > 0 else 0
+        print(f"Загружено {stream.rows} строк в {table} за {elapsed:.2f} s ({rate:.0f} строк/с)")
+    return stream.rows, elapsed
+
+
+def insert_rows(conn, table, columns, rows, commit=True, verbose=True, batch_size=INSERT_BATCH_SIZE):
+    """
+    Загружает строки через executemany пакетами по batch_size строк
+
+    Используется для баз без COPY (SQLite); параметры в стиле qmark (?).
+    Аргументы и результат такие же, как у copy_rows().
+    """
+    statement = f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})"
+    rows = iter(rows)
+    count = 0
+    start_time = time.perf_counter()
+    cur = conn.cursor()
+    try:
+        while True:
+            batch = list(itertools.islice(rows, batch_size))
+            if not batch:
+                break
+            cur.executemany(statement, batch)
+            count += len(batch)
+    finally:
+        cur.close()
+    if commit:
+        conn.commit()
+    elapsed = time.perf_counter() - start_time
+    if verbose:
+        rate = count / elapsed if elapsed > 0 else 0
+        print(f"Загружено {count} строк в {table} за {elapsed:.2f} s ({rate:.0f} строк/с)")
+    return count, elapsed
+
+
+def reset_sequence(conn, table, column="id"):
+    """Сдвигает последовательность SERIAL-колонки после загрузки строк с заданными ID"""
+    cur = conn.cursor()
+    try:
+        cur.execute(
+            f"SELECT setval(pg_get_serial_sequence(%s, %s), COALESCE(MAX({column}), 0) + 1, false) FROM {table}",
+            (table, column)
+        )
+    finally:
+        cur.close()
+    conn.commit()
+
+
+def user_rows(start, stop, seed=None):
+    """
+    Генерирует строки таблицы users с id из диапазона [start, stop)
+
+    seed - зерно для номеров телефонов (None - разные номера при каждом вызове)
+    """
+    rng = random.Random(seed)
+    for i in range(start, stop):
+        yield (
+            i,
+            f"User {i}",
+            f"user{i}@example.com",
+            f"+7{rng.randint(9000000000, 9999999999)}",
+            f"Street {i}",
+            f"City {i % 100}",
+            f"Country {i % 10}",
+            f"{10000 + i}"
+        )
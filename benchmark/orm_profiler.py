@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+"""
+Разложение времени запроса SQLAlchemy ORM на составляющие.
+
+Используются события SQLAlchemy: before_execute / before_cursor_execute
+ограничивают компиляцию запроса, before_cursor_execute / after_cursor_execute -
+обращение к драйверу (отправка запроса и ожидание ответа), событие load
+считает созданные объекты. Время извлечения строк из курсора замеряют
+курсоры драйверов с TimedFetch, которые движок получает через
+engine_args(). Все, что осталось от общего времени, относится к работе
+ORM: гидратации объектов, карте идентичности и обработке результата. Если
+курсор драйвера не замеряет извлечение, извлечение и ORM не разделяются
+и в breakdown() обе составляющие равны None.
+"""
+import sqlite3
+import time
+
+import psycopg2.extensions
+from sqlalchemy import event
+
+# Составляющие времени запроса в порядке вывода
+COMPONENTS = ["compile", "execute", "fetch", "orm"]
+
+# Подписи составляющих для вывода
+LABELS = {
+    "compile": "компиляция SQL",
+    "execute": "запрос к БД",
+    "fetch": "извлечение строк",
+    "orm": "гидратация ORM",
+}
+
+
+class TimedFetch:
+    """Примесь к курсору драйвера, которая накапливает время извлечения строк"""
+
+    fetch_ms = 0.0
+
+    def fetchone(self):
+        start_time = time.perf_counter()
+        try:
+            return super().fetchone()
+        finally:
+            TimedFetch.fetch_ms += (time.perf_counter() - start_time) * 1000
+
+    def fetchmany(self, size=None):
+        start_time = time.perf_counter()
+        try:
+            return super().fetchmany(size) if size is not None else super().fetchmany()
+        finally:
+            TimedFetch.fetch_ms += (time.perf_counter() - start_time) * 1000
+
+    def fetchall(self):
+        start_time = time.perf_counter()
+        try:
+            return super().fetchall()
+        finally:
+            TimedFetch.fetch_ms += (time.perf_counter() - start_time) * 1000
+
+
+class TimedCursor(TimedFetch, psycopg2.extensions.cursor):
+    """Курсор psycopg2 с замером извлечения строк"""
+
+
+class TimedSQLiteCursor(TimedFetch, sqlite3.Cursor):
+    """Курсор sqlite3 с замером извлечения строк"""
+
+
+class TimedSQLiteConnection(sqlite3.Connection):
+    """Соединение sqlite3, которое по умолчанию создает TimedSQLiteCursor"""
+
+    def cursor(self, factory=TimedSQLiteCursor):
+        return super().cursor(factory)
+
+
+# Аргументы create_engine, включающие замер извлечения строк, по драйверу бэкенда
+ENGINE_ARGS = {
+    "psycopg2": {"connect_args": {"cursor_factory": TimedCursor}},
+    "sqlite3": {"connect_args": {"factory": TimedSQLiteConnection}},
+}
+
+
+def engine_args(backend):
+    """Аргументы backend.create_engine() для замера извлечения строк на драйвере бэкенда"""
+    return ENGINE_ARGS.get(backend.driver, {})
+
+
+class OrmProfiler:
+    """Накапливает время составляющих запросов движка и модели между reset() и breakdown()"""
+
+    def __init__(self, engine, base):
+        self.reset()
+        self._listeners = [
+            (engine, "before_execute", self._before_execute),
+            (engine, "before_cursor_execute", self._before_cursor_execute),
+            (engine, "after_cursor_execute", self._after_cursor_execute),
+        ]
+        for target, name, listener in self._listeners:
+            event.listen(target, name, listener)
+        event.listen(base, "load", self._load, propagate=True)
+        self._listeners.append((base, "load", self._load))
+
+    def close(self):
+        """Отписывается от событий движка и модели"""
+        for target, name, listener in self._listeners:
+            if event.contains(target, name, listener):
+                event.remove(target, name, listener)
+        self._listeners = []
+
+    def reset(self):
+        self.compile_ms = 0.0
+        self.execute_ms = 0.0
+        self.objects = 0
+        self._execute_start = None
+        self._cursor_start = None
+        self._untimed_fetch = False
+        TimedFetch.fetch_ms = 0.0
+
+    def _before_execute(self, conn, clauseelement, multiparams, params, execution_options):
+        self._execute_start = time.perf_counter()
+
+    def _before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        self._cursor_start = time.perf_counter()
+        if self._execute_start is not None:
+            self.compile_ms += (self._cursor_start - self._execute_start) * 1000
+            self._execute_start = None
+
+    def _after_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        if not isinstance(cursor, TimedFetch):
+            self._untimed_fetch = True
+        if self._cursor_start is not None:
+            self.execute_ms += (time.perf_counter() - self._cursor_start) * 1000
+            self._cursor_start = None
+
+    def _load(self, target, context):
+        self.objects += 1
+
+    def breakdown(self, total_ms, calls=1):
+        """
+        Возвращает среднее на один вызов время составляющих в ms
+
+        Args:
+            total_ms: общее время всех вызовов с момента reset()
+            calls: количество вызовов
+        """
+        result = {
+            "compile": self.compile_ms / calls,
+            "execute": self.execute_ms / calls,
+        }
+        if self._untimed_fetch:
+            # Извлечение строк не замерено: остаток нельзя отнести к ORM
+            result["fetch"] = None
+            result["orm"] = None
+        else:
+            result["fetch"] = TimedFetch.fetch_ms / calls
+            result["orm"] = max(0.0, total_ms / calls - sum(result.values()))
+        result["objects"] = self.objects / calls
+        return result
+
+
+def format_breakdown(breakdown):
+    """Строка вида 'компиляция SQL 0.10 ms, запрос к БД 0.20 ms, ...'"""
+    parts = [
+        f"{LABELS[name]} {breakdown[name]:.2f} ms" if breakdown[name] is not None else f"{LABELS[name]} -"
+        for name in COMPONENTS
+    ]
+    return ", ".join(parts) + f", объектов {breakdown['objects']:.0f}"
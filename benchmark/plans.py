@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+"""
+Получение и разбор планов запросов PostgreSQL.
+"""
+import json
+
+
+def explain(cursor, sql, params=None, analyze=True):
+    """
+    Выполняет EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) и возвращает план как словарь
+
+    Без analyze запрос не выполняется, возвращается только оценка планировщика.
+    """
+    options = "ANALYZE, BUFFERS, FORMAT JSON" if analyze else "FORMAT JSON"
+    cursor.execute(f"EXPLAIN ({options}) {sql}", params)
+    plan = cursor.fetchone()[0]
+    # psycopg2 разбирает json сам, но на случай текстового результата
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return plan[0]
+
+
+def walk(node):
+    """Перебирает все узлы дерева плана в глубину"""
+    yield node
+    for child in node.get("Plans", []):
+        yield from walk(child)
+
+
+def describe(plan):
+    """Краткое описание плана: типы узлов сверху вниз и используемые индексы"""
+    parts = []
+    for node in walk(plan["Plan"]):
+        if "Index Name" in node:
+            parts.append(f"{node['Node Type']} ({node['Index Name']})")
+        else:
+            parts.append(node["Node Type"])
+    return " -> ".join(parts)
+
+
+def buffers(plan):
+    """Количество блоков, прочитанных из shared buffers и с диска"""
+    top = plan["Plan"]
+    return top.get("Shared Hit Blocks", 0), top.get("Shared Read Blocks", 0)
+
+
+# Порог расхождения оценки планировщика и фактического количества строк (во сколько раз)
+MISESTIMATE_RATIO = 10
+
+# Поля узла плана, которые определяют его форму (без стоимости и времени)
+SHAPE_FIELDS = {
+    "Node Type": "node",
+    "Join Type": "join",
+    "Strategy": "strategy",
+    "Relation Name": "relation",
+    "Index Name": "index",
+}
+
+
+def normalize(node):
+    """
+    Нормализованное дерево плана: только типы узлов, таблицы и индексы
+
+    Принимает как результат explain(), так и отдельный узел плана.
+    """
+    if "Plan" in node:
+        node = node["Plan"]
+    tree = {short: node[field] for field, short in SHAPE_FIELDS.items() if field in node}
+    children = [normalize(child) for child in node.get("Plans", [])]
+    if children:
+        tree["children"] = children
+    return tree
+
+
+def signature(tree):
+    """Форма плана одной строкой, например 'Hash Join/Inner(Seq Scan[post], Hash(Seq Scan[user]))'"""
+    text = tree["node"]
+    if "join" in tree:
+        text += f"/{tree['join']}"
+    target = "/".join(tree[key] for key in ("relation", "index") if key in tree)
+    if target:
+        text += f"[{target}]"
+    if "children" in tree:
+        text += "(" + ", ".join(signature(child) for child in tree["children"]) + ")"
+    return text
+
+
+def estimate_errors(plan, threshold=MISESTIMATE_RATIO):
+    """
+    Узлы, где оценка количества строк расходится с фактом больше чем в threshold раз
+
+    Plan Rows и Actual Rows в EXPLAIN даются на одно выполнение узла,
+    поэтому оба значения умножаются на Actual Loops. Узлы, которые
+    ни разу не выполнялись, пропускаются.
+    """
+    errors = []
+    for node in walk(plan["Plan"]):
+        loops = node.get("Actual Loops", 0)
+        if not loops:
+            continue
+        estimated = node["Plan Rows"] * loops
+        actual = node["Actual Rows"] * loops
+        ratio = max(estimated, actual, 1) / max(min(estimated, actual), 1)
+        if ratio > threshold:
+            errors.append({
+                "node": signature(normalize(node)).split("(")[0],
+                "estimated": estimated,
+                "actual": actual,
+                "ratio": ratio,
+            })
+    return errors
+
+
+class PlanTracker:
+    """
+    Отслеживает планы сценариев по контрольным точкам прогона
+
+    check() сравнивает форму плана с планом того же сценария на предыдущей
+    контрольной точке и сообщает о смене плана и о неверных оценках строк.
+    """
+
+    def __init__(self, threshold=MISESTIMATE_RATIO):
+        self.threshold = threshold
+        # (сценарий, вариант) -> (размер, форма плана)
+        self.shapes = {}
+        self.flips = []
+        self.misestimates = []
+
+    def check(self, scenario, dataset_size, plan, variant=None):
+        """
+        Returns:
+            поля для harness.record(): plan, plan_shape, plan_flip, misestimates
+        """
+        tree = normalize(plan)
+        shape = signature(tree)
+        key = (scenario, variant)
+        flip = None
+        if key in self.shapes and self.shapes[key][1] != shape:
+            previous_size, previous_shape = self.shapes[key]
+            flip = {"from_size": previous_size, "from": previous_shape, "to": shape}
+            self.flips.append({"scenario": scenario, "variant": variant, "dataset_size": dataset_size, **flip})
+            print(f"  Смена плана {scenario}: {previous_shape} ({previous_size}) -> {shape} ({dataset_size})")
+        self.shapes[key] = (dataset_size, shape)
+
+        errors = estimate_errors(plan, self.threshold)
+        for error in errors:
+            self.misestimates.append({"scenario": scenario, "variant": variant, "dataset_size": dataset_size, **error})
+            print(f"  Неверная оценка строк {scenario}: {error['node']} "
+                  f"оценка {error['estimated']:.0f}, факт {error['actual']:.0f}")
+
+        return {"plan": tree, "plan_shape": shape, "plan_flip": flip, "misestimates": errors}
+
+    def print_summary(self):
+        """Выводит все смены планов и неверные оценки за прогон"""
+        print(f"\nСмены планов: {len(self.flips)}")
+        for flip in self.flips:
+            variant = f" ({flip['variant']})" if flip['variant'] is not None else ""
+            print(f"  {flip['scenario']}{variant}: {flip['from_size']} -> {flip['dataset_size']} записей: "
+                  f"{flip['from']} -> {flip['to']}")
+        print(f"Неверные оценки строк (более чем в {self.threshold} раз): {len(self.misestimates)}")
+        for error in self.misestimates:
+            variant = f" ({error['variant']})" if error['variant'] is not None else ""
+            print(f"  {error['scenario']}{variant}, {error['dataset_size']} записей: {error['node']} "
+                  f"оценка {error['estimated']:.0f}, факт {error['actual']:.0f}")
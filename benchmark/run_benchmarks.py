@@ -1,51 +1,31 @@
 #!/usr/bin/env python3
-import subprocess
-import re
+import argparse
+
+import harness
 
 # Количество прогонов каждого теста
 RUNS = 5
 
-def extract_results(output):
-    results = {}
-    for line in output.split('\n'):
-        match = re.search(r'(Получение.+): (\d+\.\d+) ms', line)
-        if match:
-            operation = match.group(1)
-            time_ms = float(match.group(2))
-            if operation not in results:
-                results[operation] = []
-            results[operation].append(time_ms)
-    return results
+# Количество процессов по умолчанию. Наборы выполняются по очереди: при
+# параллельном запуске benchmark и benchmark_raw делят CPU и диск сервера,
+# и сравнение ORM с чистым SQL искажается
+JOBS = 1
 
-def run_benchmarks():
-    orm_results = {}
-    raw_results = {}
-    
+# Файл для записи результатов в формате JSON Lines
+OUTPUT = "results.jsonl"
+
+def run_benchmarks(jobs=JOBS):
     print(f"Запуск каждого бенчмарка {RUNS} раз...\n")
     
-    # Запускаем ORM бенчмарк несколько раз
-    print("Запуск бенчмарка с SQLAlchemy ORM:")
-    for i in range(RUNS):
-        print(f"  Прогон {i+1}/{RUNS}...")
-        process = subprocess.run(['./benchmark.py'], capture_output=True, text=True)
-        run_results = extract_results(process.stdout)
-        
-        for operation, times in run_results.items():
-            if operation not in orm_results:
-                orm_results[operation] = []
-            orm_results[operation].extend(times)
+    # Запускаем ORM и RAW SQL бенчмарки (при jobs > 1 - в пуле процессов)
+    records = harness.run_suites(["benchmark", "benchmark_raw"], runs=RUNS, output=OUTPUT, quiet=True, jobs=jobs)
     
-    # Запускаем RAW SQL бенчмарк несколько раз
-    print("\nЗапуск бенчмарка с чистым SQL:")
-    for i in range(RUNS):
-        print(f"  Прогон {i+1}/{RUNS}...")
-        process = subprocess.run(['./benchmark_raw.py'], capture_output=True, text=True)
-        run_results = extract_results(process.stdout)
-        
-        for operation, times in run_results.items():
-            if operation not in raw_results:
-                raw_results[operation] = []
-            raw_results[operation].extend(times)
+    orm_results = harness.group_samples(
+        [r for r in records if r["suite"] == "benchmark"], lambda r: r["scenario"]
+    )
+    raw_results = harness.group_samples(
+        [r for r in records if r["suite"] == "benchmark_raw"], lambda r: r["scenario"]
+    )
     
     # Вычисляем средние результаты
     print("\n=== РЕЗУЛЬТАТЫ БЕНЧМАРКА ===")
@@ -61,10 +41,15 @@ def run_benchmarks():
     
     print("\nСравнение (ORM vs SQL):")
     for operation in orm_results.keys():
+        if operation not in raw_results:
+            continue
         orm_avg = sum(orm_results[operation]) / len(orm_results[operation])
         raw_avg = sum(raw_results[operation]) / len(raw_results[operation])
         ratio = orm_avg / raw_avg
         print(f"{operation}: ORM в {ratio:.2f}x раз медленнее чистого SQL")
 
 if __name__ == "__main__":
-    run_benchmarks() 
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Сравнение SQLAlchemy ORM и чистого SQL")
+    parser.add_argument("--jobs", type=int, default=JOBS,
+                        help="количество процессов (больше 1 - наборы влияют на замеры друг друга)")
+    run_benchmarks(parser.parse_args().jobs) 
\ No newline at end of file
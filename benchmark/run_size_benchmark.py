@@ -1,49 +1,37 @@
 #!/usr/bin/env python3
-import subprocess
-import re
 import statistics
 
+import harness
+
 # Количество запусков бенчмарка
 NUM_RUNS = 5
 
-def extract_results(output):
+# Файл для записи результатов в формате JSON Lines
+OUTPUT = "results.jsonl"
+
+# Обозначения драйверов в итоговой таблице
+METHODS = {"sqlalchemy-orm": "ORM", "psycopg2": "SQL"}
+
+def extract_results(records):
     results = {}
     
-    # Регулярное выражение для извлечения результатов
-    pattern = r"Получение пользователя с ID 123 из таблицы с (\d+) строками \((ORM|SQL)\): (\d+\.\d+) ms"
-    
-    for line in output.split('\n'):
-        match = re.search(pattern, line)
-        if match:
-            table_size = match.group(1)
-            method = match.group(2)
-            time_ms = float(match.group(3))
-            
-            key = f"{method}_{table_size}"
-            if key not in results:
-                results[key] = []
-            
-            results[key].append(time_ms)
+    # Для каждого запуска берем среднее время по его запросам
+    for record in records:
+        key = f"{METHODS[record['driver']]}_{record['dataset_size']}"
+        if key not in results:
+            results[key] = []
+        
+        results[key].append(statistics.mean(record["samples"]))
             
     return results
 
 def run_multiple_benchmarks():
-    all_results = {}
-    
     print(f"Запуск бенчмарка {NUM_RUNS} раз...\n")
     
-    for i in range(NUM_RUNS):
-        print(f"Запуск {i+1}/{NUM_RUNS}...")
-        process = subprocess.run(['./benchmark_size.py'], capture_output=True, text=True)
-        
-        # Извлекаем результаты из вывода
-        run_results = extract_results(process.stdout)
-        
-        # Объединяем результаты
-        for key, times in run_results.items():
-            if key not in all_results:
-                all_results[key] = []
-            all_results[key].extend(times)
+    records = harness.run_suites(["benchmark_size"], runs=NUM_RUNS, output=OUTPUT, quiet=True)
+    
+    # Извлекаем результаты из записей
+    all_results = extract_results(records)
     
     # Анализируем результаты
     print("\n=== РЕЗУЛЬТАТЫ БЕНЧМАРКА ===\n")
@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+import argparse
+import os
+import statistics
+import sys
+
+import backends
+import datasets
+import harness
+import history
+
+
+def comparison_key(entry):
+    """Сценарий без учета бэкенда: драйвер DB-API у каждого бэкенда свой, поэтому он сводится к sql"""
+    driver = entry["driver"] or ""
+    api = driver if driver.startswith("sqlalchemy") else "sql"
+    return entry["suite"], entry["scenario"], entry["dataset_size"], api, entry.get("name_index")
+
+
+def print_backend_comparison(records, backend_names):
+    """Выводит среднее время каждого сценария на всех бэкендах рядом"""
+    groups = harness.group_samples(records, key=lambda entry: (comparison_key(entry), entry["backend"]))
+    scenarios = list(dict.fromkeys(key for key, _ in groups))
+
+    print("\n=== СРАВНЕНИЕ БЭКЕНДОВ (среднее, ms) ===")
+    width = 72 + 16 * len(backend_names)
+    print("-" * width)
+    print(f"{'Сценарий':<72} " + " ".join(f"{name:<15}" for name in backend_names))
+    print("-" * width)
+    for key in scenarios:
+        suite, scenario, dataset_size, api, name_index = key
+        label = f"{suite}: {scenario}"
+        if name_index is not None:
+            label += " (индекс)" if name_index else " (без индекса)"
+        label += f" [{api}, {dataset_size}]"
+        cells = []
+        for name in backend_names:
+            samples = groups.get((key, name))
+            cells.append(f"{statistics.mean(samples):<15.3f}" if samples else f"{'-':<15}")
+        print(f"{label:<72} " + " ".join(cells))
+
+
+def parse_cpus(value):
+    """Список CPU из строки вида "0-3,8,10-11" """
+    cpus = set()
+    for part in value.split(","):
+        first, _, last = part.partition("-")
+        cpus.update(range(int(first), int(last or first) + 1))
+    return sorted(cpus)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Запуск наборов бенчмарков в одном процессе")
+    parser.add_argument("--suite", action="append", dest="suites",
+                        help="имя набора (можно указать несколько раз, по умолчанию все)")
+    parser.add_argument("--runs", type=int, default=1, help="количество прогонов каждого набора")
+    parser.add_argument("--output", default="results.jsonl", help="файл JSON Lines для результатов")
+    parser.add_argument("--history", default=history.HISTORY_PATH,
+                        help="файл SQLite, в который добавляются результаты запуска")
+    parser.add_argument("--no-history", action="store_true", help="не сохранять результаты в историю")
+    parser.add_argument("--quiet", action="store_true", help="не выводить сообщения самих скриптов")
+    parser.add_argument("--backend", action="append", dest="backends",
+                        choices=list(backends.BACKENDS) + ["all"],
+                        help="бэкенд (можно указать несколько раз, all - все; по умолчанию postgresql)")
+    parser.add_argument("--jobs", type=int, default=1,
+                        help="количество процессов: прогоны выполняются параллельно, каждый процесс в своей схеме")
+    parser.add_argument("--cpus", type=parse_cpus,
+                        help="CPU для привязки процессов, например 0-7 или 0,2,4 (делятся между --jobs)")
+    parser.add_argument("--large-scale", action="store_true",
+                        help="добавить размеры на миллионы строк в наборы с флагом LARGE_SCALE")
+    parser.add_argument("--sample-keys", action="store_true",
+                        help="запрашивать случайные ID по всему набору в наборах с флагом SAMPLE_KEYS")
+    parser.add_argument("--clear-datasets", action="store_true",
+                        help="удалить снимки наборов данных (datasets.py) перед запуском")
+    parser.add_argument("--list", action="store_true", help="показать доступные наборы и выйти")
+    args = parser.parse_args()
+
+    harness.load_suites()
+    if args.list:
+        for name in harness.SUITES:
+            print(name)
+        return
+
+    # Флаги включаются только в модулях, которые их объявляют
+    flags = {"LARGE_SCALE": args.large_scale, "SAMPLE_KEYS": args.sample_keys}
+    for name in harness.SUITE_MODULES:
+        module = sys.modules.get(name)
+        for flag, enabled in flags.items():
+            if enabled and hasattr(module, flag):
+                setattr(module, flag, True)
+
+    unknown = [name for name in args.suites or [] if name not in harness.SUITES]
+    if unknown:
+        parser.error(f"неизвестные наборы: {', '.join(unknown)}")
+
+    unavailable = sorted(set(args.cpus or []) - os.sched_getaffinity(0))
+    if unavailable:
+        parser.error(f"недоступные CPU: {', '.join(map(str, unavailable))}")
+
+    backend_names = args.backends or [backends.DEFAULT_BACKEND]
+    if "all" in backend_names:
+        backend_names = list(backends.BACKENDS)
+
+    if args.clear_datasets:
+        for name in backend_names:
+            with backends.use(name) as backend:
+                conn = backend.connect()
+                try:
+                    datasets.clear(conn)
+                finally:
+                    conn.close()
+
+    records = harness.run_suites(args.suites, runs=args.runs, output=args.output, quiet=args.quiet,
+                                 backend_names=backend_names, jobs=args.jobs, cpus=args.cpus)
+    if len(backend_names) > 1:
+        print_backend_comparison(records, backend_names)
+    print(f"\nЗаписано {len(records)} результатов в {args.output}")
+    if not args.no_history:
+        run_id = history.append(records, args.history)
+        if run_id is not None:
+            print(f"Запуск {run_id} добавлен в историю {args.history} (сравнение: python history.py compare)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""
+Прогон замеров по нескольким размерам одного и того же набора данных.
+
+Вместо пересоздания таблиц для каждого размера набор данных растет
+монотонно (1 -> 10 -> ... -> N): на каждой контрольной точке дозагружаются
+только недостающие строки, выполняется ANALYZE и замеры. Варианты
+индексов переключаются на уже загруженных данных (CREATE/DROP INDEX),
+поэтому общая стоимость подготовки пропорциональна N, а не сумме
+размеров, умноженной на количество вариантов.
+"""
+import itertools
+import random
+import time
+
+# Размеры для прогонов на миллионах строк. Строки генерируются и загружаются
+# потоком, а запросы не выбирают результат целиком, поэтому потребление
+# памяти не зависит от размера.
+SCALE_TIERS = [1000000, 10000000, 50000000]
+
+# Зерно генератора ключей для запросов
+SEED = 42
+
+
+def lookup_keys(size, key, sample=False, seed=SEED):
+    """
+    Бесконечный итератор ID для запросов на контрольной точке
+
+    Без sample всегда возвращается key - ID тестовой записи, страница с которой
+    после первого запроса остается в кэше. С sample ID выбираются равномерно
+    по всему набору: ожидается, что тестовая запись загружена первой с ID key,
+    а сгенерированные записи получают ID 1, 2, ... с пропуском key, то есть при
+    size <= key записи с ID size нет и ее место занимает key.
+    """
+    if not sample:
+        return itertools.repeat(key)
+    rng = random.Random(seed)
+
+    def sample_id():
+        user_id = rng.randint(1, size)
+        return key if user_id == size and size <= key else user_id
+
+    return (sample_id() for _ in itertools.count())
+
+
+def apply_variant(conn, variants, variant, existing):
+    """
+    Создает индексы варианта variant и удаляет индексы остальных вариантов
+
+    Args:
+        variants: {имя варианта: {имя индекса: CREATE INDEX ...}}
+        existing: множество уже созданных индексов (обновляется)
+
+    Returns:
+        время перестроения индексов в секундах
+    """
+    start_time = time.perf_counter()
+    wanted = variants[variant]
+    cur = conn.cursor()
+    try:
+        for name in sorted(existing - set(wanted)):
+            cur.execute(f"DROP INDEX IF EXISTS {name}")
+            existing.discard(name)
+        for name, ddl in wanted.items():
+            if name not in existing:
+                cur.execute(ddl)
+                existing.add(name)
+    finally:
+        cur.close()
+    conn.commit()
+    return time.perf_counter() - start_time
+
+
+def analyze(conn, tables):
+    cur = conn.cursor()
+    try:
+        for table in tables:
+            cur.execute(f"ANALYZE {table}")
+    finally:
+        cur.close()
+    conn.commit()
+
+
+def run_sweep(conn, sizes, grow, measure, tables, variants=None):
+    """
+    Выполняет замеры на каждом размере набора данных
+
+    Args:
+        conn: соединение psycopg2 для ANALYZE и DDL индексов
+        sizes: размеры набора данных
+        grow: grow(loaded, size) дозаполняет набор с loaded до size записей
+        measure: measure(size, variant) выполняет замеры на контрольной точке
+        tables: таблицы, для которых обновляется статистика
+        variants: {имя варианта: {имя индекса: CREATE INDEX ...}};
+            None - один вариант без переключения индексов
+
+    Returns:
+        {"load": секунды, "index": секунды} - затраты на подготовку данных
+    """
+    costs = {"load": 0.0, "index": 0.0}
+    existing = set()
+    loaded = 0
+
+    for size in sorted(sizes):
+        start_time = time.perf_counter()
+        grow(loaded, size)
+        loaded = size
+        analyze(conn, tables)
+        costs["load"] += time.perf_counter() - start_time
+        print(f"\nКонтрольная точка: {size} записей")
+
+        for variant in variants or [None]:
+            if variant is not None:
+                costs["index"] += apply_variant(conn, variants, variant, existing)
+                analyze(conn, tables)
+            measure(size, variant)
+
+    print(f"\nПодготовка данных: загрузка {costs['load']:.2f} s, индексы {costs['index']:.2f} s")
+    return costs